@@ -0,0 +1,160 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# The hub template's opening step. VOX hands the agent the relevant schema,
+# so the step is replaced by SCHEMA_STEP rather than contradicted later on.
+HUB_SCHEMA_STEP = """To start you should ALWAYS look at the tables in the database to see what you can query.
+Do NOT skip this step.
+Then you should query the schema of the most relevant tables."""
+
+SCHEMA_STEP = """To start, use the "Relevant schema" section of the user message when there is one; it already describes the tables you need.
+Only when it is missing, or a table you need is not in it, look at the tables in the database and query the schema of the most relevant ones."""
+
+# Vendored copy of the langchain-ai/sql-agent-system-prompt hub template,
+# with SCHEMA_STEP in place of its opening step, so building an agent needs
+# no network round trip.
+SQL_AGENT_SYSTEM_PROMPT = """You are an agent designed to interact with a SQL database.
+Given an input question, create a syntactically correct {dialect} query to run, then look at the results of the query and return the answer.
+Unless the user specifies a specific number of examples they wish to obtain, always limit your query to at most {top_k} results.
+You can order the results by a relevant column to return the most interesting examples in the database.
+Never query for all the columns from a specific table, only ask for the relevant columns given the question.
+You have access to tools for interacting with the database.
+Only use the below tools. Only use the information returned by the below tools to construct your final answer.
+You MUST double check your query before executing it. If you get an error while executing a query, rewrite the query and try again.
+
+DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the database.
+
+""" + SCHEMA_STEP
+
+# VOX puts the schema of the tables relevant to each question in the user
+# message, which makes the list/schema tool round trips unnecessary.
+SCHEMA_HINT = """
+
+When the user message contains a "Relevant schema" section, it is the current schema of those tables: use it directly and skip listing tables and querying their schema. Only use the schema tools for tables that are not described there.
+
+If a query is rejected by the cost guard, its JSON feedback says why: follow the suggestion and retry with a cheaper query instead of repeating it."""
+
+_system_message: Optional[str] = None
+
+
+def sql_system_message(dialect: str = "MySQL", top_k: int = 5) -> str:
+    """
+    The agent's system message, built once per process. Set
+    VOX_SQL_PROMPT_FROM_HUB=1 to pull the latest template from the hub
+    instead of using the vendored copy.
+    """
+    global _system_message
+    if _system_message is not None:
+        return _system_message
+    if os.getenv("VOX_SQL_PROMPT_FROM_HUB"):
+        try:
+            from langchain import hub
+            _system_message = hub.pull("langchain-ai/sql-agent-system-prompt").format(
+                dialect=dialect, top_k=top_k
+            ).replace(HUB_SCHEMA_STEP, SCHEMA_STEP) + SCHEMA_HINT
+            return _system_message
+        except Exception as e:
+            print(f"Warning: Error pulling prompt template: {str(e)}")
+    _system_message = SQL_AGENT_SYSTEM_PROMPT.format(dialect=dialect, top_k=top_k)
+    _system_message += SCHEMA_HINT
+    return _system_message
+
+
+class AgentBundle:
+    """Everything needed to query one database: engine, SQLDatabase, toolkit and agent."""
+
+    def __init__(self, name: str, engine: Any, db: Any, toolkit: Any, agent: Any,
+                 owns_engine: bool = True):
+        self.name = name
+        self.engine = engine
+        self.owns_engine = owns_engine
+        self.db = db
+        self.toolkit = toolkit
+        self.agent = agent
+
+    def dispose(self):
+        if self.owns_engine:
+            self.engine.dispose()
+
+
+class AgentCache:
+    """
+    LRU cache of AgentBundles keyed by database name.
+
+    Bundles hold no conversation state, so sessions share them. An evicted
+    bundle's engine is disposed if the bundle owns it, which closes its
+    pooled connections; a session still holding it transparently opens a
+    fresh connection on its next query.
+    """
+
+    def __init__(self, build: Callable[[str], AgentBundle], capacity: int = 8):
+        self.build = build
+        self.capacity = capacity
+        self.bundles: "OrderedDict[str, AgentBundle]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.build_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, name: str) -> AgentBundle:
+        """Return the bundle for a database, building it on a miss. Blocking; call from a thread."""
+        with self.lock:
+            bundle = self.bundles.get(name)
+            if bundle is not None:
+                self.bundles.move_to_end(name)
+                self.hits += 1
+                return bundle
+            build_lock = self.build_locks.setdefault(name, threading.Lock())
+
+        # Concurrent switches to the same database build it only once
+        with build_lock:
+            with self.lock:
+                bundle = self.bundles.get(name)
+                if bundle is not None:
+                    self.bundles.move_to_end(name)
+                    self.hits += 1
+                    return bundle
+            bundle = self.build(name)
+            with self.lock:
+                self.misses += 1
+                self.bundles[name] = bundle
+                evicted = []
+                while len(self.bundles) > self.capacity:
+                    evicted.append(self.bundles.popitem(last=False)[1])
+                self.evictions += len(evicted)
+        for old in evicted:
+            self._dispose(old)
+        return bundle
+
+    def invalidate(self, name: str):
+        with self.lock:
+            bundle = self.bundles.pop(name, None)
+        if bundle is not None:
+            self._dispose(bundle)
+
+    def clear(self):
+        with self.lock:
+            bundles = list(self.bundles.values())
+            self.bundles.clear()
+        for bundle in bundles:
+            self._dispose(bundle)
+
+    @staticmethod
+    def _dispose(bundle: AgentBundle):
+        try:
+            bundle.dispose()
+            print(f"Disposed engine for database: {bundle.name}")
+        except Exception as e:
+            print(f"Warning: Error disposing engine for {bundle.name}: {str(e)}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "databases": list(self.bundles),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,33 +1,343 @@
 import asyncio
 import os
-import tempfile
-import time
-import wave
 import numpy as np
 import base64
-from sqlalchemy import create_engine, text
+import re
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import text
 from urllib.parse import quote_plus
 from dotenv import load_dotenv
-from deepgram import DeepgramClient, PrerecordedOptions, FileSource, SpeakOptions
-import pyaudio
 from langchain_community.utilities.sql_database import SQLDatabase
 from langchain_openai import ChatOpenAI
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-from langchain import hub
-from langchain.memory import ConversationEntityMemory, ConversationSummaryBufferMemory
 from langgraph.prebuilt import create_react_agent
 from mode_tracker import ModeTracker, ConversationMode
-class VoiceSQLAssistant:
+from audio_capture import AudioCaptureService
+from vad import StreamingVAD, SPEECH_START, SPEECH_END
+from tts_cache import TTSCache
+from intent_classifier import IntentClassifier
+from db_resolver import DatabaseNameResolver
+from agent_cache import AgentBundle, AgentCache, sql_system_message
+from schema_cache import SchemaCache
+from query_cache import QueryCache, extract_sql_result, result_digest
+from db_pool import ServerPool
+from query_log import QueryLog
+from sql_guard import GuardLimits, SqlGuard
+from speech_backends import SpeechBackend, build_speech_backend
+from result_stream import BoundedQueryTool, ResultLimits, fetch_bounded, latest_result
+import tracing
+from speculation import SpeculationStats, predict_route
+from memory_writer import BatchedEntityMemory, IncrementalSummaryBufferMemory, MemoryWriter
+
+# Fixed spoken phrases; pre-synthesized into the TTS cache at startup
+WELCOME_TEMPLATE = "Connected to {db} database. How can I help you?"
+GOODBYE_TEXT = "Goodbye! Have a great day!"
+SELECT_DATABASE_FIRST_TEXT = "Please select a database first before making database queries."
+QUERY_ERROR_TEXT = "I encountered an error processing your query. Please try rephrasing your question."
+LLM_TIMEOUT_TEXT = "I'm taking too long to process that. Could you please try again?"
+LLM_ERROR_TEXT = "I encountered an error. Could you please try again?"
+MODE_MAPPING = {
+    "DATABASE": ConversationMode.DATABASE,
+    "CREATIVE": ConversationMode.CREATIVE,
+    "EXPLANATION": ConversationMode.EXPLANATION,
+    "GENERAL": ConversationMode.GENERAL,
+    "QUERY": ConversationMode.DATABASE,
+    "TRANSITIONING": ConversationMode.TRANSITIONING,
+    "SWITCH": ConversationMode.DATABASE,
+    "LIST": ConversationMode.DATABASE
+}
+FIXED_PHRASES = [GOODBYE_TEXT, SELECT_DATABASE_FIRST_TEXT, QUERY_ERROR_TEXT, LLM_TIMEOUT_TEXT, LLM_ERROR_TEXT]
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def format_for_speech(text: str) -> str:
+    # Read acronyms such as "SQL" as words rather than letter by letter
+    return ' '.join(
+        word.title() if word.isupper() and len(word) > 1 
+        else word 
+        for word in text.split()
+    )
+
+
+def split_sentences(text: str, min_length: int = 20) -> List[str]:
+    """Split text into sentences, merging fragments shorter than min_length into the next one."""
+    sentences = []
+    pending = ""
+    for part in SENTENCE_BOUNDARY.split(text.strip()):
+        pending = f"{pending} {part}".strip()
+        if len(pending) >= min_length:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+class PartialStream:
+    """
+    Forwards reply text to the client as the LLM streams it. While a turn's
+    handler is speculative the text is held back, then released or dropped.
+    """
+
+    def __init__(self):
+        # Async callable taking a text delta; None when nobody is listening
+        self.sink = None
+        self.held = None
+
+    def hold(self):
+        self.held = []
+
+    async def release(self):
+        held, self.held = self.held, None
+        if held:
+            await self.emit("".join(held))
+
+    def discard(self):
+        self.held = None
+
+    async def emit(self, text: str):
+        if not text or self.sink is None:
+            return
+        if self.held is not None:
+            self.held.append(text)
+        else:
+            await self.sink(text)
+
+
+class Speculation:
+    """A handler started on a predicted route before classification finished"""
+
+    def __init__(self, route: str, task: asyncio.Task):
+        self.route = route
+        self.task = task
+        self.started = time.perf_counter()
+        # A discarded loser must not log "exception was never retrieved"
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+class SharedResources:
+    """Heavy clients shared by every session: speech backend, server engine and LLM."""
+
     def __init__(self, dg_api_key: str, openai_api_key: str):
-        self.dg_client = DeepgramClient(dg_api_key)
-        self.setup_sql_agent(openai_api_key)
-        self.mode_tracker = ModeTracker()
+        self.speech = self.build_speech(dg_api_key)
+        self.tts_cache = TTSCache(
+            max_bytes=int(os.getenv("VOX_TTS_CACHE_BYTES", str(32 * 1024 * 1024))),
+            disk_dir=os.getenv("VOX_TTS_CACHE_DIR") or None,
+            max_disk_bytes=int(os.getenv("VOX_TTS_CACHE_DISK_BYTES", str(256 * 1024 * 1024))),
+            extension=self.speech.audio_extension
+        )
+        self.intent_classifier = IntentClassifier(
+            threshold=float(os.getenv("VOX_INTENT_THRESHOLD", "0.7")),
+            log_path=os.getenv("VOX_INTENT_LOG") or None
+        )
         self.available_databases = []
+        self.db_resolver = DatabaseNameResolver([])
+        self.agent_cache = AgentCache(
+            self.build_agent_bundle,
+            capacity=int(os.getenv("VOX_AGENT_CACHE_SIZE", "8"))
+        )
+        self.schema_cache = SchemaCache(
+            ttl=float(os.getenv("VOX_SCHEMA_TTL", "3600")),
+            check_interval=float(os.getenv("VOX_SCHEMA_CHECK_INTERVAL", "60"))
+        )
+        self.query_cache = QueryCache(
+            question_ttl=float(os.getenv("VOX_QUERY_CACHE_TTL", "3600")),
+            result_ttl=float(os.getenv("VOX_RESULT_CACHE_TTL", "300")),
+            max_table_bytes=int(os.getenv("VOX_RESULT_CACHE_TABLE_BYTES", str(256 * 1024)))
+        )
+        self.speculation = SpeculationStats()
+        # Agent SQL is planned and bounded before it reaches the database
+        self.sql_guard = SqlGuard(GuardLimits(
+            max_rows_examined=int(os.getenv("VOX_SQL_MAX_ROWS_EXAMINED", "1000000")),
+            max_full_scan_rows=int(os.getenv("VOX_SQL_MAX_FULL_SCAN_ROWS", "100000")),
+            max_execution_ms=int(os.getenv("VOX_SQL_MAX_EXECUTION_MS", "10000")),
+            read_only=os.getenv("VOX_SQL_READ_ONLY", "1") != "0"
+        ))
+        # Every agent statement, for query_log.py to find hot queries and missing indexes
+        query_log_path = os.getenv("VOX_QUERY_LOG", "vox_query_log.jsonl")
+        self.query_log = QueryLog(query_log_path) if query_log_path else None
+        self.result_limits = ResultLimits(
+            max_rows=int(os.getenv("VOX_RESULT_MAX_ROWS", "1000")),
+            max_bytes=int(os.getenv("VOX_RESULT_MAX_BYTES", str(1024 * 1024))),
+            sample_rows=int(os.getenv("VOX_RESULT_SAMPLE_ROWS", "20"))
+        )
+        self.setup_sql_agent(openai_api_key)
         self.refresh_available_databases()
+
+    def build_speech(self, dg_api_key: str) -> SpeechBackend:
+        """Deepgram, or on-box models with VOX_SPEECH_BACKEND=local"""
+        return build_speech_backend(dg_api_key)
+
+    def setup_sql_agent(self, openai_api_key):
+        username = os.getenv("DB_USER", "harsha")
+        password = quote_plus(os.getenv("DB_PASSWORD", "HarshaV@123"))
+        host = os.getenv("DB_HOST", "localhost")
+        port = os.getenv("DB_PORT", "3306")
+        connection_string = f"mysql+pymysql://{username}:{password}@{host}:{port}"
+        # One pool for the whole server; every database borrows from its budget
+        self.db_pool = ServerPool(
+            connection_string,
+            budget=int(os.getenv("VOX_DB_POOL_SIZE", "20")),
+            per_session=int(os.getenv("VOX_DB_SESSION_CONNECTIONS", "2")),
+            timeout=float(os.getenv("VOX_DB_POOL_TIMEOUT", "30"))
+        )
+        self.engine = self.db_pool.engine
+        # Test connection
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            print("Database connection successful")
+        self.llm = ChatOpenAI(
+            model="gpt-3.5-turbo", 
+            api_key=openai_api_key, 
+            temperature=0,
+            presence_penalty=0.6,  # Discourage repetition
+            frequency_penalty=0.6,  # Encourage conciseness
+            
+        )
+
+    def refresh_available_databases(self):
+        try:
+            with self.engine.connect() as conn:
+                result = conn.execute(text("SHOW DATABASES"))
+                self.available_databases = [
+                    row[0] for row in result 
+                    if row[0] not in ['information_schema', 'mysql', 'performance_schema', 'sys']
+                ]
+            self.db_resolver = DatabaseNameResolver(self.available_databases)
+        except Exception as e:
+            print(f"Error refreshing databases: {str(e)}")
+
+    def synthesize_speech(self, text: str) -> bytes:
+        """Synthesize one piece of text to audio bytes in memory, through the TTS cache"""
+        formatted_text = format_for_speech(text)
+        key = TTSCache.key(formatted_text, self.speech.voice)
+        audio_bytes = self.tts_cache.get(key)
+        if audio_bytes is None:
+            with tracing.stage("tts"):
+                audio_bytes = self.speech.synthesize(formatted_text)
+            self.tts_cache.put(key, audio_bytes)
+        return audio_bytes
+
+    async def prewarm_tts(self, max_parallel: int = 4):
+        """Synthesize the fixed phrases and one welcome line per database into the cache"""
+        phrases = FIXED_PHRASES + [WELCOME_TEMPLATE.format(db=db) for db in self.available_databases]
+        # Streamed replies are synthesized per sentence, so warm those too
+        texts = []
+        for phrase in phrases:
+            texts.append(phrase)
+            sentences = split_sentences(phrase)
+            if len(sentences) > 1:
+                texts.extend(sentences)
+
+        texts = list(dict.fromkeys(texts))
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def warm(text):
+            async with semaphore:
+                try:
+                    await asyncio.to_thread(self.synthesize_speech, text)
+                except Exception as e:
+                    print(f"Warning: Error pre-warming TTS for '{text}': {str(e)}")
+
+        await asyncio.gather(*(warm(text) for text in texts))
+        print(f"TTS cache pre-warmed with {len(texts)} phrases")
+
+    def database_engine(self, db_name: str):
+        """An engine for one database, borrowing connections from the server pool."""
+        return self.db_pool.engine_for(db_name)
+
+    def build_agent_bundle(self, db_name: str) -> AgentBundle:
+        specific_engine = self.database_engine(db_name)
+        # Test connection
+        with specific_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        
+        # Tables are reflected on demand; the schema snapshot covers the prompt
+        db = SQLDatabase(specific_engine, db_name, lazy_table_reflection=True)
+        self.schema_cache.get(self.engine, db_name)
+        toolkit = SQLDatabaseToolkit(db=db, llm=self.llm)
+        # Results are vetted by the cost guard, fetched with a server-side cursor
+        # and capped; the agent sees a sample
+        tools = [
+            BoundedQueryTool(
+                db=db, limits=self.result_limits, guard=self.sql_guard, log=self.query_log, database=db_name
+            ) if tool.name == "sql_db_query" else tool
+            for tool in toolkit.get_tools()
+        ]
+        agent = create_react_agent(
+            self.llm,
+            tools,
+            state_modifier=sql_system_message()
+        )
+        print(f"Built SQL agent for database: {db_name}")
+        # The engine is a view of the shared pool; evicting the bundle must not dispose it
+        return AgentBundle(db_name, specific_engine, db, toolkit, agent, owns_engine=False)
+
+    def relevant_schema(self, db_name: str, question: str) -> str:
+        """Schema of the tables relevant to a question, from the cached snapshot. Blocking."""
+        snapshot, changed = self.schema_cache.get(self.engine, db_name)
+        if changed:
+            # Cached SQL may reference tables or columns that changed
+            self.query_cache.invalidate(db_name)
+        tables = snapshot.retriever.relevant_tables(question)
+        return snapshot.describe(tables) if tables else ""
+
+    def run_bounded(self, db_name: str, sql: str):
+        """Run SQL on a database's cached engine within the result limits. Blocking."""
+        return fetch_bounded(
+            self.agent_cache.get(db_name).engine, sql, self.result_limits, self.sql_guard, self.query_log, db_name
+        )
+
+    def warm_pool(self, connections: int = 2):
+        """Open connections up front so the first turns skip the MySQL handshake. Blocking."""
+        opened = []
+        try:
+            for _ in range(connections):
+                opened.append(self.engine.connect())
+        finally:
+            for conn in opened:
+                conn.close()
+
+    def warm_databases(self, agent_databases: List[str]):
+        """Load every database's schema snapshot and build agents for agent_databases. Blocking."""
+        for db_name in self.available_databases:
+            self.schema_cache.get(self.engine, db_name)
+        for db_name in agent_databases:
+            if db_name in self.available_databases:
+                self.agent_cache.get(db_name)
+
+    def dispose(self):
+        self.agent_cache.clear()
+        self.db_pool.dispose()
+        self.speech.close()
+
+
+class VoiceSQLAssistant:
+    def __init__(self, dg_api_key: str, openai_api_key: str, shared: Optional[SharedResources] = None):
+        # Sessions created by the server pass in the process-wide resources;
+        # standalone use builds its own.
+        self.shared = shared or SharedResources(dg_api_key, openai_api_key)
+        self.speech = self.shared.speech
+        self.engine = self.shared.engine
+        self.llm = self.shared.llm
+        self.intent_classifier = self.shared.intent_classifier
+        self.agent_timeout = float(os.getenv("VOX_AGENT_TIMEOUT", "45"))
+        self.speculate_min_streak = int(os.getenv("VOX_SPECULATE_MIN_STREAK", "2"))
+        self.db = None
+        self.agent_executor = None
+        self.selected_db_name = None
+        self.mode_tracker = ModeTracker()
         self.current_connection = None
+        # Rows behind the latest QUERY answer, for the client to render
+        self.result_table = None
+        self.partials = PartialStream()
         
         # Initialize specialized memories
-        self.entity_memory = ConversationEntityMemory(
+        self.entity_memory = BatchedEntityMemory(
             llm=self.llm,
             max_token_limit=1000, 
             input_key="input", 
@@ -35,13 +345,25 @@ class VoiceSQLAssistant:
             return_messages=True
         )
         
-        self.conversation_memory = ConversationSummaryBufferMemory(
+        self.conversation_memory = IncrementalSummaryBufferMemory(
             llm=self.llm,
             max_token_limit=1000,
             input_key="input", 
             output_key="output",
             return_messages=True
         )
+        # Summarization and entity updates run after the response is sent
+        self.memory_writer = MemoryWriter(self.conversation_memory, self.entity_memory)
+
+    @property
+    def available_databases(self) -> List[str]:
+        return self.shared.available_databases
+
+    def refresh_available_databases(self):
+        self.shared.refresh_available_databases()
+
+    def synthesize_speech(self, text: str) -> bytes:
+        return self.shared.synthesize_speech(text)
 
     async def get_speech_audio(self, text: str) -> dict:
         """Generate speech audio and return as base64 data"""
@@ -49,339 +371,476 @@ class VoiceSQLAssistant:
             return None
                 
         try:
-            formatted_text = ' '.join(
-                word.title() if word.isupper() and len(word) > 1 
-                else word 
-                for word in text.split()
-            )
-            
-            options = SpeakOptions(model="aura-asteria-en")
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-                temp_filename = temp_file.name
-            
-            # Generate audio file
-            self.dg_client.speak.v("1").save(temp_filename, {"text": formatted_text}, options)
-            
-            # Read file as bytes and encode as base64
-            with open(temp_filename, 'rb') as audio_file:
-                audio_bytes = audio_file.read()
-                audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-            
-            # Clean up temp file
-            os.unlink(temp_filename)
+            audio_bytes = await asyncio.to_thread(self.synthesize_speech, text)
+            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
             
             return {
                 "audio": audio_base64,
-                "type": "audio/mp3"
+                "type": self.speech.audio_type
             }
             
         except Exception as e:
             print(f"Text-to-speech error: {str(e)}")
             return None
 
-    def setup_sql_agent(self, openai_api_key):
-        username = os.getenv("DB_USER", "harsha")
-        password = quote_plus(os.getenv("DB_PASSWORD", "HarshaV@123"))
-        host = os.getenv("DB_HOST", "localhost")
-        connection_string = f"mysql+pymysql://{username}:{password}@{host}:3306"
-        # Test connection
-        self.engine = create_engine(connection_string, pool_pre_ping=True, pool_recycle=3600)
-        with self.engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-            print("Database connection successful")
-        self.llm = ChatOpenAI(
-            model="gpt-3.5-turbo", 
-            api_key=openai_api_key, 
-            temperature=0,
-            presence_penalty=0.6,  # Discourage repetition
-            frequency_penalty=0.6,  # Encourage conciseness
-            
-        )
-        self.db = None
-        self.agent_executor = None
+    async def stream_speech_audio(self, text: str, max_parallel: int = 3) -> AsyncIterator[Tuple[int, bytes]]:
+        """
+        Yield (index, audio bytes) per sentence, in order, as soon as each is ready.
 
-    def refresh_available_databases(self):
+        Sentences are synthesized concurrently, at most max_parallel at a time,
+        so the first one can play while the rest are still being generated.
+        """
+        sentences = split_sentences(text)
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def synthesize(sentence):
+            async with semaphore:
+                return await asyncio.to_thread(self.synthesize_speech, sentence)
+
+        tasks = [asyncio.ensure_future(synthesize(sentence)) for sentence in sentences]
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(text("SHOW DATABASES"))
-                self.available_databases = [
-                    row[0] for row in result 
-                    if row[0] not in ['information_schema', 'mysql', 'performance_schema', 'sys']
-                ]
-        except Exception as e:
-            print(f"Error refreshing databases: {str(e)}")
+            for index, task in enumerate(tasks):
+                try:
+                    audio_bytes = await task
+                except Exception as e:
+                    print(f"Text-to-speech error: {str(e)}")
+                    continue
+                yield index, audio_bytes
+        finally:
+            for task in tasks:
+                task.cancel()
 
     async def listen_for_speech(self, timeout_seconds: int = 15) -> str:
-        CHUNK = 1024
-        FORMAT = pyaudio.paInt16
-        CHANNELS = 1
-        RATE = 16000
-        SILENCE_THRESHOLD = 1000
-        MIN_AUDIO_LENGTH = 3
-        
-        p = pyaudio.PyAudio()
-        stream = p.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
+        # The device is opened once per process; later turns only subscribe
+        capture = AudioCaptureService.instance()
+        if not capture.running:
+            await asyncio.to_thread(capture.start)
+        vad = StreamingVAD(capture.rate, buffer_seconds=timeout_seconds + 1)
+        queue = capture.subscribe()
         
         print("\n🎤 Listening for speech...")
-        frames = []
-        start_time = time.time()
-        has_speech = False
-        silence_frames = 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_seconds
+        speech_start = None
+        speech_end = None
         
-        while True:
-            try:
-                data = stream.read(CHUNK, exception_on_overflow=False)
-                frames.append(data)
-                audio_data = np.frombuffer(data, dtype=np.int16)
-                amplitude = np.max(np.abs(audio_data))
-                
-                if amplitude > SILENCE_THRESHOLD:
-                    has_speech = True
-                    silence_frames = 0
-                elif has_speech:
-                    silence_frames += 1
-                    if silence_frames > 20:
+        try:
+            with tracing.stage("capture"):
+                while speech_end is None:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
                         break
-                        
-                if time.time() - start_time > timeout_seconds:
-                    break
-                    
-            except Exception as e:
-                print(f"Error reading audio stream: {str(e)}")
-                break
+                    try:
+                        start, end = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    for event in vad.process(capture.read(start, end)):
+                        if event.kind == SPEECH_START and speech_start is None:
+                            speech_start = event.sample
+                        elif event.kind == SPEECH_END and speech_start is not None:
+                            speech_end = event.sample
+        finally:
+            capture.unsubscribe(queue)
 
         print("✓ Processing speech...")
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-        
-        if not has_speech or len(frames) < int(RATE * MIN_AUDIO_LENGTH / CHUNK):
+        if speech_start is None:
             return ""
                 
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            temp_filename = temp_file.name
-            
-        with wave.open(temp_filename, 'wb') as wf:
-            wf.setnchannels(CHANNELS)
-            wf.setsampwidth(p.get_sample_size(FORMAT))
-            wf.setframerate(RATE)
-            wf.writeframes(b''.join(frames))
-            
-        with open(temp_filename, 'rb') as audio:
-            buffer_data = audio.read()
-                
-        payload = {"buffer": buffer_data}
-        options = PrerecordedOptions(
-            model="nova-2",
-            smart_format=True,
-            language="en-US",
-            punctuate=True
-        )
-        
+        return await self.transcribe_audio(vad.segment(speech_start, speech_end), capture.rate)
+
+    async def transcribe_audio(self, samples: np.ndarray, sample_rate: int = 16000) -> str:
+        """Transcribe 16-bit mono PCM from the browser or the local microphone"""
+        if samples is None or len(samples) == 0:
+            return ""
+
         try:
-            response = self.dg_client.listen.rest.v("1").transcribe_file(payload, options)
-            os.unlink(temp_filename)
-            
-            if hasattr(response.results, 'channels'):
-                transcript = response.results.channels[0].alternatives[0].transcript
-                print(f"\n✓ Transcribed: {transcript}")
-                return transcript
+            with tracing.stage("stt"):
+                transcript = await asyncio.to_thread(self.speech.transcribe, samples, sample_rate)
+            print(f"\n✓ Transcribed: {transcript}")
+            return transcript
         except Exception as e:
             print(f"Transcription error: {str(e)}")
-            os.unlink(temp_filename)
             return ""
+
+    async def classify_with_llm(self, query: str) -> str:
+        """Label a query with the classification prompt and log it as training data"""
+        First_prompt = f"""
+        Analyze this query exactly: "{query}"
+        
+        Classification Rules:
+
+        1. QUERY - Database information requests:
+        - Direct SQL queries
+        - Table data requests
+        - Record searches
+        - Database statistics
+        Examples: 
+        "Show me sales data"
+        "How many customers do we have"
+        "What are the top movies"
+        "Get rental information"
+
+        2. SWITCH - Database selection/switching:
+        - Explicit requests to change database
+        - Database connection requests
+        Examples:
+        "Switch to movierental database"
+        "Use the sales database"
+        "Connect to northwind"
+        "Change to customer database"
+
+        3. LIST - Database listing:
+        - Requests to show available databases
+        - Database enumeration
+        Examples:
+        "Show me all databases"
+        "What databases are available"
+        "List the databases"
+        "Show database options"
+
+        4. CREATIVE - Content generation:
+        - Poetry requests
+        - Story writing
+        - Creative descriptions
+        - Artistic content
+        Examples:
+        "Write a poem about spring"
+        "Tell me a story"
+        "Create a description of sunset"
+        "Make up a character"
+
+        5. EXPLANATION - Understanding requests:
+        - How things work
+        - Why things happen
+        - Process clarification
+        - Concept explanations
+        Examples:
+        "Explain how this works"
+        "Why did that happen"
+        "How does this system function"
+        "What's the reason for this"
+
+        6. GENERAL - Default interactions:
+        - Casual conversation
+        - Simple questions
+        - Basic interactions
+        - Non-specific queries
+        Examples:
+        "How are you"
+        "What's new"
+        "Nice to meet you"
+        "That's interesting"
+
+        7. TRANSITIONING - Context changes:
+        - Topic switches
+        - Subject changes
+        - Context shifts
+        Examples:
+        "Let's talk about something else"
+        "Moving on to"
+        "Can we discuss"
+        "Switching topics to"
+
+        Output exactly one word: QUERY, SWITCH, LIST, CREATIVE, EXPLANATION, GENERAL, or TRANSITIONING
+        For this specific query, the classification is:
+        """
         
-        return ""
+        started = time.perf_counter()
+        query_type = await self.get_llm_response(First_prompt)
+        query_type = query_type.strip().upper()
+        self.intent_classifier.record(query, query_type, time.perf_counter() - started)
+        return query_type
 
     async def process_query(self, query: str):
         if not query:
             return None
+        self.result_table = None
 
         try:
+            # Loaded once; every handler of this turn reads the same snapshot
+            with tracing.stage("memory_load"):
+                memory_context = self.memory_writer.snapshot(query)
+
+            # Local classifier first; the LLM prompt only below its confidence threshold
+            with tracing.stage("classify_local"):
+                query_type, local_confidence = self.intent_classifier.classify(query)
+            source = "local"
+            speculative = None
+            if query_type is None:
+                local_label, _ = self.intent_classifier.predict(query)
+                route = predict_route(self.mode_tracker, local_label, local_confidence,
+                                      min_streak=self.speculate_min_streak)
+                if route is not None:
+                    # Start the likely handler while the LLM classifies; its text waits
+                    self.partials.hold()
+                    speculative = Speculation(route, asyncio.create_task(
+                        self.speculate(route, query, memory_context)
+                    ))
+                try:
+                    classify_started = time.perf_counter()
+                    with tracing.stage("classify_llm"):
+                        query_type = await self.classify_with_llm(query)
+                    classify_seconds = time.perf_counter() - classify_started
+                except BaseException:
+                    if speculative is not None:
+                        speculative.task.cancel()
+                        self.partials.discard()
+                    raise
+                source = "llm"
+            print(f"\nQuery Classification: {query_type} ({source})")
             
-            First_prompt = f"""
-            Analyze this query exactly: "{query}"
-            
-            Classification Rules:
-
-            1. QUERY - Database information requests:
-            - Direct SQL queries
-            - Table data requests
-            - Record searches
-            - Database statistics
-            Examples: 
-            "Show me sales data"
-            "How many customers do we have"
-            "What are the top movies"
-            "Get rental information"
-
-            2. SWITCH - Database selection/switching:
-            - Explicit requests to change database
-            - Database connection requests
-            Examples:
-            "Switch to movierental database"
-            "Use the sales database"
-            "Connect to northwind"
-            "Change to customer database"
-
-            3. LIST - Database listing:
-            - Requests to show available databases
-            - Database enumeration
-            Examples:
-            "Show me all databases"
-            "What databases are available"
-            "List the databases"
-            "Show database options"
-
-            4. CREATIVE - Content generation:
-            - Poetry requests
-            - Story writing
-            - Creative descriptions
-            - Artistic content
-            Examples:
-            "Write a poem about spring"
-            "Tell me a story"
-            "Create a description of sunset"
-            "Make up a character"
-
-            5. EXPLANATION - Understanding requests:
-            - How things work
-            - Why things happen
-            - Process clarification
-            - Concept explanations
-            Examples:
-            "Explain how this works"
-            "Why did that happen"
-            "How does this system function"
-            "What's the reason for this"
-
-            6. GENERAL - Default interactions:
-            - Casual conversation
-            - Simple questions
-            - Basic interactions
-            - Non-specific queries
-            Examples:
-            "How are you"
-            "What's new"
-            "Nice to meet you"
-            "That's interesting"
-
-            7. TRANSITIONING - Context changes:
-            - Topic switches
-            - Subject changes
-            - Context shifts
-            Examples:
-            "Let's talk about something else"
-            "Moving on to"
-            "Can we discuss"
-            "Switching topics to"
-
-            Output exactly one word: QUERY, SWITCH, LIST, CREATIVE, EXPLANATION, GENERAL, or TRANSITIONING
-            For this specific query, the classification is:
-            """
-            
-            query_type = await self.get_llm_response(First_prompt)
-            query_type = query_type.strip().upper()
-            print(f"\nQuery Classification: {query_type}")
-            mode_mapping = {
-            "DATABASE": ConversationMode.DATABASE,
-            "CREATIVE": ConversationMode.CREATIVE,
-            "EXPLANATION": ConversationMode.EXPLANATION,
-            "GENERAL": ConversationMode.GENERAL,
-            "QUERY": ConversationMode.DATABASE,
-            "TRANSITIONING": ConversationMode.TRANSITIONING,
-            "SWITCH": ConversationMode.DATABASE,
-            "LIST": ConversationMode.DATABASE
-            }
-            
-            mode = mode_mapping.get(query_type, ConversationMode.GENERAL)
+            mode = MODE_MAPPING.get(query_type, ConversationMode.GENERAL)
             mode_changed = self.mode_tracker.update_mode(mode, 0.9)
             if mode_changed:
                 print(f"Mode switched to: {mode.value}")
                 print(f"Previous mode was: {self.mode_tracker.previous_mode.value if self.mode_tracker.previous_mode else 'None'}")
-            # Load both general and specialized memory contexts
-            memory_context = self.conversation_memory.load_memory_variables({"input": query})
-            if query_type == "GENERAL":
-                return await self.handle_general_conversation(query)
-            elif query_type == "SWITCH":
-                switch_result = await self.handle_database_switch(query)
-                if switch_result:
-                    return f"Switched to {self.selected_db_name} database. What would you like to know?"
-            elif mode == ConversationMode.CREATIVE:
-                return await self.handle_creative_request(query)
-
-            elif mode == ConversationMode.EXPLANATION:
-                return await self.handle_explanation_request(query)
-
-            elif mode == ConversationMode.TRANSITIONING:
-                return await self.handle_transition(query)        
-            elif query_type == "LIST":
-                db_list = ', '.join(self.available_databases)
-                return f"Available databases are: {db_list}. Which one would you like to explore?"
-            elif query_type == "QUERY":
-                if not self.agent_executor:
-                    return "Please select a database first before making database queries."
+
+            if speculative is not None and speculative.route == query_type:
+                print(f"✓ Speculative {query_type} dispatch confirmed")
+                self.shared.speculation.hit(classify_seconds)
+                await self.partials.release()
+                if query_type == "QUERY":
+                    response = await self.dispatch(query_type, query, memory_context, await speculative.task)
                 else:
-                    # Include both general and DB-specific context
-                    entity_context = self.entity_memory.load_memory_variables({"input": query})
-                    enhanced_query = f"""
-                    Previous conversation context: {memory_context.get('history', '')}
-                    Entity Memory: {entity_context}
-                    
-                    Current Query: {query}
-                    """
-                    
-                    events = self.agent_executor.stream(
-                        {"messages": [("user", enhanced_query)]},
-                        stream_mode="values",
-                    )
-                    
-                    response = None
-                    for event in events:
-                        message = event["messages"][-1]
-                        if (
-                            hasattr(message, 'content') 
-                            and not message.content.startswith('Tool Calls:')
-                            and not message.content.startswith('Name: ')
-                        ):
-                            response = message.content
-                    
-                    if response:
-                        # Save context for database queries
-                        self.entity_memory.save_context(
-                            {"input": query, "entities": {"db": self.db.schema if hasattr(self.db, 'schema') else None}},
-                            {"output": response}
-                        )
-            
-            # Save all interactions to the general conversation memory
-            if response:
-                self.conversation_memory.save_context(
-                    {"input": query},
-                    {"output": response}
-                )
+                    response = await speculative.task
+            else:
+                if speculative is not None:
+                    speculative.task.cancel()
+                    self.partials.discard()
+                    wasted = time.perf_counter() - speculative.started
+                    self.shared.speculation.miss(wasted)
+                    tracing.record("speculation_wasted", wasted)
+                    self.result_table = None
+                response = await self.dispatch(query_type, query, memory_context)
+
+            # Save all interactions to memory; the LLM work runs later in the writer
+            if response and response not in (QUERY_ERROR_TEXT, SELECT_DATABASE_FIRST_TEXT):
+                self.memory_writer.record(query, response, entities=query_type == "QUERY")
                 
             return response
             
         except Exception as e:
             print(f"Error processing query: {str(e)}")
-            return "I encountered an error processing your query. Please try rephrasing your question."
-    async def get_llm_response(self, prompt: str) -> str:
+            return QUERY_ERROR_TEXT
+
+    def speculate(self, route: str, query: str, memory_context: dict):
+        """
+        The work to start on a predicted route. Conversational handlers run
+        whole; QUERY only prepares, since its SQL runs in a thread that
+        cancellation cannot stop and it writes the query cache. The agent
+        and its SQL wait for the classification.
+        """
+        if route == "QUERY":
+            return self.prepare_database_query(query)
+        return self.dispatch(route, query, memory_context)
+
+    async def dispatch(self, query_type: str, query: str, memory_context: dict,
+                       prepared: Optional[Tuple[dict, str]] = None) -> Optional[str]:
+        """Run the handler for a classified query; prepared is a speculative QUERY's context"""
+        mode = MODE_MAPPING.get(query_type, ConversationMode.GENERAL)
+        if query_type == "GENERAL":
+            return await self.handle_general_conversation(query, memory_context)
+        elif query_type == "SWITCH":
+            switch_result = await self.handle_database_switch(query)
+            if switch_result:
+                return f"Switched to {self.selected_db_name} database. What would you like to know?"
+            return QUERY_ERROR_TEXT
+        elif mode == ConversationMode.CREATIVE:
+            return await self.handle_creative_request(query, memory_context)
+        elif mode == ConversationMode.EXPLANATION:
+            return await self.handle_explanation_request(query, memory_context)
+        elif mode == ConversationMode.TRANSITIONING:
+            return await self.handle_transition(query, memory_context)
+        elif query_type == "LIST":
+            db_list = ', '.join(self.available_databases)
+            return f"Available databases are: {db_list}. Which one would you like to explore?"
+        elif query_type == "QUERY":
+            if not self.agent_executor:
+                return SELECT_DATABASE_FIRST_TEXT
+            return await self.answer_database_query(query, memory_context, prepared)
+        return None
+
+    async def prepare_database_query(self, query: str) -> Tuple[dict, str]:
+        """
+        (entity memory, relevant schema) for a QUERY turn. Reads only, so it
+        is what a speculative QUERY runs ahead of classification.
+        """
+        # Include both general and DB-specific context. Entity extraction is
+        # an LLM call; it runs in a thread alongside the schema lookup.
+        async def load_entities():
+            with tracing.stage("entity_memory_load"):
+                return await asyncio.to_thread(self.memory_writer.entity_context, query)
+
+        # Hand the agent the few relevant tables up front instead of
+        # letting it list tables and fetch schemas through tools
+        async def load_schema():
+            try:
+                with tracing.stage("schema"):
+                    return await asyncio.to_thread(
+                        self.shared.relevant_schema, self.selected_db_name, query
+                    )
+            except Exception as e:
+                print(f"Warning: Error loading schema snapshot: {str(e)}")
+                return ""
+
+        entity_context, schema_context = await asyncio.gather(load_entities(), load_schema())
+        return entity_context, schema_context
+
+    async def answer_database_query(self, query: str, memory_context: dict,
+                                    prepared: Optional[Tuple[dict, str]] = None) -> Optional[str]:
+        """
+        Answer a QUERY turn from the query cache, or by running the SQL agent.
+        prepared is the result of prepare_database_query when it ran speculatively.
+        """
+        with tracing.stage("query_cache"):
+            cached = await self.answer_from_query_cache(query)
+        if cached:
+            return cached
+
+        entity_context, schema_context = prepared or await self.prepare_database_query(query)
+        schema_section = f"Relevant schema:\n{schema_context}\n" if schema_context else ""
+        enhanced_query = f"""
+        Previous conversation context: {memory_context.get('history', '')}
+        Entity Memory: {entity_context}
+        {schema_section}
+        Current Query: {query}
+        """
+        
         try:
-            response = await asyncio.wait_for(
-                asyncio.to_thread(self.llm.invoke, prompt),
-                timeout=30
+            response, messages = await asyncio.wait_for(
+                self.run_agent(enhanced_query), timeout=self.agent_timeout
             )
+        except asyncio.TimeoutError:
+            print(f"SQL agent exceeded its {self.agent_timeout}s deadline")
+            return LLM_TIMEOUT_TEXT
+        
+        self.result_table = latest_result(messages)
+        if response:
+            extracted = extract_sql_result(messages)
+            if extracted:
+                sql, result = extracted
+                self.shared.query_cache.put_result(self.selected_db_name, sql, result, self.result_table)
+                self.shared.query_cache.put_sql(self.selected_db_name, query, sql, response, result)
+        return response
+
+    async def run_agent(self, enhanced_query: str) -> Tuple[Optional[str], list]:
+        """
+        Run the SQL agent without blocking the event loop. Cancelling the
+        awaiting task stops it before its next LLM or tool step.
+        """
+        response = None
+        messages = []
+        step_started = time.perf_counter()
+        async for event in self.agent_executor.astream(
+            {"messages": [("user", enhanced_query)]},
+            stream_mode="values",
+        ):
+            messages = event["messages"]
+            message = messages[-1]
+            # Each event follows one graph step: an LLM call or a round of tool calls
+            step_type = getattr(message, "type", None)
+            if step_type in ("ai", "tool"):
+                tracing.record(f"agent_{'llm' if step_type == 'ai' else 'tools'}",
+                               time.perf_counter() - step_started)
+            step_started = time.perf_counter()
+            if (
+                hasattr(message, 'content') 
+                and not message.content.startswith('Tool Calls:')
+                and not message.content.startswith('Name: ')
+            ):
+                response = message.content
+        return response, messages
+
+    async def answer_from_query_cache(self, query: str) -> Optional[str]:
+        cache = self.shared.query_cache
+        hit = cache.get_sql(self.selected_db_name, query)
+        if not hit:
+            return None
+        sql, answer, digest = hit
+
+        cached_result = cache.get_result(self.selected_db_name, sql)
+        if cached_result is not None:
+            # The client gets the table with a cached answer too
+            result, self.result_table = cached_result
+        else:
+            # The answer is still known; only re-check the data behind it
+            try:
+                table = await asyncio.to_thread(self.shared.run_bounded, self.selected_db_name, sql)
+            except Exception as e:
+                print(f"Warning: Cached SQL failed, falling back to the agent: {str(e)}")
+                cache.invalidate(self.selected_db_name)
+                return None
+            self.result_table = table
+            result = table.sample_text(self.shared.result_limits.sample_rows)
+            cache.put_result(self.selected_db_name, sql, result, table)
+            if result_digest(result) != digest:
+                answer_prompt = f"""
+                Question: "{query}"
+                SQL: {sql}
+                Result: {result}
+                Task: Answer the question using only the result.
+                -limited to 1-2 sentences and no more than 120 characters
+                Answer:"""
+                answer = await self.get_llm_response(answer_prompt)
+                cache.put_sql(self.selected_db_name, query, sql, answer, result)
+
+        print("✓ Answered from query cache")
+        return answer
+
+    def export_state(self) -> dict:
+        """Mode, memories and database selection as plain data, for SessionStore"""
+        return {
+            "database": self.selected_db_name,
+            "mode": self.mode_tracker.snapshot(),
+            "memory": self.memory_writer.export_state(),
+        }
+
+    async def import_state(self, state: dict):
+        """Resume a session exported by export_state, without any LLM calls"""
+        self.mode_tracker = ModeTracker.restore(state["mode"])
+        self.memory_writer.import_state(state["memory"])
+        database = state.get("database")
+        if database and database != self.selected_db_name:
+            await self.handle_database_switch(database)
+
+    def take_result_table(self):
+        """The rows behind the last answer, once; None if it did not run SQL."""
+        table, self.result_table = self.result_table, None
+        return table
+
+    async def get_llm_response(self, prompt: str, stream: bool = False) -> str:
+        try:
+            with tracing.stage("llm"):
+                if stream:
+                    return await asyncio.wait_for(self.stream_llm_response(prompt), timeout=30)
+                response = await asyncio.wait_for(
+                    asyncio.to_thread(self.llm.invoke, prompt),
+                    timeout=30
+                )
             return response.content if response else ""
         except asyncio.TimeoutError:
             print("LLM request timed out")
-            return "I'm taking too long to process that. Could you please try again?"
+            return LLM_TIMEOUT_TEXT
         except asyncio.CancelledError:
+            # Let barge-in and disconnects cancel the whole turn
             print("\nOperation cancelled by user")
-            return "Operation cancelled"
+            raise
         except Exception as e:
             print(f"LLM error: {str(e)}")
-            return "I encountered an error. Could you please try again?"
+            return LLM_ERROR_TEXT
+
+    async def stream_llm_response(self, prompt: str) -> str:
+        """Stream a reply, forwarding each token to the client, and return the whole text"""
+        started = time.perf_counter()
+        parts = []
+        async for chunk in self.llm.astream(prompt):
+            if not chunk.content:
+                continue
+            if not parts:
+                tracing.record("llm_first_token", time.perf_counter() - started)
+            parts.append(chunk.content)
+            await self.partials.emit(chunk.content)
+        return "".join(parts)
 
     async def handle_database_switch(self, query_or_db_name: str) -> bool:
         """
@@ -394,16 +853,23 @@ class VoiceSQLAssistant:
             bool: True if switch successful, False otherwise
         """
         try:
-            # Extract database name if passed in query form
-            db_matching_prompt = f"""
-            User query: "{query_or_db_name}"
-            Available databases: {self.available_databases}
-            Task: Extract exact database name from query.
-            Return NONE if no match found.
-            Output one database name or NONE:"""
-            
-            selected_db = await self.get_llm_response(db_matching_prompt)
-            selected_db = selected_db.strip().lower()
+            # Exact and near matches resolve locally; only ties go to the LLM
+            match, candidates = self.shared.db_resolver.resolve(query_or_db_name or "")
+            if match:
+                selected_db = match.lower()
+            elif len(candidates) > 1:
+                # Extract database name if passed in query form
+                db_matching_prompt = f"""
+                User query: "{query_or_db_name}"
+                Available databases: {candidates}
+                Task: Extract exact database name from query.
+                Return NONE if no match found.
+                Output one database name or NONE:"""
+                
+                selected_db = await self.get_llm_response(db_matching_prompt)
+                selected_db = selected_db.strip().lower()
+            else:
+                selected_db = "none"
             
             # Normalize database names for matching
             available_dbs = {db.lower(): db for db in self.available_databases}
@@ -411,61 +877,16 @@ class VoiceSQLAssistant:
             if selected_db != "none" and selected_db in available_dbs:
                 actual_db_name = available_dbs[selected_db]
                 
-                # Close existing connections if any
-                if hasattr(self, 'db') and self.db is not None:
-                    try:
-                        self.db.dispose()
-                    except Exception as e:
-                        print(f"Warning: Error disposing old connection: {str(e)}")
-                
                 try:
-                    # Create new connection string with specific database
-                    username = os.getenv("DB_USER", "harsha")
-                    password = quote_plus(os.getenv("DB_PASSWORD", "HarshaV@123"))
-                    host = os.getenv("DB_HOST", "localhost")
-                    port = os.getenv("DB_PORT", "3306")
-                    
-                    connection_string = f"mysql+pymysql://{username}:{password}@{host}:{port}/{actual_db_name}"
-                    specific_engine = create_engine(
-                        connection_string,
-                        pool_pre_ping=True,
-                        pool_recycle=3600,
-                        pool_size=5,
-                        max_overflow=10
-                    )
-                    
-                    # Test connection with timeout
-                    with specific_engine.connect() as conn:
-                        result = conn.execute(text("SELECT 1"))
-                        if not result:
-                            raise Exception("Connection test failed")
-                    
-                    # Initialize SQLDatabase instance
-                    self.db = SQLDatabase(specific_engine, actual_db_name)
+                    # Recently used databases come straight from the shared cache
+                    bundle = await asyncio.to_thread(self.shared.agent_cache.get, actual_db_name)
+                    self.db = bundle.db
+                    self.agent_executor = bundle.agent
                     self.selected_db_name = actual_db_name
                     
                     # Update mode tracker
                     self.mode_tracker.set_db_connection(True)
                     
-                    # Initialize toolkit and agent executor
-                    toolkit = SQLDatabaseToolkit(db=self.db, llm=self.llm)
-                    
-                    # Get the latest prompt template
-                    try:
-                        prompt_template = hub.pull("langchain-ai/sql-agent-system-prompt")
-                        system_message = prompt_template.format(dialect="MySQL", top_k=5)
-                    except Exception as e:
-                        print(f"Warning: Error pulling prompt template: {str(e)}")
-                        # Fallback to basic system message
-                        system_message = "You are an agent that helps users interact with MySQL databases."
-                    
-                    # Create new agent executor
-                    self.agent_executor = create_react_agent(
-                        self.llm,
-                        toolkit.get_tools(),
-                        state_modifier=system_message
-                    )
-                    
                     print(f"Successfully switched to database: {actual_db_name}")
                     return True
                     
@@ -473,6 +894,7 @@ class VoiceSQLAssistant:
                     print(f"Error during database connection: {str(e)}")
                     # Reset connection state
                     self.db = None
+                    self.agent_executor = None
                     self.selected_db_name = None
                     self.mode_tracker.set_db_connection(False)
                     return False
@@ -484,7 +906,12 @@ class VoiceSQLAssistant:
         except Exception as e:
             print(f"Error in handle_database_switch: {str(e)}")
             return False
-    async def handle_creative_request(self, query: str) -> str:
+    def history(self, query: str, memory_context: Optional[dict]):
+        if memory_context is None:
+            memory_context = self.memory_writer.snapshot(query)
+        return memory_context.get('history', '')
+
+    async def handle_creative_request(self, query: str, memory_context: Optional[dict] = None) -> str:
         creative_prompt = f"""
         Input: "{query}"
         Task: Generate creative content in concise words
@@ -495,12 +922,12 @@ class VoiceSQLAssistant:
         - Follow user's specified format (poem/story/etc)
         - Keep creative elements cohesive
         -limited to 1-2 sentences and no more than 120 characters
-        Context: Previous creative outputs: {self.conversation_memory.load_memory_variables({"input": query}).get('history', '')}
+        Context: Previous creative outputs: {self.history(query, memory_context)}
         Generate:"""
 
-        return await self.get_llm_response(creative_prompt)
+        return await self.get_llm_response(creative_prompt, stream=True)
 
-    async def handle_explanation_request(self, query: str) -> str:
+    async def handle_explanation_request(self, query: str, memory_context: Optional[dict] = None) -> str:
         explanation_prompt = f"""
         Question: "{query}"
         Task: Explain concept/process
@@ -511,12 +938,12 @@ class VoiceSQLAssistant:
         - Focus on key points
         - Avoid unnecessary jargon
         -limited to 1-2 sentences and no more than 120 characters
-        Previous context: {self.conversation_memory.load_memory_variables({"input": query}).get('history', '')}
+        Previous context: {self.history(query, memory_context)}
         Explain:"""
 
-        return await self.get_llm_response(explanation_prompt)
+        return await self.get_llm_response(explanation_prompt, stream=True)
 
-    async def handle_transition(self, query: str) -> str:
+    async def handle_transition(self, query: str, memory_context: Optional[dict] = None) -> str:
         transition_prompt = f"""
         Current query: "{query}"
         From mode: {self.mode_tracker.previous_mode}
@@ -527,14 +954,13 @@ class VoiceSQLAssistant:
         - Bridge previous and new topics
         - Clear closure of previous topic
         - Set context for new topic
-        Previous context: {self.conversation_memory.load_memory_variables({"input": query}).get('history', '')}
+        Previous context: {self.history(query, memory_context)}
         Response:"""
 
-        return await self.get_llm_response(transition_prompt)
-    async def handle_general_conversation(self, query: str) -> str:
-        # Load full conversation history
-        memory_context = self.conversation_memory.load_memory_variables({"input": query})
-        chat_history = memory_context.get('history', '')
+        return await self.get_llm_response(transition_prompt, stream=True)
+    async def handle_general_conversation(self, query: str, memory_context: Optional[dict] = None) -> str:
+        # Full conversation history, from the turn's snapshot
+        chat_history = self.history(query, memory_context)
         conversation_prompt = f"""
         User query: "{query}"
         Full conversation history: {chat_history}
@@ -547,15 +973,7 @@ class VoiceSQLAssistant:
         -limited to 1-2 sentences and no more than 120 characters
         """
         
-        response = await self.get_llm_response(conversation_prompt)
-        
-        # Save context for all conversations
-        self.conversation_memory.save_context(
-            {"input": query},
-            {"output": response}
-        )
-        
-        return response
+        return await self.get_llm_response(conversation_prompt, stream=True)
 
 async def main():
     # Load environment variables
@@ -589,12 +1007,13 @@ async def main():
                     continue
                     
                 if query.lower() in ['quit', 'exit', 'bye', 'goodbye', 'thank you', 'thanks thats it']:
-                    print("\nGoodbye! Have a great day!")
+                    print(f"\n{GOODBYE_TEXT}")
                     break
                     
                 response = await assistant.process_query(query)
                 if response:
                     print("\n" + response)
+                assistant.memory_writer.schedule()
                 
             except KeyboardInterrupt:
                 print("\n\nGracefully shutting down... Please wait.")
@@ -612,8 +1031,9 @@ async def main():
         # Cleanup code
         print("\nClosing all connections...")
         try:
-            if hasattr(assistant, 'engine'):
-                assistant.engine.dispose()
+            if hasattr(assistant, 'shared'):
+                assistant.shared.dispose()
+            AudioCaptureService.instance().close()
         except Exception as e:
             print(f"Error during cleanup: {str(e)}")
         print("Goodbye!")
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pyaudio
+
+
+class AudioCaptureService:
+    """
+    Long-lived microphone capture shared by the whole process.
+
+    PyAudio runs in callback mode on its own thread and copies each block into
+    a ring buffer. The callback is the only writer and publishes the new end
+    offset after the copy, so readers need no lock. Coroutines subscribe to an
+    asyncio.Queue of (start, end) offsets that is fed with
+    call_soon_threadsafe and never block the event loop.
+    """
+
+    _instance: Optional["AudioCaptureService"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, rate: int = 16000, chunk: int = 1024, buffer_seconds: float = 30.0):
+        self.rate = rate
+        self.chunk = chunk
+        self.ring = np.zeros(int(rate * buffer_seconds), dtype=np.int16)
+        self.written = 0
+        self.overflows = 0
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._pyaudio = None
+        self._stream = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "AudioCaptureService":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @property
+    def running(self) -> bool:
+        return self._stream is not None
+
+    def start(self):
+        """Open the input device once per process; later calls are no-ops."""
+        with self._start_lock:
+            if self._stream is not None:
+                return
+            self._pyaudio = pyaudio.PyAudio()
+            self._stream = self._pyaudio.open(
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=self.rate,
+                input=True,
+                frames_per_buffer=self.chunk,
+                stream_callback=self._callback
+            )
+            self._stream.start_stream()
+            print("Audio capture started")
+
+    def close(self):
+        with self._start_lock:
+            if self._stream is not None:
+                self._stream.stop_stream()
+                self._stream.close()
+                self._stream = None
+            if self._pyaudio is not None:
+                self._pyaudio.terminate()
+                self._pyaudio = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status:
+            self.overflows += 1
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        capacity = len(self.ring)
+        start = self.written
+        position = start % capacity
+        first = min(len(samples), capacity - position)
+        self.ring[position:position + first] = samples[:first]
+        self.ring[:len(samples) - first] = samples[first:]
+        end = start + len(samples)
+        self.written = end
+
+        for loop, queue in list(self.subscribers):
+            loop.call_soon_threadsafe(self._deliver, queue, start, end)
+        return (None, pyaudio.paContinue)
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, start: int, end: int):
+        if queue.full():
+            # A slow consumer loses its oldest block rather than stalling capture
+            queue.get_nowait()
+        queue.put_nowait((start, end))
+
+    def subscribe(self, maxsize: int = 256) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=maxsize)
+        self.subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers = [(loop, q) for loop, q in self.subscribers if q is not queue]
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Copy samples between two stream offsets that have not been overwritten yet."""
+        start = max(start, self.written - len(self.ring))
+        if start >= end:
+            return np.zeros(0, dtype=np.int16)
+        return self.ring[np.arange(start, end) % len(self.ring)]
@@ -0,0 +1,75 @@
+import io
+import wave
+
+import numpy as np
+
+
+class AudioBuffer:
+    """
+    Preallocated 16-bit mono PCM buffer filled from binary WebSocket frames.
+
+    Frames are viewed in place with np.frombuffer and copied once, straight
+    into the preallocated array, so an utterance costs no per-frame
+    allocations and no JSON encoding.
+    """
+
+    def __init__(self, sample_rate: int = 16000, max_seconds: float = 15.0):
+        self.sample_rate = sample_rate
+        self.samples = np.zeros(int(sample_rate * max_seconds), dtype=np.int16)
+        self.length = 0
+        self.truncated = False
+        self._pending_byte = b""
+
+    @property
+    def capacity(self) -> int:
+        return len(self.samples)
+
+    @property
+    def duration(self) -> float:
+        return self.length / self.sample_rate
+
+    def reset(self, sample_rate: int = None):
+        if sample_rate and sample_rate != self.sample_rate:
+            max_seconds = self.capacity / self.sample_rate
+            self.sample_rate = sample_rate
+            self.samples = np.zeros(int(sample_rate * max_seconds), dtype=np.int16)
+        self.length = 0
+        self.truncated = False
+        self._pending_byte = b""
+
+    def write(self, data: bytes) -> np.ndarray:
+        """Append little-endian int16 PCM bytes and return a view of the new samples."""
+        if self._pending_byte:
+            # Only happens if a client splits a sample across frames
+            data = self._pending_byte + bytes(data)
+            self._pending_byte = b""
+        if len(data) % 2:
+            self._pending_byte = bytes(data[-1:])
+        count = len(data) // 2
+
+        space = self.capacity - self.length
+        if count > space:
+            self.truncated = True
+            count = space
+        if count <= 0:
+            return self.samples[self.length:self.length]
+
+        incoming = np.frombuffer(data, dtype="<i2", count=count)
+        start = self.length
+        self.samples[start:start + count] = incoming
+        self.length += count
+        return self.samples[start:self.length]
+
+    def view(self) -> np.ndarray:
+        return self.samples[:self.length]
+
+
+def pcm_to_wav(samples: np.ndarray, sample_rate: int = 16000) -> bytes:
+    """Wrap int16 mono PCM in an in-memory WAV container."""
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(memoryview(np.ascontiguousarray(samples, dtype=np.int16)))
+    return output.getvalue()
@@ -0,0 +1,104 @@
+"""
+Offline accuracy/latency benchmark for IntentClassifier against LLM labels.
+
+Input is the JSONL log written by the assistant when VOX_INTENT_LOG is set:
+one {"text", "label", "llm_latency"} object per LLM-classified transcript.
+Entries are split into k folds; each fold is scored by a classifier trained
+on the seed examples plus the other folds. Without a log the seed examples
+themselves are cross-validated.
+
+    python benchmarks/bench_intent.py intent_log.jsonl --threshold 0.7
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_classifier import IntentClassifier, INTENT_EXAMPLES, LABELS  # noqa: E402
+
+
+def load_log(path):
+    entries = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("label") in LABELS and entry.get("text"):
+                entries.append(entry)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("log", nargs="?", help="JSONL of LLM-labelled transcripts")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    seed = [(text, label) for label, texts in INTENT_EXAMPLES.items() for text in texts]
+    if args.log:
+        entries = load_log(args.log)
+        base = seed
+    else:
+        entries = [{"text": text, "label": label} for text, label in seed]
+        base = []
+    if not entries:
+        print("No labelled entries to evaluate")
+        return
+
+    order = np.random.default_rng(0).permutation(len(entries))
+    folds = np.array_split(order, min(args.folds, len(entries)))
+
+    classifier = IntentClassifier(threshold=args.threshold)
+    covered = correct_covered = correct_total = 0
+    local_times = []
+    confusion = np.zeros((len(LABELS), len(LABELS)), dtype=int)
+    for fold in folds:
+        held_out = set(fold.tolist())
+        training = base + [(entries[i]["text"], entries[i]["label"])
+                           for i in range(len(entries)) if i not in held_out]
+        classifier.train(training)
+        for i in fold:
+            entry = entries[i]
+            started = time.perf_counter()
+            label, confidence = classifier.predict(entry["text"])
+            local_times.append(time.perf_counter() - started)
+            confusion[LABELS.index(entry["label"]), LABELS.index(label)] += 1
+            if confidence >= args.threshold:
+                covered += 1
+                correct_covered += label == entry["label"]
+                correct_total += label == entry["label"]
+            else:
+                # Below threshold the LLM label is used, which is the reference
+                correct_total += 1
+
+    n = len(entries)
+    llm_latencies = [e["llm_latency"] for e in entries if "llm_latency" in e]
+    local_latency = float(np.mean(local_times))
+    print(f"Entries:                {n}")
+    print(f"Local coverage:         {covered / n:.1%} at threshold {args.threshold}")
+    print(f"Accuracy when local:    {correct_covered / covered:.1%}" if covered else "Accuracy when local:    n/a")
+    print(f"End-to-end agreement:   {correct_total / n:.1%}")
+    print(f"Local latency:          {local_latency * 1e6:.0f} us mean, "
+          f"{np.percentile(local_times, 95) * 1e6:.0f} us p95")
+    if llm_latencies:
+        llm_latency = float(np.mean(llm_latencies))
+        expected = covered / n * local_latency + (1 - covered / n) * llm_latency
+        print(f"LLM latency:            {llm_latency * 1000:.0f} ms mean")
+        print(f"Expected per query:     {expected * 1000:.0f} ms (was {llm_latency * 1000:.0f} ms)")
+
+    print("\nConfusion (rows = LLM label, columns = local label):")
+    print(" " * 14 + "".join(f"{label[:6]:>8}" for label in LABELS))
+    for label, row in zip(LABELS, confusion):
+        print(f"{label:<14}" + "".join(f"{count:>8}" for count in row))
+
+
+if __name__ == "__main__":
+    main()
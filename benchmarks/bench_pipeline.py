@@ -0,0 +1,186 @@
+"""
+Offline per-stage benchmark of the VOX pipeline against local stand-ins.
+
+Deepgram, OpenAI and MySQL are replaced by the deterministic fakes in
+benchmarks/fakes.py, each with a configurable latency. The harness drives
+endpointing (StreamingVAD over WAV fixtures), transcription,
+VoiceSQLAssistant.process_query per intent, get_speech_audio and
+handle_database_switch, and reports per stage: wall time, CPU time, wall
+time net of simulated vendor latency, and traced memory (peak and retained).
+A breakdown from the tracing layer follows.
+
+    python benchmarks/bench_pipeline.py --iterations 20 --llm-ms 300 --stt-ms 150 --tts-ms 120
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import DEFAULT_CASES, OfflineResources, VendorClock  # noqa: E402
+from bench_vad import CHUNK, generate_fixtures, load_wav  # noqa: E402
+import tracing  # noqa: E402
+from assistant import VoiceSQLAssistant  # noqa: E402
+from vad import StreamingVAD, SPEECH_START, SPEECH_END  # noqa: E402
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.wall = []
+        self.cpu = []
+        self.own = []
+        self.peak = []
+        self.retained = []
+
+    def row(self):
+        def ms(values, q=0.5):
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+        return (f"{self.name:<28}{len(self.wall):>5}{ms(self.wall):>10.1f}{ms(self.wall, 0.95):>10.1f}"
+                f"{ms(self.own):>10.1f}{ms(self.cpu):>10.1f}"
+                f"{statistics.median(self.peak) / 1024:>10.0f}{statistics.median(self.retained) / 1024:>10.0f}")
+
+
+async def measure(stats, clock, run, quiet=True):
+    """Run one call and add its wall, CPU, own-code wall and memory to stats."""
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    vendor_before = clock.total()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        result = await run()
+    wall = time.perf_counter() - wall_before
+    stats.wall.append(wall)
+    stats.cpu.append(time.process_time() - cpu_before)
+    stats.own.append(max(0.0, wall - (clock.total() - vendor_before)))
+    current, peak = tracemalloc.get_traced_memory()
+    stats.peak.append(peak - memory_before)
+    stats.retained.append(current - memory_before)
+    return result
+
+
+def endpoint(samples, rate):
+    """Feed a fixture through StreamingVAD in client-sized chunks, as server.py does."""
+    vad = StreamingVAD(rate, buffer_seconds=len(samples) / rate + 1)
+    start = None
+    for offset in range(0, len(samples), CHUNK):
+        for event in vad.process(samples[offset:offset + CHUNK]):
+            if event.kind == SPEECH_START and start is None:
+                start = event.sample
+            elif event.kind == SPEECH_END and start is not None:
+                return vad.segment(start, event.sample)
+    return vad.segment(start) if start is not None else samples
+
+
+def load_cases(path):
+    if not path:
+        return DEFAULT_CASES
+    with open(path) as f:
+        return json.load(f)
+
+
+async def run(args):
+    clock = VendorClock()
+    cases = load_cases(args.cases)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="vox-bench-")
+    with contextlib.redirect_stdout(io.StringIO()):
+        shared = OfflineResources(workdir, clock, cases, llm_latency=args.llm_ms / 1000,
+                                  stt_latency=args.stt_ms / 1000, tts_latency=args.tts_ms / 1000,
+                                  rentals=args.rentals)
+    fixtures = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    if not fixtures:
+        generate_fixtures(args.fixtures)
+        fixtures = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    wavs = [load_wav(path) for path in fixtures]
+
+    tracing.metrics = tracing.Metrics()
+    tracemalloc.start()
+    stages = {}
+
+    def stats(name):
+        return stages.setdefault(name, StageStats(name))
+
+    quiet = not args.verbose
+    for iteration in range(args.iterations):
+        # A fresh session each iteration; shared caches stay warm as in production
+        assistant = VoiceSQLAssistant(None, None, shared=shared)
+        if args.cold:
+            shared.query_cache.invalidate("movierental")
+        await measure(stats("handle_database_switch"), clock,
+                      lambda: assistant.handle_database_switch("movierental"), quiet)
+
+        for samples, rate in wavs:
+            await measure(stats("endpointing"), clock, lambda: asyncio.to_thread(endpoint, samples, rate), quiet)
+            segment = endpoint(samples, rate)
+            shared.dg_client.expect(cases[iteration % len(cases)]["text"])
+            await measure(stats("transcribe_audio"), clock,
+                          lambda: assistant.transcribe_audio(segment, rate), quiet)
+
+        for case in cases:
+            if case["intent"] == "SWITCH":
+                continue
+            response = await measure(
+                stats(f"process_query:{case['intent']}"), clock,
+                lambda: traced(assistant, case["text"]), quiet
+            )
+            if response:
+                # Unique text misses the TTS cache; repeating it hits
+                spoken = f"{response} Run {iteration}."
+                await measure(stats("get_speech_audio:miss"), clock,
+                              lambda: assistant.get_speech_audio(spoken), quiet)
+                await measure(stats("get_speech_audio:hit"), clock,
+                              lambda: assistant.get_speech_audio(spoken), quiet)
+        assistant.memory_writer.close()
+
+    tracemalloc.stop()
+    print(f"{'stage':<28}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'own ms':>10}{'cpu ms':>10}"
+          f"{'peak KiB':>10}{'kept KiB':>10}")
+    for name in sorted(stages):
+        print(stages[name].row())
+
+    print("\nTraced stages (wall, all iterations):")
+    for stage, summary in tracing.metrics.summary().items():
+        print(f"  {stage:<22} n={summary['count']:<5} p50={summary['p50'] * 1000:.1f}ms "
+              f"p95={summary['p95'] * 1000:.1f}ms p99={summary['p99'] * 1000:.1f}ms")
+    print("\nSimulated vendor time: " + ", ".join(
+        f"{vendor} {seconds:.2f}s/{clock.calls[vendor]} calls" for vendor, seconds in sorted(clock.seconds.items())
+    ))
+    shared.dispose()
+
+
+async def traced(assistant, text):
+    with tracing.turn("bench", assistant.selected_db_name):
+        return await assistant.process_query(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures"),
+                        help="directory of 16-bit mono WAV files (generated if empty)")
+    parser.add_argument("--cases", help="JSON list of {text, intent, sql} cases")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--llm-ms", type=float, default=0.0)
+    parser.add_argument("--stt-ms", type=float, default=0.0)
+    parser.add_argument("--tts-ms", type=float, default=0.0)
+    parser.add_argument("--rentals", type=int, default=5000, help="rows in the sample rental table")
+    parser.add_argument("--workdir", help="where the SQLite databases are kept (default: a temp dir)")
+    parser.add_argument("--cold", action="store_true", help="clear the query cache every iteration")
+    parser.add_argument("--verbose", action="store_true", help="show the assistant's own output")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Speech backend comparison: the same WAV and text fixtures through each
+provider in speech_backends.py.
+
+For transcription and synthesis separately, the report gives latency
+percentiles, real-time factor (processing time over audio duration; below 1
+is faster than real time) and CPU seconds per call, counting this process
+and, for the local backend, its worker processes. Deepgram's CPU figure is
+only the client side of the HTTPS call.
+
+    python benchmarks/bench_speech.py --backends deepgram,local --iterations 5
+
+The local backend reads VOX_LOCAL_TTS_VOICE (a Piper .onnx voice) and
+VOX_LOCAL_STT_MODEL; Deepgram needs DEEPGRAM_API_KEY.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_vad import generate_fixtures, load_wav  # noqa: E402
+from speech_backends import build_speech_backend  # noqa: E402
+
+DEFAULT_TEXTS = [
+    "Connected to movierental database. How can I help you?",
+    "There are 1,042 rentals this month, up twelve percent on last month.",
+    "The top three customers by total payments are Karl Seal, Eleanor Hunt and Clara Shaw.",
+    "I encountered an error processing your query. Please try rephrasing your question.",
+]
+# Deepgram Aura returns 48 kbps mp3 by default
+MP3_BITS_PER_SECOND = 48000
+
+
+def audio_seconds(audio_bytes: bytes, audio_type: str) -> float:
+    if audio_type == "audio/wav":
+        with wave.open(io.BytesIO(audio_bytes), 'rb') as wf:
+            return wf.getnframes() / wf.getframerate()
+    return len(audio_bytes) * 8 / MP3_BITS_PER_SECOND
+
+
+def worker_cpu(backend) -> float:
+    return backend.stats().get("worker_cpu_seconds", 0.0)
+
+
+class Measurements:
+    def __init__(self):
+        self.latency = []
+        self.rtf = []
+        self.cpu = []
+
+    def add(self, seconds, audio_duration, cpu):
+        self.latency.append(seconds)
+        self.rtf.append(seconds / audio_duration if audio_duration else float("nan"))
+        self.cpu.append(cpu)
+
+    def row(self, label):
+        def ms(q):
+            return float(np.percentile(self.latency, q)) * 1000
+
+        return (f"{label:<22}{len(self.latency):>5}{ms(50):>10.0f}{ms(95):>10.0f}"
+                f"{float(np.nanmedian(self.rtf)):>8.3f}{float(np.median(self.cpu)) * 1000:>10.0f}")
+
+
+def measure(backend, call):
+    cpu_before = time.process_time() + worker_cpu(backend)
+    started = time.perf_counter()
+    result = call()
+    seconds = time.perf_counter() - started
+    return result, seconds, time.process_time() + worker_cpu(backend) - cpu_before
+
+
+def bench_backend(name, args, wavs, texts):
+    backend = build_speech_backend(os.getenv("DEEPGRAM_API_KEY"), name)
+    try:
+        warm_started = time.perf_counter()
+        backend.warm()
+        print(f"{name}: warm-up {time.perf_counter() - warm_started:.2f}s")
+        # One untimed call each, so lazy connections and model pages are in place
+        backend.transcribe(*wavs[0][1:])
+        backend.synthesize(texts[0])
+
+        stt, tts = Measurements(), Measurements()
+        for _ in range(args.iterations):
+            for path, samples, rate in wavs:
+                transcript, seconds, cpu = measure(backend, lambda: backend.transcribe(samples, rate))
+                stt.add(seconds, len(samples) / rate, cpu)
+                if args.verbose:
+                    print(f"  {os.path.basename(path)}: {transcript!r}")
+            for text in texts:
+                audio_bytes, seconds, cpu = measure(backend, lambda: backend.synthesize(text))
+                tts.add(seconds, audio_seconds(audio_bytes, backend.audio_type), cpu)
+        return stt.row(f"{name} stt"), tts.row(f"{name} tts")
+    finally:
+        backend.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backends", default="deepgram,local", help="comma-separated backend names")
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures"),
+                        help="directory of 16-bit mono WAV files (generated if empty)")
+    parser.add_argument("--texts", help="file of sentences to synthesize, one per line")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="print each transcript")
+    args = parser.parse_args()
+    load_dotenv()
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    if not paths:
+        generate_fixtures(args.fixtures)
+        paths = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    wavs = [(path, *load_wav(path)) for path in paths]
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = DEFAULT_TEXTS
+
+    rows = []
+    for name in args.backends.split(","):
+        try:
+            rows += bench_backend(name.strip(), args, wavs, texts)
+        except Exception as e:
+            print(f"{name}: skipped ({type(e).__name__}: {e})")
+
+    print(f"\n{'backend':<22}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'rtf':>8}{'cpu ms':>10}")
+    for row in rows:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+End-of-turn latency benchmark for StreamingVAD against the legacy
+peak-amplitude rule (20 silent 1024-sample chunks, 3 s minimum).
+
+Fixtures are 16-bit mono WAV files. An optional sidecar <name>.json with
+{"speech_end": seconds} gives the labelled end of speech; without it the
+last loud chunk is used. Run with --generate to write synthetic fixtures.
+
+    python benchmarks/bench_vad.py benchmarks/fixtures
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vad import StreamingVAD, SPEECH_END  # noqa: E402
+
+CHUNK = 1024
+
+
+def load_wav(path):
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+            raise ValueError(f"{path}: expected 16-bit mono PCM")
+        rate = wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    return samples, rate
+
+
+def label_for(path, samples, rate):
+    sidecar = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            return float(json.load(f)["speech_end"])
+    loud = np.nonzero(np.abs(samples) > 1000)[0]
+    return (loud[-1] + 1) / rate if len(loud) else None
+
+
+def legacy_endpoint(samples, rate, threshold=1000, silent_chunks=20, min_audio_length=3):
+    """Replays the old listen_for_speech rule; returns (decision_time, accepted)."""
+    has_speech = False
+    silence = 0
+    n_chunks = 0
+    for start in range(0, len(samples), CHUNK):
+        n_chunks += 1
+        if np.max(np.abs(samples[start:start + CHUNK])) > threshold:
+            has_speech = True
+            silence = 0
+        elif has_speech:
+            silence += 1
+            if silence > silent_chunks:
+                break
+    decision = min(n_chunks * CHUNK, len(samples)) / rate
+    accepted = has_speech and n_chunks >= int(rate * min_audio_length / CHUNK)
+    return decision, accepted
+
+
+def vad_endpoint(samples, rate, **options):
+    vad = StreamingVAD(rate, buffer_seconds=len(samples) / rate + 1, **options)
+    for start in range(0, len(samples), CHUNK):
+        for event in vad.process(samples[start:start + CHUNK]):
+            if event.kind == SPEECH_END:
+                return min(start + CHUNK, len(samples)) / rate, True
+    return len(samples) / rate, vad.speech_start is not None
+
+
+def generate_fixtures(directory, rate=16000, seed=7):
+    """Write synthetic utterances (modulated harmonics over noise) with labels."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    for name, lead, speech, tail, noise in [
+        ("short_command", 0.4, 0.9, 2.0, 40),
+        ("medium_query", 0.6, 2.5, 2.0, 60),
+        ("long_query", 0.5, 5.0, 2.0, 60),
+        ("noisy_room", 0.8, 2.0, 2.0, 250),
+    ]:
+        t = np.arange(int(rate * speech)) / rate
+        envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 3.5 * t)
+        voice = sum(np.sin(2 * np.pi * f * t) / (k + 1) for k, f in enumerate((140, 280, 420, 560)))
+        parts = [
+            rng.normal(0, noise, int(rate * lead)),
+            2500 * envelope * voice + rng.normal(0, noise, len(t)),
+            rng.normal(0, noise, int(rate * tail)),
+        ]
+        samples = np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+        path = os.path.join(directory, name + ".wav")
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(rate)
+            wf.writeframes(samples.tobytes())
+        with open(os.path.join(directory, name + ".json"), "w") as f:
+            json.dump({"speech_end": lead + speech}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("fixtures", nargs="?", default=os.path.join(os.path.dirname(__file__), "fixtures"))
+    parser.add_argument("--generate", action="store_true", help="write synthetic fixtures first")
+    parser.add_argument("--hangover-ms", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_fixtures(args.fixtures)
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    if not paths:
+        print(f"No WAV fixtures in {args.fixtures} (use --generate)")
+        return
+
+    print(f"{'fixture':<20}{'legacy eot':>12}{'vad eot':>10}{'saved':>9}{'legacy ok':>11}{'vad x-rt':>10}")
+    savings = []
+    for path in paths:
+        samples, rate = load_wav(path)
+        speech_end = label_for(path, samples, rate)
+        if speech_end is None:
+            continue
+        legacy_time, legacy_ok = legacy_endpoint(samples, rate)
+
+        started = time.perf_counter()
+        vad_time, _ = vad_endpoint(samples, rate, hangover_ms=args.hangover_ms)
+        elapsed = time.perf_counter() - started
+
+        legacy_eot = legacy_time - speech_end
+        vad_eot = vad_time - speech_end
+        savings.append(legacy_eot - vad_eot)
+        print(f"{os.path.basename(path):<20}{legacy_eot * 1000:>10.0f}ms{vad_eot * 1000:>8.0f}ms"
+              f"{(legacy_eot - vad_eot) * 1000:>7.0f}ms{str(legacy_ok):>11}{len(samples) / rate / elapsed:>9.0f}x")
+
+    if savings:
+        print(f"\nMean end-of-turn latency saved: {np.mean(savings) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
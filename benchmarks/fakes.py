@@ -0,0 +1,360 @@
+"""
+Deterministic local stand-ins for Deepgram, OpenAI and MySQL.
+
+OfflineResources is a SharedResources whose speech client is a
+FakeDeepgramClient, whose LLM is a ScriptedChatModel and whose databases
+are SQLite files seeded with a small movie-rental schema. Every fake sleeps
+for a configurable latency and adds it to a VendorClock, so benchmarks can
+separate time spent in our own code from simulated vendor time.
+"""
+import io
+import itertools
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assistant import SharedResources  # noqa: E402
+from db_pool import ServerPool  # noqa: E402
+from speech_backends import DeepgramSpeech  # noqa: E402
+from db_resolver import DatabaseNameResolver  # noqa: E402
+from query_log import QueryLog  # noqa: E402
+from schema_cache import SchemaCache, SchemaSnapshot  # noqa: E402
+
+# Transcripts with the intent and SQL the scripted LLM answers with
+DEFAULT_CASES = [
+    {"text": "How many films are in the inventory", "intent": "QUERY",
+     "sql": "SELECT COUNT(*) FROM film"},
+    {"text": "Show me the customers from London", "intent": "QUERY",
+     "sql": "SELECT first_name, last_name FROM customer WHERE city = 'London'"},
+    {"text": "What is the total revenue from payments", "intent": "QUERY",
+     "sql": "SELECT SUM(amount) FROM payment"},
+    {"text": "Show me rental information", "intent": "QUERY",
+     "sql": "SELECT rental_id, film_id, customer_id, rental_date FROM rental"},
+    {"text": "Which films were rented the most", "intent": "QUERY",
+     "sql": "SELECT f.title, COUNT(*) AS rentals FROM rental r JOIN film f ON f.film_id = r.film_id "
+            "GROUP BY f.title ORDER BY rentals DESC LIMIT 5"},
+    {"text": "What databases are available", "intent": "LIST"},
+    {"text": "Switch to the sales database", "intent": "SWITCH"},
+    {"text": "Write a poem about spring", "intent": "CREATIVE"},
+    {"text": "Explain what a join is", "intent": "EXPLANATION"},
+    {"text": "Hello there how are you", "intent": "GENERAL"},
+]
+
+AGENT_MARKER = "interact with a SQL database"
+CURRENT_QUERY = re.compile(r"Current Query:\s*(.+)")
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(WORD.findall(text.lower()))
+
+
+class VendorClock:
+    """Total simulated vendor latency, per vendor."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def wait(self, vendor: str, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+        with self.lock:
+            self.seconds[vendor] = self.seconds.get(vendor, 0.0) + seconds
+            self.calls[vendor] = self.calls.get(vendor, 0) + 1
+
+    def total(self) -> float:
+        with self.lock:
+            return sum(self.seconds.values())
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that answers from the cases instead of calling OpenAI.
+
+    Classification prompts get the case's intent. SQL agent conversations
+    get one sql_db_query tool call with the case's SQL, then a short answer
+    built from the tool result. Memory prompts get fixed replies.
+    """
+
+    cases: Dict[str, dict] = {}
+    latency: float = 0.0
+    clock: Any = None
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def get_num_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    def case_for(self, text: str) -> Optional[dict]:
+        normalized = normalize(text)
+        for key, case in self.cases.items():
+            if key in normalized:
+                return case
+        return None
+
+    def reply(self, messages) -> AIMessage:
+        contents = [str(message.content) for message in messages]
+        prompt = contents[-1]
+        if any(isinstance(message, SystemMessage) and AGENT_MARKER in str(message.content)
+               for message in messages):
+            if isinstance(messages[-1], ToolMessage):
+                return AIMessage(content=f"Here is what I found: {prompt[:80]}")
+            question = next((match.group(1) for content in contents
+                             for match in [CURRENT_QUERY.search(content)] if match), prompt)
+            case = self.case_for(question) or {}
+            sql = case.get("sql") or "SELECT COUNT(*) FROM film"
+            self.calls += 1
+            return AIMessage(content="", tool_calls=[
+                {"name": "sql_db_query", "args": {"query": sql}, "id": f"call_{self.calls}"}
+            ])
+        if "Output exactly one word" in prompt:
+            match = re.search(r'Analyze this query exactly: "(.*)"', prompt)
+            case = self.case_for(match.group(1) if match else prompt) or {}
+            return AIMessage(content=case.get("intent", "GENERAL"))
+        if "proper nouns" in prompt:
+            return AIMessage(content="NONE")
+        if "summarize" in prompt.lower():
+            return AIMessage(content="The user asked VOX about the movie rental data.")
+        if "Extract exact database name" in prompt:
+            return AIMessage(content="NONE")
+        return AIMessage(content="Sure, here is a short answer.")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.clock.wait("openai", self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self.reply(messages))])
+
+
+class _Listen:
+    def __init__(self, client):
+        self.client = client
+
+    def transcribe_file(self, payload, options=None):
+        self.client.clock.wait("deepgram_stt", self.client.stt_latency)
+        transcript = self.client.next_transcript()
+        alternative = SimpleNamespace(transcript=transcript)
+        return SimpleNamespace(results=SimpleNamespace(
+            channels=[SimpleNamespace(alternatives=[alternative])]
+        ))
+
+
+class _Speak:
+    def __init__(self, client):
+        self.client = client
+
+    def stream(self, source, options=None):
+        self.client.clock.wait("deepgram_tts", self.client.tts_latency)
+        # Roughly the size of 48 kbps mp3 speech at 15 characters a second
+        size = max(1, len(source["text"])) * 400
+        return SimpleNamespace(stream=io.BytesIO(b"\xff\xfb" + bytes(size)))
+
+
+class FakeDeepgramClient:
+    """Answers transcribe_file with queued transcripts and speak with silent mp3-sized bytes."""
+
+    def __init__(self, clock: VendorClock, stt_latency: float = 0.0, tts_latency: float = 0.0,
+                 fallback: List[str] = None):
+        self.clock = clock
+        self.stt_latency = stt_latency
+        self.tts_latency = tts_latency
+        self.transcripts: List[str] = []
+        # Used in turn when nothing is queued, e.g. under the WebSocket load generator
+        self.fallback = fallback or []
+        self.fallback_index = itertools.count()
+        self.lock = threading.Lock()
+        listen, speak = _Listen(self), _Speak(self)
+        self.listen = SimpleNamespace(rest=SimpleNamespace(v=lambda version: listen))
+        self.speak = SimpleNamespace(v=lambda version: speak)
+
+    def expect(self, transcript: str):
+        """Queue the transcript returned for the next transcription."""
+        with self.lock:
+            self.transcripts.append(transcript)
+
+    def next_transcript(self) -> str:
+        with self.lock:
+            if self.transcripts:
+                return self.transcripts.pop(0)
+            if self.fallback:
+                return self.fallback[next(self.fallback_index) % len(self.fallback)]
+        return ""
+
+
+def seed_movierental(path: str, rentals: int = 5000, seed: int = 7):
+    rng = random.Random(seed)
+    cities = ["London", "Paris", "Lisbon", "Austin", "Osaka", "Lagos"]
+    with sqlite3.connect(path) as conn:
+        conn.executescript("""
+            CREATE TABLE film (film_id INTEGER PRIMARY KEY, title TEXT NOT NULL,
+                               release_year INTEGER, rental_rate REAL);
+            CREATE TABLE customer (customer_id INTEGER PRIMARY KEY, first_name TEXT NOT NULL,
+                                   last_name TEXT NOT NULL, city TEXT);
+            CREATE TABLE rental (rental_id INTEGER PRIMARY KEY,
+                                 film_id INTEGER REFERENCES film(film_id),
+                                 customer_id INTEGER REFERENCES customer(customer_id),
+                                 rental_date TEXT);
+            CREATE TABLE payment (payment_id INTEGER PRIMARY KEY,
+                                  rental_id INTEGER REFERENCES rental(rental_id), amount REAL);
+        """)
+        conn.executemany("INSERT INTO film VALUES (?, ?, ?, ?)", [
+            (i, f"Film {i}", 1990 + i % 30, round(0.99 + (i % 5), 2)) for i in range(1, 501)
+        ])
+        conn.executemany("INSERT INTO customer VALUES (?, ?, ?, ?)", [
+            (i, f"First{i}", f"Last{i}", rng.choice(cities)) for i in range(1, 301)
+        ])
+        conn.executemany("INSERT INTO rental VALUES (?, ?, ?, ?)", [
+            (i, rng.randint(1, 500), rng.randint(1, 300), f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}")
+            for i in range(1, rentals + 1)
+        ])
+        conn.executemany("INSERT INTO payment VALUES (?, ?, ?)", [
+            (i, i, round(rng.uniform(0.99, 9.99), 2)) for i in range(1, rentals + 1)
+        ])
+
+
+def seed_sales(path: str, orders: int = 1000, seed: int = 11):
+    rng = random.Random(seed)
+    with sqlite3.connect(path) as conn:
+        conn.executescript("""
+            CREATE TABLE orders (order_id INTEGER PRIMARY KEY, customer TEXT, total REAL, placed_at TEXT);
+        """)
+        conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)", [
+            (i, f"Customer{rng.randint(1, 200)}", round(rng.uniform(5, 500), 2), f"2024-01-{1 + i % 28:02d}")
+            for i in range(1, orders + 1)
+        ])
+
+
+class InspectorSchemaCache(SchemaCache):
+    """SchemaCache that reads the attached SQLite files through the SQLAlchemy inspector."""
+
+    def get(self, engine, db_name: str):
+        with self.lock:
+            snapshot = self.snapshots.get(db_name)
+        if snapshot is not None:
+            return snapshot, False
+        inspector = inspect(engine)
+        tables, columns, foreign_keys = {}, {}, {}
+        for table in inspector.get_table_names(schema=db_name):
+            tables[table] = {"type": "BASE TABLE", "rows": None, "comment": None}
+            primary = set(inspector.get_pk_constraint(table, schema=db_name)["constrained_columns"])
+            columns[table] = [
+                (column["name"], str(column["type"]), column["nullable"],
+                 "PRI" if column["name"] in primary else "")
+                for column in inspector.get_columns(table, schema=db_name)
+            ]
+            foreign_keys[table] = [
+                (key["constrained_columns"][0], key["referred_table"], key["referred_columns"][0])
+                for key in inspector.get_foreign_keys(table, schema=db_name)
+            ]
+        snapshot = SchemaSnapshot(db_name, tables, columns, foreign_keys, (len(tables),))
+        with self.lock:
+            self.snapshots[db_name] = snapshot
+            self.loads += 1
+        return snapshot, True
+
+
+# Database name -> SQLite file, attached to every SQLite connection under that
+# name so queries can qualify tables the way they qualify MySQL schemas
+ATTACHED: Dict[str, str] = {}
+
+
+@event.listens_for(Engine, "connect")
+def attach_databases(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        for name, path in ATTACHED.items():
+            dbapi_connection.execute(f"ATTACH DATABASE '{path}' AS {name}")
+
+
+class OfflineResources(SharedResources):
+    """SharedResources wired to the fakes; databases live as SQLite files in workdir."""
+
+    def __init__(self, workdir: str, clock: VendorClock, cases: List[dict] = None,
+                 llm_latency: float = 0.0, stt_latency: float = 0.0, tts_latency: float = 0.0,
+                 rentals: int = 5000):
+        os.makedirs(workdir, exist_ok=True)
+        self.workdir = workdir
+        self.clock = clock
+        self.cases = cases or DEFAULT_CASES
+        self.llm_latency = llm_latency
+        self.database_files = {
+            "movierental": os.path.join(workdir, "movierental.sqlite"),
+            "sales": os.path.join(workdir, "sales.sqlite"),
+        }
+        for name, seed in (("movierental", lambda path: seed_movierental(path, rentals)),
+                           ("sales", seed_sales)):
+            if not os.path.exists(self.database_files[name]):
+                seed(self.database_files[name])
+        ATTACHED.update(self.database_files)
+        self.dg_client = FakeDeepgramClient(
+            clock, stt_latency, tts_latency,
+            fallback=[case["text"] for case in self.cases if case["intent"] != "SWITCH"]
+        )
+        super().__init__("offline", "offline")
+        self.schema_cache = InspectorSchemaCache()
+        self.query_log = QueryLog(os.path.join(workdir, "query_log.jsonl"))
+
+    def build_speech(self, dg_api_key):
+        # In place of the configured backend, so no real client or worker pool is started
+        return DeepgramSpeech(self.dg_client)
+
+    def setup_sql_agent(self, openai_api_key):
+        # Every pooled connection gets the database files attached
+        self.db_pool = ServerPool("sqlite://", connect_args={"check_same_thread": False})
+        self.engine = self.db_pool.engine
+        self.database_engines = {}
+        self.llm = ScriptedChatModel(
+            cases={normalize(case["text"]): case for case in self.cases},
+            latency=self.llm_latency,
+            clock=self.clock,
+        )
+
+    def refresh_available_databases(self):
+        self.available_databases = sorted(self.database_files)
+        self.db_resolver = DatabaseNameResolver(self.available_databases)
+
+    def database_engine(self, db_name: str):
+        # SQLite has no USE; each database file gets its own engine, kept for the process
+        engine = self.database_engines.get(db_name)
+        if engine is None:
+            engine = create_engine(f"sqlite:///{self.database_files[db_name]}")
+            self.database_engines[db_name] = engine
+        return engine
+
+    def dispose(self):
+        super().dispose()
+        for engine in self.database_engines.values():
+            engine.dispose()
+
+
+def offline_resources_from_env() -> OfflineResources:
+    """OfflineResources configured by VOX_FAKE_* variables, for serving server.py on fakes."""
+    import tempfile
+    workdir = os.getenv("VOX_FAKE_WORKDIR") or os.path.join(tempfile.gettempdir(), "vox-fakes")
+    return OfflineResources(
+        workdir,
+        VendorClock(),
+        llm_latency=float(os.getenv("VOX_FAKE_LLM_MS", "0")) / 1000,
+        stt_latency=float(os.getenv("VOX_FAKE_STT_MS", "0")) / 1000,
+        tts_latency=float(os.getenv("VOX_FAKE_TTS_MS", "0")) / 1000,
+        rentals=int(os.getenv("VOX_FAKE_RENTALS", "5000")),
+    )
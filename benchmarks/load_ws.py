@@ -0,0 +1,254 @@
+"""
+Concurrent WebSocket load generator for the /ws protocol.
+
+Each simulated client receives available_databases, sends select_database,
+then runs turns: start_listening (source "client"), 16-bit PCM from a WAV
+fixture as binary frames, and waits for speech_end, transcript and
+assistant_response (and audio_stream_end with --stream-audio). Between
+turns it thinks for --think-ms (+- --jitter). Sessions end with end_session.
+
+Concurrency ramps through --steps. For each step the report gives turns per
+second, response latency percentiles (end of audio to assistant_response),
+server event-loop lag from /metrics and RSS growth per session.
+
+Use --spawn to start server.py on the local fakes (VOX_FAKE_BACKENDS=1):
+
+    python benchmarks/load_ws.py --spawn --steps 1,10,25,50 --turns 5 --llm-ms 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_vad import generate_fixtures, load_wav  # noqa: E402
+from tracing import BUCKETS, Histogram  # noqa: E402
+
+FRAME_SAMPLES = 2048
+BUCKET_LINE = re.compile(
+    r'^vox_stage_duration_seconds_bucket\{stage="event_loop_lag",database="",le="([^"]+)"\} (\d+)$'
+)
+GAUGE_LINE = re.compile(r"^(vox_[a-z_]+) ([0-9.e+-]+)$")
+
+
+class StepResult:
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.latencies = []
+        self.turn_latencies = []
+        self.errors = 0
+        self.turns = 0
+        self.elapsed = 0.0
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def scrape(base_url):
+    """(event-loop lag bucket counts, gauges) from the server's /metrics."""
+    with urllib.request.urlopen(f"{base_url}/metrics", timeout=10) as response:
+        text = response.read().decode("utf-8")
+    buckets = {}
+    gauges = {}
+    for line in text.splitlines():
+        match = BUCKET_LINE.match(line)
+        if match:
+            buckets[match.group(1)] = int(match.group(2))
+            continue
+        match = GAUGE_LINE.match(line)
+        if match:
+            gauges[match.group(1)] = float(match.group(2))
+    return buckets, gauges
+
+
+def lag_histogram(before, after):
+    """Histogram of the event-loop lag samples taken between two scrapes."""
+    histogram = Histogram()
+    previous = 0
+    for index, bound in enumerate(list(BUCKETS) + ["+Inf"]):
+        key = str(bound)
+        cumulative = after.get(key, 0) - before.get(key, 0)
+        histogram.counts[index] = cumulative - previous
+        previous = cumulative
+    histogram.count = previous
+    return histogram
+
+
+async def expect(ws, kinds, timeout):
+    """Read until a JSON message of one of kinds arrives; binary frames are skipped."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise asyncio.TimeoutError(f"waiting for {kinds}")
+        message = await asyncio.wait_for(ws.recv(), remaining)
+        if isinstance(message, bytes):
+            continue
+        data = json.loads(message)
+        if data["type"] in kinds:
+            return data
+        if data["type"] == "error":
+            raise RuntimeError(data.get("message"))
+
+
+async def run_session(args, url, audio, rate, result, rng):
+    async with websockets.connect(url, max_size=None) as ws:
+        await expect(ws, {"available_databases"}, args.timeout)
+        await ws.send(json.dumps({"type": "select_database", "database": args.database}))
+        selection = await expect(ws, {"database_selection"}, args.timeout)
+        if not selection.get("success"):
+            raise RuntimeError(f"could not select {args.database}")
+
+        for _ in range(args.turns):
+            await ws.send(json.dumps({
+                "type": "start_listening", "source": "client",
+                "sample_rate": rate, "stream_audio": args.stream_audio,
+            }))
+            for start in range(0, len(audio), FRAME_SAMPLES):
+                await ws.send(audio[start:start + FRAME_SAMPLES].tobytes())
+                if args.realtime:
+                    await asyncio.sleep(FRAME_SAMPLES / rate)
+            audio_sent = time.perf_counter()
+            data = await expect(ws, {"speech_end", "transcript", "no_speech_detected"}, args.timeout)
+            if data["type"] == "speech_end":
+                data = await expect(ws, {"transcript", "no_speech_detected"}, args.timeout)
+            if data["type"] == "no_speech_detected":
+                result.errors += 1
+                continue
+            await expect(ws, {"assistant_response"}, args.timeout)
+            result.latencies.append(time.perf_counter() - audio_sent)
+            if args.stream_audio:
+                await expect(ws, {"audio_stream_end"}, args.timeout)
+            result.turn_latencies.append(time.perf_counter() - audio_sent)
+            result.turns += 1
+
+            think = args.think_ms + rng.uniform(-args.jitter, args.jitter) * args.think_ms
+            await asyncio.sleep(max(0.0, think) / 1000)
+
+        await ws.send(json.dumps({"type": "end_session"}))
+
+
+async def run_step(args, url, audio, rate, sessions):
+    result = StepResult(sessions)
+    rng = random.Random(sessions)
+
+    async def client(index):
+        # Stagger connects so a step does not start with one thundering herd
+        await asyncio.sleep(index * args.ramp_ms / 1000)
+        try:
+            await run_session(args, url, audio, rate, result, rng)
+        except Exception as e:
+            result.errors += 1
+            if args.verbose:
+                print(f"  session {index}: {type(e).__name__}: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(sessions)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def spawn_server(args, port, workdir):
+    """Serve server.py on the fakes from workdir, so its databases, session store and logs stay out of the checkout."""
+    env = dict(os.environ, VOX_FAKE_BACKENDS="1", VOX_FAKE_LLM_MS=str(args.llm_ms),
+               VOX_FAKE_STT_MS=str(args.stt_ms), VOX_FAKE_TTS_MS=str(args.tts_ms),
+               VOX_MAX_SESSIONS=str(max(int(step) for step in args.steps.split(",")) * 2),
+               VOX_FAKE_WORKDIR=workdir,
+               VOX_SESSION_STORE=os.path.join(workdir, "sessions.sqlite"),
+               VOX_QUERY_LOG=os.path.join(workdir, "query_log.jsonl"))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--app-dir", root,
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+
+
+def wait_for_server(base_url, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/health/ready", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"server at {base_url} did not come up")
+
+
+async def main_async(args):
+    base_url = f"http://{args.host}:{args.port}"
+    url = f"ws://{args.host}:{args.port}/ws"
+    paths = sorted(p for p in os.listdir(args.fixtures) if p.endswith(".wav")) if os.path.isdir(args.fixtures) else []
+    if not paths:
+        generate_fixtures(args.fixtures)
+        paths = sorted(p for p in os.listdir(args.fixtures) if p.endswith(".wav"))
+    audio, rate = load_wav(os.path.join(args.fixtures, args.fixture or paths[0]))
+
+    print(f"{'sessions':>8}{'turns':>7}{'err':>5}{'turns/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'lag p95':>9}{'lag p99':>9}{'rss MiB':>9}{'KiB/sess':>10}")
+    baseline_rss = None
+    for sessions in (int(step) for step in args.steps.split(",")):
+        before, gauges = await asyncio.to_thread(scrape, base_url)
+        if baseline_rss is None:
+            baseline_rss = gauges.get("vox_process_rss_bytes", 0.0)
+        result = await run_step(args, url, audio, rate, sessions)
+        after, gauges = await asyncio.to_thread(scrape, base_url)
+        lag = lag_histogram(before, after)
+        rss = gauges.get("vox_process_rss_bytes", 0.0)
+        latencies = result.turn_latencies if args.stream_audio else result.latencies
+        print(f"{sessions:>8}{result.turns:>7}{result.errors:>5}{result.turns / result.elapsed:>9.2f}"
+              f"{percentile(latencies, 50):>9.0f}{percentile(latencies, 95):>9.0f}{percentile(latencies, 99):>9.0f}"
+              f"{lag.quantile(0.95) * 1000:>9.1f}{lag.quantile(0.99) * 1000:>9.1f}"
+              f"{rss / 2 ** 20:>9.1f}{(rss - baseline_rss) / sessions / 1024:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--steps", default="1,5,10,25,50", help="comma-separated concurrent session counts")
+    parser.add_argument("--turns", type=int, default=5, help="turns per session")
+    parser.add_argument("--think-ms", type=float, default=1000.0)
+    parser.add_argument("--jitter", type=float, default=0.5, help="think-time jitter as a fraction")
+    parser.add_argument("--ramp-ms", type=float, default=20.0, help="delay between session starts")
+    parser.add_argument("--database", default="movierental")
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures"))
+    parser.add_argument("--fixture", help="WAV file within --fixtures (default: the first)")
+    parser.add_argument("--realtime", action="store_true", help="pace audio frames at the sample rate")
+    parser.add_argument("--stream-audio", action="store_true", help="request per-sentence audio frames")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--spawn", action="store_true", help="start server.py on the local fakes")
+    parser.add_argument("--llm-ms", type=float, default=300.0)
+    parser.add_argument("--stt-ms", type=float, default=150.0)
+    parser.add_argument("--tts-ms", type=float, default=120.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vox-load-") if args.spawn else None
+    server = spawn_server(args, args.port, workdir) if args.spawn else None
+    try:
+        wait_for_server(f"http://{args.host}:{args.port}")
+        asyncio.run(main_async(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import struct
+
+# Server -> client binary WebSocket frames start with a 1-byte kind and a
+# 4-byte little-endian sequence number; the payload follows.
+HEADER = struct.Struct('<BI')
+
+AUDIO_CHUNK = 1
+# Payload layout in result_stream.BoundedResult.pack
+RESULT_TABLE = 2
+
+
+def pack_frame(kind: int, sequence: int, payload: bytes) -> bytes:
+    return HEADER.pack(kind, sequence) + payload
@@ -0,0 +1,164 @@
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+import tracing
+
+# Execution option naming the database a connection should be switched to
+DATABASE_OPTION = "vox_database"
+
+
+def current_session() -> Optional[str]:
+    """Session of the turn running this code, if any; follows into to_thread workers."""
+    turn = tracing.current_turn.get()
+    return turn.session_id if turn is not None else None
+
+
+class BudgetedPool(QueuePool):
+    """
+    QueuePool that also caps the connections one session may hold at once,
+    so a session running a slow agent cannot starve the others out of the
+    global budget. Checkouts outside a turn (warmup, schema checks) count
+    against the budget only. Waits for either limit are recorded as the
+    pool_wait stage.
+    """
+
+    per_session = 2
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gate_lock = threading.Lock()
+        # A gate lives while one of its connections is out or a checkout waits on it
+        self.gates: "weakref.WeakValueDictionary[str, threading.BoundedSemaphore]" = weakref.WeakValueDictionary()
+        self.held: Dict[object, threading.BoundedSemaphore] = {}
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.per_session = self.per_session
+        return pool
+
+    def gate(self, session_id: Optional[str]) -> Optional[threading.BoundedSemaphore]:
+        if session_id is None:
+            return None
+        with self.gate_lock:
+            gate = self.gates.get(session_id)
+            if gate is None:
+                gate = threading.BoundedSemaphore(self.per_session)
+                self.gates[session_id] = gate
+            return gate
+
+    def _do_get(self):
+        gate = self.gate(current_session())
+        started = time.perf_counter()
+        if gate is not None and not gate.acquire(timeout=self._timeout):
+            self.timeouts += 1
+            raise PoolTimeoutError(
+                f"Session already holds {self.per_session} connections; timed out after {self._timeout}s"
+            )
+        try:
+            record = super()._do_get()
+        except BaseException as e:
+            if isinstance(e, PoolTimeoutError):
+                self.timeouts += 1
+            if gate is not None:
+                gate.release()
+            raise
+        waited = time.perf_counter() - started
+        tracing.record("pool_wait", waited)
+        with self.gate_lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait = max(self.max_wait, waited)
+            if gate is not None:
+                self.held[record] = gate
+        return record
+
+    def _do_return_conn(self, record):
+        with self.gate_lock:
+            gate = self.held.pop(record, None)
+        try:
+            super()._do_return_conn(record)
+        finally:
+            if gate is not None:
+                gate.release()
+
+    def stats(self) -> dict:
+        with self.gate_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "per_session": self.per_session,
+                "sessions_holding": len({id(gate) for gate in self.held.values()}),
+                "checkouts": self.checkouts,
+                "mean_wait": round(self.wait_seconds / self.checkouts, 6) if self.checkouts else 0.0,
+                "max_wait": round(self.max_wait, 6),
+                "timeouts": self.timeouts,
+            }
+
+
+def select_database(conn):
+    """Switch a checked-out connection to the database its engine was bound to."""
+    database = conn.get_execution_options().get(DATABASE_OPTION)
+    if database is None:
+        return
+    info = conn.connection.info
+    if info.get(DATABASE_OPTION) == database:
+        return
+    # Through the DBAPI cursor, so the Connection does not autobegin a transaction
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"USE `{database.replace('`', '``')}`")
+    finally:
+        cursor.close()
+    info[DATABASE_OPTION] = database
+
+
+class ServerPool:
+    """
+    One budgeted pool of connections to a MySQL server, shared by every
+    database on it. engine_for() returns a per-database view of the same
+    engine; a connection is switched with USE when checked out for a
+    database other than the one it last served.
+    """
+
+    def __init__(self, url: str, budget: int = 20, per_session: int = 2, timeout: float = 30.0,
+                 **engine_options):
+        self.engine: Engine = create_engine(
+            url,
+            poolclass=BudgetedPool,
+            pool_size=budget,
+            max_overflow=0,
+            pool_timeout=timeout,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            **engine_options
+        )
+        self.engine.pool.per_session = per_session
+        self.budget = budget
+        event.listen(self.engine, "engine_connect", select_database)
+        self.lock = threading.Lock()
+        self.views: Dict[str, Engine] = {}
+
+    def engine_for(self, db_name: str) -> Engine:
+        with self.lock:
+            view = self.views.get(db_name)
+            if view is None:
+                view = self.engine.execution_options(**{DATABASE_OPTION: db_name})
+                self.views[db_name] = view
+            return view
+
+    def dispose(self):
+        self.engine.dispose()
+
+    def stats(self) -> dict:
+        return {"budget": self.budget, **self.engine.pool.stats()}
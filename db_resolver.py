@@ -0,0 +1,104 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+NON_ALNUM = re.compile(r'[^a-z0-9]')
+WORD = re.compile(r"[a-z0-9]+")
+FILLER_WORDS = {"the", "to", "a", "an", "database", "databases", "db", "please", "switch",
+                "use", "connect", "change", "open", "me", "my", "on", "into", "let's", "lets"}
+
+
+def normalize(name: str) -> str:
+    return NON_ALNUM.sub('', name.lower())
+
+
+def phonetic_key(name: str) -> str:
+    """Rough sound-alike key: common spelling swaps, vowels dropped after the first letter, runs collapsed."""
+    word = normalize(name)
+    if not word:
+        return ""
+    for pattern, replacement in (("ph", "f"), ("ck", "k"), ("q", "k"), ("x", "ks"),
+                                 ("z", "s"), ("c", "k"), ("w", "v"), ("y", "i")):
+        word = word.replace(pattern, replacement)
+    key = word[0]
+    for char in word[1:]:
+        if char in "aeiouh" or char == key[-1]:
+            continue
+        key += char
+    return key
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up with limit + 1 once it cannot stay within limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (char_a != char_b))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class DatabaseNameResolver:
+    """
+    Precomputed index over the available database names.
+
+    resolve() tries, in order: exact match on the normalized utterance or the
+    longest run of up to three words in it ("movie rental" -> "movierental"), a
+    phonetic key match, and a bounded edit-distance match. It returns the
+    single best name, or None with the tied candidates when the input is
+    ambiguous.
+    """
+
+    def __init__(self, names: List[str]):
+        self.names = list(names)
+        self.by_normalized: Dict[str, str] = {normalize(name): name for name in self.names}
+        self.by_phonetic: Dict[str, List[str]] = {}
+        for name in self.names:
+            self.by_phonetic.setdefault(phonetic_key(name), []).append(name)
+
+    def spans(self, text: str, max_words: int = 3) -> List[List[str]]:
+        """Joined runs of non-filler words, grouped by run length, longest first."""
+        words = [word for word in WORD.findall(text.lower()) if word not in FILLER_WORDS]
+        return [
+            [''.join(words[start:start + size]) for start in range(len(words) - size + 1)]
+            for size in range(min(max_words, len(words)), 0, -1)
+        ]
+
+    def resolve(self, text: str) -> Tuple[Optional[str], List[str]]:
+        if not text or not self.names:
+            return None, []
+
+        exact = self.by_normalized.get(normalize(text))
+        if exact:
+            return exact, [exact]
+
+        groups = self.spans(text)
+        # The longest run that names a database wins ("sales 2023" over "sales")
+        for group in groups:
+            matches = list(dict.fromkeys(self.by_normalized[span] for span in group if span in self.by_normalized))
+            if matches:
+                return (matches[0], matches) if len(matches) == 1 else (None, matches)
+
+        spans = [span for group in groups for span in group]
+        matches = list(dict.fromkeys(
+            name for span in spans for name in self.by_phonetic.get(phonetic_key(span), [])
+        ))
+        if len(matches) == 1:
+            return matches[0], matches
+
+        scored: Dict[str, int] = {}
+        for name, normalized in ((name, normalize(name)) for name in (matches or self.names)):
+            limit = max(1, len(normalized) // 4)
+            best = min((edit_distance(span, normalized, limit) for span in spans), default=limit + 1)
+            if best <= limit:
+                scored[name] = best
+        if not scored:
+            return None, matches
+        best_distance = min(scored.values())
+        closest = [name for name, distance in scored.items() if distance == best_distance]
+        return (closest[0], closest) if len(closest) == 1 else (None, closest)
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+LABELS = ["QUERY", "SWITCH", "LIST", "CREATIVE", "EXPLANATION", "GENERAL", "TRANSITIONING"]
+
+# Seed examples: those of the LLM classification prompt plus close variants
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "QUERY": [
+        "Show me sales data", "How many customers do we have", "What are the top movies",
+        "Get rental information", "How many films are in the inventory",
+        "Show me the customers from London", "What is the total revenue this month",
+        "List the top ten actors by number of films", "Which store has the most rentals",
+        "Find all orders placed yesterday", "What is the average payment amount",
+        "Count the rows in the payments table", "Give me the latest five rentals",
+        "Which products are out of stock", "Show me records for customer Smith",
+        "What tables are in this database", "How many employees work in sales",
+    ],
+    "SWITCH": [
+        "Switch to movierental database", "Use the sales database", "Connect to northwind",
+        "Change to customer database", "Switch to the sakila database", "Open the world database",
+        "Let's use the inventory database", "Connect me to the hr database",
+        "Change the database to employees", "Switch databases to orders",
+    ],
+    "LIST": [
+        "Show me all databases", "What databases are available", "List the databases",
+        "Show database options", "Which databases can I use", "What databases do you have",
+        "List all available databases", "Tell me the database names",
+    ],
+    "CREATIVE": [
+        "Write a poem about spring", "Tell me a story", "Create a description of sunset",
+        "Make up a character", "Write a haiku about data", "Compose a short song",
+        "Tell me a joke", "Write a limerick about databases", "Invent a name for a dragon",
+        "Describe an imaginary city",
+    ],
+    "EXPLANATION": [
+        "Explain how this works", "Why did that happen", "How does this system function",
+        "What's the reason for this", "Explain what a join is", "Why is the query slow",
+        "How does an index work", "Can you explain normalization",
+        "What does a primary key do", "Explain the difference between inner and outer joins",
+    ],
+    "GENERAL": [
+        "How are you", "What's new", "Nice to meet you", "That's interesting", "Hello there",
+        "Thank you", "Good morning", "Who are you", "Okay sounds good", "What can you do",
+        "That's great", "Hi VOX",
+    ],
+    "TRANSITIONING": [
+        "Let's talk about something else", "Moving on to", "Can we discuss", "Switching topics to",
+        "Let's change the subject", "Enough about that", "Let's move on",
+        "I want to talk about something different", "New topic please",
+    ],
+}
+
+# Unambiguous phrasings resolved without the model
+RULES = [
+    ("LIST", re.compile(r"\b(list|show|what|which)\b.*\bdatabases\b")),
+    ("SWITCH", re.compile(r"^(please |can you |let's )?(switch|change|connect|use|open)\b.*\b(database|db)\b")),
+    ("TRANSITIONING", re.compile(r"\b(something else|change the subject|moving on|move on|switching topics|new topic)\b")),
+    # A creative request, not any mention: "which song has the most plays" is a query
+    ("CREATIVE", re.compile(
+        r"^(please |can you |could you |vox |hey vox )*(write|compose|tell|make up|give|create)( me| us)?"
+        r" (a|an|another|some|one)\b.*\b(poem|haiku|limerick|story|song|joke)s?\b"
+    )),
+]
+
+TOKEN = re.compile(r"[a-z0-9']+")
+
+
+class IntentClassifier:
+    """
+    Local fast path in front of the LLM classification prompt.
+
+    Regex rules catch unambiguous phrasings; everything else goes through a
+    softmax regression over hashed TF-IDF features (word unigrams, bigrams
+    and character trigrams) trained on INTENT_EXAMPLES plus transcripts the
+    LLM has labelled before. classify() returns None below the confidence
+    threshold so the caller falls back to the LLM.
+    """
+
+    def __init__(self, threshold: float = 0.7, n_features: int = 4096,
+                 log_path: Optional[str] = None):
+        self.threshold = threshold
+        self.n_features = n_features
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.local_hits = 0
+        self.fallbacks = 0
+        self.train(self.training_data())
+
+    def tokens(self, text: str) -> List[str]:
+        words = TOKEN.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        joined = f" {' '.join(words)} "
+        features += [f"#{joined[i:i + 3]}" for i in range(len(joined) - 2)]
+        return features
+
+    def _counts(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        for feature in self.tokens(text):
+            vector[zlib.crc32(feature.encode("utf-8")) % self.n_features] += 1.0
+        return vector
+
+    def _featurize(self, counts: np.ndarray) -> np.ndarray:
+        weighted = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        return weighted / np.maximum(norms, 1e-8)
+
+    def training_data(self) -> List[Tuple[str, str]]:
+        data = [(text, label) for label, texts in INTENT_EXAMPLES.items() for text in texts]
+        if self.log_path and os.path.exists(self.log_path):
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("label") in LABELS and entry.get("text"):
+                        data.append((entry["text"], entry["label"]))
+        return data
+
+    def train(self, data: List[Tuple[str, str]], epochs: int = 300, learning_rate: float = 2.0,
+              l2: float = 1e-4):
+        counts = np.stack([self._counts(text) for text, _ in data])
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(data)) / (1 + document_frequency)) + 1).astype(np.float32)
+        features = self._featurize(counts)
+        targets = np.zeros((len(data), len(LABELS)), dtype=np.float32)
+        targets[np.arange(len(data)), [LABELS.index(label) for _, label in data]] = 1.0
+
+        self.weights = np.zeros((self.n_features, len(LABELS)), dtype=np.float32)
+        self.bias = np.zeros(len(LABELS), dtype=np.float32)
+        for _ in range(epochs):
+            probabilities = self._softmax(features @ self.weights + self.bias)
+            error = (probabilities - targets) / len(data)
+            self.weights -= learning_rate * (features.T @ error + l2 * self.weights)
+            self.bias -= learning_rate * error.sum(axis=0)
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Best label and its probability, ignoring the threshold."""
+        lowered = text.lower()
+        for label, pattern in RULES:
+            if pattern.search(lowered):
+                return label, 1.0
+        probabilities = self._softmax(self._featurize(self._counts(text)) @ self.weights + self.bias)
+        best = int(np.argmax(probabilities))
+        return LABELS[best], float(probabilities[best])
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        label, confidence = self.predict(text)
+        with self.lock:
+            if confidence >= self.threshold:
+                self.local_hits += 1
+                return label, confidence
+            self.fallbacks += 1
+        return None, confidence
+
+    def record(self, text: str, label: str, llm_latency: float = None):
+        """Append an LLM-labelled transcript to the log used as training data."""
+        if not self.log_path or label not in LABELS:
+            return
+        entry = {"text": text, "label": label}
+        if llm_latency is not None:
+            entry["llm_latency"] = round(llm_latency, 4)
+        with self.lock:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.local_hits + self.fallbacks
+            return {
+                "local_hits": self.local_hits,
+                "llm_fallbacks": self.fallbacks,
+                "local_rate": self.local_hits / total if total else 0.0,
+            }
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from langchain.memory import ConversationEntityMemory, ConversationSummaryBufferMemory
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import get_buffer_string, messages_from_dict, messages_to_dict
+from pydantic import Field
+
+
+class IncrementalSummaryBufferMemory(ConversationSummaryBufferMemory):
+    """
+    ConversationSummaryBufferMemory whose save_context only appends.
+
+    Each message is counted once when it is added and the buffer total is
+    kept as a running sum, so the budget check never re-tokenizes the
+    whole buffer. Summarizing the overflow is left to MemoryWriter.flush(),
+    off the critical path, through overflow() and fold().
+    """
+
+    message_tokens: List[int] = Field(default_factory=list)
+    buffer_tokens: int = 0
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        start = len(self.chat_memory.messages)
+        BaseChatMemory.save_context(self, inputs, outputs)
+        for message in self.chat_memory.messages[start:]:
+            tokens = self.llm.get_num_tokens(get_buffer_string([message]))
+            self.message_tokens.append(tokens)
+            self.buffer_tokens += tokens
+
+    def overflow(self) -> int:
+        """Number of leading messages to fold into the summary to get back under budget."""
+        total = self.buffer_tokens
+        count = 0
+        while total > self.max_token_limit and count < len(self.message_tokens):
+            total -= self.message_tokens[count]
+            count += 1
+        return count
+
+    def fold(self, count: int, summary: str) -> None:
+        """Replace the first count messages with an updated summary."""
+        del self.chat_memory.messages[:count]
+        self.buffer_tokens -= sum(self.message_tokens[:count])
+        del self.message_tokens[:count]
+        self.moving_summary_buffer = summary
+
+    def clear(self) -> None:
+        super().clear()
+        self.message_tokens = []
+        self.buffer_tokens = 0
+
+
+class BatchedEntityMemory(ConversationEntityMemory):
+    """
+    ConversationEntityMemory whose save_context only appends; entity
+    summaries are refreshed by summarize_entities() once per batch of turns
+    instead of once per entity per turn.
+    """
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        BaseChatMemory.save_context(self, inputs, outputs)
+
+    def summarize_entities(self, entities: Set[str], inputs: List[str], turns: int) -> None:
+        history = get_buffer_string(
+            self.buffer[-max(turns, self.k) * 2:],
+            human_prefix=self.human_prefix,
+            ai_prefix=self.ai_prefix,
+        )
+        chain = self.entity_summarization_prompt | self.llm
+        for entity in sorted(entities):
+            output = chain.invoke({
+                "summary": self.entity_store.get(entity, ""),
+                "entity": entity,
+                "history": history,
+                "input": "\n".join(inputs),
+            })
+            self.entity_store.set(entity, getattr(output, "content", str(output)).strip())
+
+
+class PendingTurn:
+    __slots__ = ("query", "response", "entities")
+
+    def __init__(self, query: str, response: str, entities: Optional[Set[str]]):
+        self.query = query
+        self.response = response
+        self.entities = entities
+
+
+class MemoryWriter:
+    """
+    Records finished turns into the session's memories and runs the LLM
+    work they trigger (summary pruning, entity summaries) in the background.
+
+    record() appends the exchange at once, so the next turn's snapshot
+    already contains it. schedule() is called once the response has been
+    sent; it starts a single flush task that waits `delay` seconds, takes
+    every pending turn and processes them as one batch in a worker thread.
+    """
+
+    def __init__(self, conversation_memory: IncrementalSummaryBufferMemory,
+                 entity_memory: BatchedEntityMemory, delay: float = 0.5):
+        self.conversation_memory = conversation_memory
+        self.entity_memory = entity_memory
+        self.delay = delay
+        self.pending: List[PendingTurn] = []
+        self.lock = threading.Lock()
+        self.task: Optional[asyncio.Task] = None
+        # Query whose entities are in the entity memory's cache
+        self.extracted_for: Optional[str] = None
+        self.batches = 0
+        self.turns = 0
+
+    def snapshot(self, query: str) -> dict:
+        """Conversation memory variables for one turn."""
+        with self.lock:
+            return self.conversation_memory.load_memory_variables({"input": query})
+
+    def entity_context(self, query: str) -> dict:
+        """
+        Entity memory variables for one turn. Extracts the query's entities
+        with an LLM call, and leaves them in the entity cache for record().
+        Blocking.
+        """
+        variables = self.entity_memory.load_memory_variables({"input": query})
+        with self.lock:
+            self.extracted_for = query
+        return variables
+
+    def record(self, query: str, response: str, entities: bool = False):
+        """Append a finished exchange; entities=True also queues an entity summary refresh."""
+        with self.lock:
+            self.conversation_memory.save_context({"input": query}, {"output": response})
+            entity_names = None
+            if entities:
+                self.entity_memory.save_context({"input": query}, {"output": response})
+                # The cache holds the entities of the last query extracted. A turn
+                # answered from the query cache extracted none, so it refreshes none.
+                if self.extracted_for == query:
+                    entity_names = set(self.entity_memory.entity_cache)
+            self.pending.append(PendingTurn(query, response, entity_names))
+
+    def schedule(self):
+        if not self.pending or (self.task is not None and not self.task.done()):
+            return
+        self.task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        while self.pending:
+            with self.lock:
+                batch, self.pending = self.pending, []
+            try:
+                await asyncio.to_thread(self.flush, batch)
+            except Exception as e:
+                print(f"Warning: Error updating conversation memory: {str(e)}")
+
+    def flush(self, batch: List[PendingTurn]):
+        """Summarize overflow and refresh entity summaries for a batch of turns. Blocking."""
+        memory = self.conversation_memory
+        with self.lock:
+            count = memory.overflow()
+            pruned = memory.chat_memory.messages[:count]
+            previous = memory.moving_summary_buffer
+        if count:
+            # Summarize outside the lock so snapshots keep seeing the messages meanwhile
+            summary = memory.predict_new_summary(pruned, previous)
+            with self.lock:
+                memory.fold(count, summary)
+        entity_turns = [turn for turn in batch if turn.entities is not None]
+        if entity_turns:
+            entities = set().union(*(turn.entities for turn in entity_turns))
+            if entities:
+                self.entity_memory.summarize_entities(
+                    entities, [turn.query for turn in entity_turns], len(entity_turns)
+                )
+        self.batches += 1
+        self.turns += len(batch)
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def export_state(self) -> dict:
+        """Both memories as plain data, so a session resumes without asking the LLM to rebuild them."""
+        conversation = self.conversation_memory
+        entity = self.entity_memory
+        with self.lock:
+            return {
+                "summary": conversation.moving_summary_buffer,
+                "messages": messages_to_dict(conversation.chat_memory.messages),
+                "message_tokens": list(conversation.message_tokens),
+                "entity_messages": messages_to_dict(entity.chat_memory.messages[-entity.k * 2:]),
+                "entities": dict(getattr(entity.entity_store, "store", {})),
+            }
+
+    def import_state(self, state: dict):
+        conversation = self.conversation_memory
+        entity = self.entity_memory
+        with self.lock:
+            conversation.clear()
+            conversation.moving_summary_buffer = state.get("summary", "")
+            conversation.chat_memory.add_messages(messages_from_dict(state.get("messages", [])))
+            tokens = state.get("message_tokens") or []
+            if len(tokens) != len(conversation.chat_memory.messages):
+                tokens = [conversation.llm.get_num_tokens(get_buffer_string([message]))
+                          for message in conversation.chat_memory.messages]
+            conversation.message_tokens = list(tokens)
+            conversation.buffer_tokens = sum(tokens)
+            entity.chat_memory.clear()
+            entity.chat_memory.add_messages(messages_from_dict(state.get("entity_messages", [])))
+            for name, summary in state.get("entities", {}).items():
+                entity.entity_store.set(name, summary)
+            self.pending = []
+
+    def stats(self) -> dict:
+        return {
+            "pending_turns": len(self.pending),
+            "batches": self.batches,
+            "turns": self.turns,
+            "buffer_tokens": self.conversation_memory.buffer_tokens,
+        }
@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import List, Dict, Optional
+from typing import Deque, List, Dict, Optional
+from collections import deque
 from datetime import datetime
 import json
+import time
 
 class ConversationMode(Enum):
     GENERAL = "general"
@@ -11,6 +13,8 @@ class ConversationMode(Enum):
     TRANSITIONING = "transitioning"
 
 class ModeTransition:
+    __slots__ = ("from_mode", "to_mode", "confidence", "timestamp")
+
     def __init__(self, from_mode: ConversationMode, to_mode: ConversationMode, 
                  confidence: float, timestamp: datetime):
         self.from_mode = from_mode
@@ -18,16 +22,30 @@ class ModeTransition:
         self.confidence = confidence
         self.timestamp = timestamp
 
+    def to_tuple(self) -> tuple:
+        return (self.from_mode.value, self.to_mode.value, self.confidence, self.timestamp.timestamp())
+
+    @classmethod
+    def from_tuple(cls, data) -> "ModeTransition":
+        from_mode, to_mode, confidence, timestamp = data
+        return cls(ConversationMode(from_mode), ConversationMode(to_mode),
+                   confidence, datetime.fromtimestamp(timestamp))
+
 class ModeTracker:
-    def __init__(self, decay_rate: float = 0.1, confidence_threshold: float = 0.7):
+    def __init__(self, decay_rate: float = 0.1, confidence_threshold: float = 0.7,
+                 history_size: int = 32):
         self.current_mode = ConversationMode.GENERAL
         self.confidence = 1.0
         self.mode_start_time = datetime.now()
+        # Monotonic twin of mode_start_time, immune to wall-clock changes
+        self.mode_started = time.monotonic()
         self.previous_mode = None
-        self.transitions: List[ModeTransition] = []
+        # Ring buffer of the latest transitions; the oldest drop off once full
+        self.transitions: Deque[ModeTransition] = deque(maxlen=history_size)
         self.decay_rate = decay_rate
         self.confidence_threshold = confidence_threshold
         self.mode_locks: Dict[str, bool] = {}
+        self.db_connection_active = False
     def set_db_connection(self, is_active: bool):
         self.db_connection_active = is_active
         if not is_active and self.current_mode == ConversationMode.DATABASE:
@@ -50,6 +68,7 @@ class ModeTracker:
             self.current_mode = new_mode
             self.confidence = confidence
             self.mode_start_time = datetime.now()
+            self.mode_started = time.monotonic()
             return True
         return False
 
@@ -63,7 +82,7 @@ class ModeTracker:
         return bool(self.mode_locks)
 
     def decay_confidence(self):
-        time_diff = (datetime.now() - self.mode_start_time).total_seconds()
+        time_diff = time.monotonic() - self.mode_started
         self.confidence *= (1 - self.decay_rate * time_diff)
         
         if self.confidence < self.confidence_threshold and self.previous_mode:
@@ -74,10 +93,22 @@ class ModeTracker:
             self.current_mode = self.previous_mode
             self.confidence = self.confidence_threshold
             self.mode_start_time = datetime.now()
+            self.mode_started = time.monotonic()
             self.previous_mode = None
 
+    def streak(self) -> int:
+        """How many of the latest mode updates in a row landed in the current mode."""
+        count = 0
+        for transition in reversed(self.transitions):
+            if transition.to_mode != self.current_mode:
+                break
+            count += 1
+        return count
+
     def get_mode_history(self, limit: int = 3) -> List[ModeTransition]:
-        return sorted(self.transitions, key=lambda x: x.timestamp, reverse=True)[:limit]
+        # Transitions are appended in time order, so the newest are at the right end
+        count = min(limit, len(self.transitions))
+        return [self.transitions[-i] for i in range(1, count + 1)]
 
     def to_dict(self) -> dict:
         return {
@@ -91,6 +122,32 @@ class ModeTracker:
                     "to_mode": t.to_mode.value,
                     "confidence": t.confidence,
                     "timestamp": t.timestamp.isoformat()
-                } for t in self.transitions[-3:]
+                } for t in reversed(self.get_mode_history(3))
             ]
-        }
\ No newline at end of file
+        }
+
+    def snapshot(self) -> dict:
+        """Compact state for restore(); transitions are (from, to, confidence, epoch) tuples."""
+        return {
+            "mode": self.current_mode.value,
+            "previous": self.previous_mode.value if self.previous_mode else None,
+            "confidence": self.confidence,
+            "mode_age": time.monotonic() - self.mode_started,
+            "db_connection_active": self.db_connection_active,
+            "history_size": self.transitions.maxlen,
+            "transitions": [t.to_tuple() for t in self.transitions],
+        }
+
+    @classmethod
+    def restore(cls, data: dict, **kwargs) -> "ModeTracker":
+        tracker = cls(history_size=data.get("history_size", 32), **kwargs)
+        tracker.current_mode = ConversationMode(data["mode"])
+        tracker.previous_mode = ConversationMode(data["previous"]) if data.get("previous") else None
+        tracker.confidence = data["confidence"]
+        # The mode keeps its age, so decay continues where it left off
+        age = data.get("mode_age", 0.0)
+        tracker.mode_started = time.monotonic() - age
+        tracker.mode_start_time = datetime.fromtimestamp(time.time() - age)
+        tracker.db_connection_active = data.get("db_connection_active", False)
+        tracker.transitions.extend(ModeTransition.from_tuple(t) for t in data.get("transitions", []))
+        return tracker
\ No newline at end of file
@@ -0,0 +1,191 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Set, Tuple
+
+from sql_guard import mask
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+WHITESPACE = re.compile(r"\s+")
+FILLER = re.compile(r"^(hey vox |vox |please |can you |could you |tell me )+|( please)$")
+# Follow-ups like "what about last month" depend on earlier turns and are not cached
+CONTEXT_WORDS = re.compile(r"\b(that|those|these|them|it|its|same|previous|above|again|else|more)\b")
+TABLE_REFERENCE = re.compile(r"\b(?:from|join|update|into)\s+`?(?:\w+`?\.`?)?(\w+)`?", re.IGNORECASE)
+# A FROM list, up to the clause after it or the end of its parentheses
+FROM_LIST = re.compile(
+    r"\s+(.+?)(?=\b(?:where|group|order|having|limit|union|window|for|into|on|using|lock)\b|\)|;|$)",
+    re.IGNORECASE | re.DOTALL
+)
+FROM_KEYWORD = re.compile(r"\bfrom\b", re.IGNORECASE)
+LIST_SEPARATOR = re.compile(r",|\bjoin\b", re.IGNORECASE)
+READ_ONLY = re.compile(r"^\s*(select|with|show|describe|explain)\b", re.IGNORECASE)
+
+
+def normalize_question(question: str) -> str:
+    question = PUNCTUATION.sub(" ", question.lower())
+    question = WHITESPACE.sub(" ", question).strip()
+    return FILLER.sub("", question).strip()
+
+
+def normalize_sql(sql: str) -> str:
+    return WHITESPACE.sub(" ", sql).strip().rstrip(";").strip()
+
+
+def tables_in(sql: str) -> Set[str]:
+    """Tables a statement reads or writes, including every table of a comma-separated FROM list."""
+    masked = mask(sql.replace("`", ""))
+    tables = {match.lower() for match in TABLE_REFERENCE.findall(masked)}
+    # Every FROM, subqueries' too; a subquery's own list starts at its FROM
+    for keyword in FROM_KEYWORD.finditer(masked):
+        listed = FROM_LIST.match(masked, keyword.end())
+        if listed is None:
+            continue
+        for item in LIST_SEPARATOR.split(listed.group(1)):
+            words = item.split()
+            if words and not words[0].startswith("("):
+                tables.add(words[0].split(".")[-1].lower())
+    return tables
+
+
+def is_cacheable_question(question: str) -> bool:
+    return bool(question) and not CONTEXT_WORDS.search(question)
+
+
+def is_read_only(sql: str) -> bool:
+    return bool(READ_ONLY.match(sql))
+
+
+def extract_sql_result(messages: list) -> Optional[Tuple[str, Any]]:
+    """The last successful sql_db_query call in an agent transcript, as (sql, result)."""
+    results = {
+        getattr(message, "tool_call_id", None): message.content
+        for message in messages
+        if getattr(message, "name", None) == "sql_db_query"
+    }
+    for message in reversed(messages):
+        for call in reversed(getattr(message, "tool_calls", None) or []):
+            if call.get("name") != "sql_db_query":
+                continue
+            result = results.get(call.get("id"))
+            if result is not None and not str(result).startswith("Error"):
+                return call.get("args", {}).get("query", ""), result
+    return None
+
+
+def result_digest(result: Any) -> str:
+    return hashlib.sha256(repr(result).encode("utf-8")).hexdigest()
+
+
+class CacheEntry:
+    __slots__ = ("value", "tables", "expires_at")
+
+    def __init__(self, value: Any, tables: Set[str], expires_at: float):
+        self.value = value
+        self.tables = tables
+        self.expires_at = expires_at
+
+
+class TTLCache:
+    """LRU dict whose entries also expire after ttl seconds."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, value: Any, tables: Set[str]):
+        self.entries[key] = CacheEntry(value, tables, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, db_name: str, table: Optional[str] = None) -> int:
+        stale = [
+            key for key, entry in self.entries.items()
+            if key[0] == db_name and (table is None or table.lower() in entry.tables)
+        ]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class QueryCache:
+    """
+    Two-level cache for the QUERY path.
+
+    Level one maps (database, normalized question) to the SQL the agent ran,
+    its spoken answer and a digest of the result it was based on. Level two
+    maps (database, SQL) to the result text and the bounded result table
+    sent to the client. Results expire sooner than questions: a question hit
+    with an expired result re-runs only the SQL and reuses the answer if the
+    result digest is unchanged. Results whose table is over max_table_bytes
+    are not kept, so a hit on them re-runs the SQL for the table.
+    """
+
+    def __init__(self, question_ttl: float = 3600.0, result_ttl: float = 300.0,
+                 max_questions: int = 1000, max_results: int = 500,
+                 max_table_bytes: int = 256 * 1024):
+        self.questions = TTLCache(question_ttl, max_questions)
+        self.results = TTLCache(result_ttl, max_results)
+        self.max_table_bytes = max_table_bytes
+        self.lock = threading.Lock()
+
+    def get_sql(self, db_name: str, question: str) -> Optional[Tuple[str, str, str]]:
+        """(sql, answer, result digest) previously produced for this question."""
+        key = (db_name, normalize_question(question))
+        with self.lock:
+            entry = self.questions.get(key)
+        return entry.value if entry else None
+
+    def put_sql(self, db_name: str, question: str, sql: str, answer: str, result: Any):
+        normalized = normalize_question(question)
+        if not is_cacheable_question(normalized) or not is_read_only(sql):
+            return
+        value = (normalize_sql(sql), answer, result_digest(result))
+        with self.lock:
+            self.questions.put((db_name, normalized), value, tables_in(sql))
+
+    def get_result(self, db_name: str, sql: str) -> Optional[Tuple[Any, Any]]:
+        """(result text, result table or None) previously produced by this SQL."""
+        with self.lock:
+            entry = self.results.get((db_name, normalize_sql(sql)))
+        return entry.value if entry else None
+
+    def put_result(self, db_name: str, sql: str, result: Any, table: Any = None):
+        if not is_read_only(sql) or (table is not None and table.size > self.max_table_bytes):
+            return
+        with self.lock:
+            self.results.put((db_name, normalize_sql(sql)), (result, table), tables_in(sql))
+
+    def invalidate(self, db_name: str, table: Optional[str] = None) -> int:
+        """Drop every entry for a database, or only those reading a given table."""
+        with self.lock:
+            return self.questions.invalidate(db_name, table) + self.results.invalidate(db_name, table)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"questions": self.questions.stats(), "results": self.results.stats()}
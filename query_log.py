@@ -0,0 +1,426 @@
+"""
+Log of the SQL statements VOX runs for the agent, and an analyzer for it.
+
+Every statement executed through the bounded query tool (and every replay
+of cached SQL) is appended to a JSONL file with its database, normalized
+fingerprint, duration, rows examined and rows returned. The analyzer
+aggregates the log by fingerprint and proposes indexes from the WHERE, JOIN
+and ORDER BY columns of the hottest statements; with --explain it checks
+each proposal against the live plan and existing indexes first.
+
+    python query_log.py --log vox_query_log.jsonl --top 20 --explain
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sql_guard import mask, top_level_keywords
+
+NUMBER = re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?:e[-+]?\d+)?(?![\w.])", re.IGNORECASE)
+IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+PUNCTUATION = re.compile(r"\s*([=<>!]+|[(),])\s*")
+PREDICATE = re.compile(
+    r"(?:\b(\w+)\.)?\b([A-Za-z_]\w*)\s*(<=>|<=|>=|<>|!=|=|<|>|\bIN\b|\bLIKE\b|\bBETWEEN\b|\bIS\b)",
+    re.IGNORECASE
+)
+# Right-hand side of col = other.col, for join conditions
+JOIN_RHS = re.compile(r"=\s*(?:\b(\w+)\.)?\b([A-Za-z_]\w*)\b(?!\s*\()")
+EQUALITY = {"=", "<=>", "IN", "IS"}
+JOIN_MODIFIERS = {"INNER", "LEFT", "RIGHT", "OUTER", "CROSS", "NATURAL", "STRAIGHT_JOIN", "FULL"}
+NOT_COLUMNS = {"NULL", "TRUE", "FALSE", "NOT", "AND", "OR", "CASE", "WHEN", "THEN", "ELSE", "END",
+               "EXISTS", "SELECT", "INTERVAL", "CURRENT_DATE", "CURRENT_TIMESTAMP", "NOW"}
+CLAUSE_ENDS = ("WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "UNION", "WINDOW", "FOR", "INTO")
+MAX_INDEX_COLUMNS = 4
+# Statuses of statements that ran; rejected and error entries did not
+COMPLETED = ("ok", "truncated")
+
+
+def normalize(sql: str) -> str:
+    """sql with comments dropped, literals replaced by ?, IN lists folded and whitespace collapsed."""
+    out = []
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in "'\"":
+            j = i + 1
+            while j < n and sql[j] != ch:
+                j += 2 if sql[j] == "\\" else 1
+            out.append("?")
+            i = j + 1
+        elif ch == "`":
+            j = sql.find("`", i + 1)
+            j = n if j == -1 else j
+            out.append(sql[i + 1:j])
+            i = j + 1
+        elif sql.startswith("--", i) or ch == "#":
+            j = sql.find("\n", i)
+            i = n if j == -1 else j
+        elif sql.startswith("/*", i):
+            j = sql.find("*/", i + 2)
+            i = n if j == -1 else j + 2
+            out.append(" ")
+        else:
+            out.append(ch)
+            i += 1
+    text = NUMBER.sub("?", "".join(out))
+    text = IN_LIST.sub("IN (?+)", PUNCTUATION.sub(r" \1 ", text))
+    return WHITESPACE.sub(" ", text).strip().rstrip(";").strip().lower()
+
+
+def fingerprint(sql: str) -> Tuple[str, str]:
+    """(short id, normalized text) shared by statements that differ only in literals."""
+    normalized = normalize(sql)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16], normalized
+
+
+class QueryLog:
+    """Append-only JSONL log of agent SQL; one line per statement. Blocking."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, database: Optional[str], sql: str, duration: float, status: str = "ok",
+               rows_returned: int = 0, rows_examined: Optional[int] = None,
+               estimated_rows: Optional[int] = None, truncated: bool = False):
+        fingerprint_id, normalized = fingerprint(sql)
+        entry = {
+            "ts": round(time.time(), 3),
+            "database": database,
+            "fingerprint": fingerprint_id,
+            "normalized": normalized,
+            "sql": sql,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "rows_examined": rows_examined,
+            "estimated_rows": estimated_rows,
+            "rows_returned": rows_returned,
+            "truncated": truncated,
+        }
+        line = json.dumps(entry, default=str) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.recorded += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"path": self.path, "recorded": self.recorded}
+
+
+def last_rows_examined(conn) -> Optional[int]:
+    """Rows MySQL examined for the connection's previous statement, from performance_schema."""
+    if conn.dialect.name != "mysql":
+        return None
+    try:
+        from sqlalchemy import text
+        return conn.execute(text(
+            "SELECT ROWS_EXAMINED FROM performance_schema.events_statements_history "
+            "WHERE THREAD_ID = PS_CURRENT_THREAD_ID() ORDER BY EVENT_ID DESC LIMIT 1"
+        )).scalar()
+    except Exception:
+        # performance_schema disabled, or MySQL older than 8.0.16
+        return None
+
+
+# Analyzer
+
+
+def read_log(path: str) -> List[dict]:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return entries
+
+
+class FingerprintStats:
+    def __init__(self, fingerprint_id: str, normalized: str, database: Optional[str]):
+        self.fingerprint = fingerprint_id
+        self.normalized = normalized
+        self.database = database
+        self.sample = None
+        self.durations = []
+        self.rows_examined = []
+        self.rows_returned = []
+        self.statuses = defaultdict(int)
+
+    def add(self, entry: dict):
+        status = entry.get("status", "ok")
+        self.statuses[status] += 1
+        # Truncated runs completed, and are often the heaviest of all
+        if status not in COMPLETED:
+            return
+        self.sample = self.sample or entry["sql"]
+        self.durations.append(entry.get("duration_ms") or 0.0)
+        examined = entry.get("rows_examined")
+        if examined is None:
+            examined = entry.get("estimated_rows")
+        if examined is not None:
+            self.rows_examined.append(examined)
+        self.rows_returned.append(entry.get("rows_returned") or 0)
+
+    @property
+    def count(self) -> int:
+        return sum(self.statuses.values())
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.durations)
+
+    def p95_ms(self) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    @staticmethod
+    def mean(values) -> float:
+        return sum(values) / len(values) if values else 0.0
+
+
+def aggregate(entries: List[dict]) -> List[FingerprintStats]:
+    """Per-fingerprint statistics, hottest (most total time) first."""
+    groups: Dict[Tuple[Optional[str], str], FingerprintStats] = {}
+    for entry in entries:
+        key = (entry.get("database"), entry["fingerprint"])
+        if key not in groups:
+            groups[key] = FingerprintStats(entry["fingerprint"], entry["normalized"], entry.get("database"))
+        groups[key].add(entry)
+    return sorted(groups.values(), key=lambda stats: (stats.total_ms, stats.count), reverse=True)
+
+
+def clause(masked: str, keywords, start: str, ends=CLAUSE_ENDS) -> str:
+    """Top-level text from keyword start up to the next top-level clause keyword."""
+    begin = None
+    for keyword, offset in keywords:
+        if begin is None:
+            if keyword == start:
+                begin = offset + len(start)
+        elif keyword in ends and keyword != start:
+            return masked[begin:offset]
+    return masked[begin:] if begin is not None else ""
+
+
+def referenced_tables(from_clause: str) -> Tuple[Dict[str, str], List[str]]:
+    """({alias or name: table}, join conditions) of a FROM clause."""
+    tables = {}
+    conditions = []
+    for piece in re.split(r"\bJOIN\b|,", from_clause, flags=re.IGNORECASE):
+        parts = re.split(r"\bON\b|\bUSING\b", piece, maxsplit=1, flags=re.IGNORECASE)
+        if len(parts) == 2:
+            conditions.append(parts[1])
+        words = [word for word in parts[0].split() if word.upper() not in JOIN_MODIFIERS]
+        if not words or words[0].startswith("("):
+            continue
+        table = words[0].split(".")[-1]
+        alias = words[2] if len(words) > 2 and words[1].upper() == "AS" else (words[1] if len(words) > 1 else table)
+        tables[alias] = table
+        tables[table] = table
+    return tables, conditions
+
+
+def candidate_indexes(sql: str) -> Dict[str, List[str]]:
+    """
+    {table: columns} worth indexing for one statement: equality columns of
+    WHERE and JOIN conditions first, then one range column, or failing that
+    the ORDER BY columns. Only the outermost query block is read, and
+    unqualified columns only when a single table is referenced.
+    """
+    masked = mask(sql.replace("`", ""))
+    keywords = list(top_level_keywords(masked))
+    tables, conditions = referenced_tables(clause(masked, keywords, "FROM"))
+    if not tables:
+        return {}
+    distinct_tables = set(tables.values())
+    # WHERE columns lead the index; join columns follow
+    conditions.insert(0, clause(masked, keywords, "WHERE"))
+
+    def resolve(qualifier, column):
+        if column.upper() in NOT_COLUMNS or column.isdigit():
+            return None
+        if qualifier:
+            return tables.get(qualifier)
+        return next(iter(distinct_tables)) if len(distinct_tables) == 1 else None
+
+    equality = defaultdict(list)
+    ranges = defaultdict(list)
+    for condition in conditions:
+        matches = [(q, c, op.upper()) for q, c, op in PREDICATE.findall(condition)]
+        matches += [(q, c, "=") for q, c in JOIN_RHS.findall(condition)]
+        for qualifier, column, operator in matches:
+            table = resolve(qualifier, column)
+            if table is None:
+                continue
+            target = equality if operator in EQUALITY else ranges
+            if column not in target[table]:
+                target[table].append(column)
+
+    order = defaultdict(list)
+    order_by = re.sub(r"^\s*BY\b", "", clause(masked, keywords, "ORDER"), flags=re.IGNORECASE)
+    for item in order_by.split(","):
+        match = re.match(r"\s*(?:(\w+)\.)?(\w+)", item)
+        if match:
+            table = resolve(match.group(1), match.group(2))
+            if table is not None:
+                order[table].append(match.group(2))
+
+    indexes = {}
+    for table in distinct_tables:
+        columns = list(equality[table])
+        extra = ranges[table][:1] or order[table]
+        columns += [column for column in extra if column not in columns]
+        if columns:
+            indexes[table] = columns[:MAX_INDEX_COLUMNS]
+    return indexes
+
+
+class Recommendation:
+    def __init__(self, database: Optional[str], table: str, columns: List[str]):
+        self.database = database
+        self.table = table
+        self.columns = columns
+        self.fingerprints = []
+        self.total_ms = 0.0
+        self.reason = "from query shape"
+
+    def statement(self) -> str:
+        name = "idx_" + "_".join([self.table] + self.columns)[:60]
+        target = f"`{self.database}`.`{self.table}`" if self.database else f"`{self.table}`"
+        return f"CREATE INDEX `{name}` ON {target} ({', '.join(f'`{column}`' for column in self.columns)});"
+
+
+class PlanChecker:
+    """Live checks for --explain: the statement's plan and the table's existing indexes."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.index_cache = {}
+
+    def plan(self, database: str, sql: str) -> List[dict]:
+        from sqlalchemy import text
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql(f"USE `{database}`")
+            return [dict(row._mapping) for row in conn.execute(text(f"EXPLAIN {sql}"))]
+
+    def indexes(self, database: str, table: str) -> List[List[str]]:
+        key = (database, table)
+        if key not in self.index_cache:
+            from sqlalchemy import text
+            columns = defaultdict(list)
+            with self.engine.connect() as conn:
+                for row in conn.execute(text(f"SHOW INDEX FROM `{database}`.`{table}`")):
+                    row = row._mapping
+                    columns[row["Key_name"]].append((row["Seq_in_index"], row["Column_name"]))
+            self.index_cache[key] = [[name for _, name in sorted(parts)] for parts in columns.values()]
+        return self.index_cache[key]
+
+    def needed(self, database: str, sql: str, table: str, columns: List[str]) -> Optional[str]:
+        """Why the index would help, or None if the plan or an existing index already covers it."""
+        lowered = [column.lower() for column in columns]
+        for existing in self.indexes(database, table):
+            if [column.lower() for column in existing[:len(lowered)]] == lowered:
+                return None
+        masked = mask(sql.replace("`", ""))
+        tables, _ = referenced_tables(clause(masked, list(top_level_keywords(masked)), "FROM"))
+        names = {name for name, target in tables.items() if target == table}
+        for step in self.plan(database, sql):
+            alias_table = step.get("table")
+            extra = str(step.get("Extra") or "")
+            if alias_table not in names:
+                continue
+            if str(step.get("type")).upper() in ("ALL", "INDEX") or step.get("key") is None:
+                return f"plan scans {alias_table} ({step.get('type')}, ~{step.get('rows')} rows)"
+            if "filesort" in extra:
+                return f"plan sorts {alias_table} with a filesort"
+        return None
+
+
+def recommend(stats: List[FingerprintStats], checker: Optional[PlanChecker] = None) -> List[Recommendation]:
+    recommendations: Dict[Tuple[Optional[str], str, Tuple[str, ...]], Recommendation] = {}
+    for group in stats:
+        if group.sample is None:
+            continue
+        for table, columns in candidate_indexes(group.sample).items():
+            reason = "from query shape"
+            if checker is not None and group.database:
+                try:
+                    reason = checker.needed(group.database, group.sample, table, columns)
+                except Exception as e:
+                    reason = f"unverified ({type(e).__name__})"
+                if reason is None:
+                    continue
+            key = (group.database, table, tuple(columns))
+            if key not in recommendations:
+                recommendations[key] = Recommendation(group.database, table, columns)
+                recommendations[key].reason = reason
+            recommendations[key].fingerprints.append(group.fingerprint)
+            recommendations[key].total_ms += group.total_ms
+    return sorted(recommendations.values(), key=lambda item: item.total_ms, reverse=True)
+
+
+def server_engine():
+    from urllib.parse import quote_plus
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+
+    load_dotenv()
+    username = os.getenv("DB_USER", "harsha")
+    password = quote_plus(os.getenv("DB_PASSWORD", "HarshaV@123"))
+    host = os.getenv("DB_HOST", "localhost")
+    port = os.getenv("DB_PORT", "3306")
+    return create_engine(f"mysql+pymysql://{username}:{password}@{host}:{port}", pool_pre_ping=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--log", default=os.getenv("VOX_QUERY_LOG") or "vox_query_log.jsonl")
+    parser.add_argument("--database", help="only statements run against this database")
+    parser.add_argument("--top", type=int, default=20, help="fingerprints to list")
+    parser.add_argument("--explain", action="store_true",
+                        help="check proposals against EXPLAIN and existing indexes (connects to MySQL)")
+    args = parser.parse_args()
+
+    entries = read_log(args.log)
+    if args.database:
+        entries = [entry for entry in entries if entry.get("database") == args.database]
+    stats = aggregate(entries)
+    print(f"{len(entries)} statements, {len(stats)} fingerprints in {args.log}\n")
+    print(f"{'fingerprint':<18}{'database':<14}{'count':>7}{'total ms':>11}{'p95 ms':>9}"
+          f"{'examined':>10}{'returned':>10}{'failed':>8}  statement")
+    for group in stats[:args.top]:
+        failed = group.count - sum(group.statuses.get(status, 0) for status in COMPLETED)
+        print(f"{group.fingerprint:<18}{str(group.database or '-'):<14}{group.count:>7}{group.total_ms:>11.1f}"
+              f"{group.p95_ms():>9.1f}{group.mean(group.rows_examined):>10.0f}{group.mean(group.rows_returned):>10.0f}"
+              f"{failed:>8}  {group.normalized[:80]}")
+
+    checker = None
+    if args.explain:
+        checker = PlanChecker(server_engine())
+    recommendations = recommend(stats[:args.top], checker)
+    print("\nIndex recommendations" + ("" if checker else " (unverified; run with --explain to check plans)") + ":")
+    if not recommendations:
+        print("  none")
+    for item in recommendations:
+        print(f"  {item.statement()}")
+        print(f"    -- {item.reason}; {item.total_ms:.0f} ms over {', '.join(item.fingerprints)}")
+    if checker is not None:
+        checker.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import datetime
+import decimal
+import json
+import struct
+import time
+from typing import Any, List, Literal, Optional, Tuple
+
+import numpy as np
+from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+import tracing
+from query_log import QueryLog, last_rows_examined
+from sql_guard import QueryRejected, SqlGuard
+
+# RESULT_TABLE payload: uint32 header length, JSON header, then one block per
+# column. A block is a packed validity bitmap (MSB first, 1 = not null)
+# followed by the values: int32, int64 or float64 arrays, or for utf8 columns
+# uint32 offsets (rows + 1) and the concatenated bytes. Every buffer is
+# padded to 8 bytes so the client can view it as a typed array.
+HEADER_LENGTH = struct.Struct('<I')
+INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+INT64_RANGE = (-2 ** 63, 2 ** 63 - 1)
+MAX_CELL_LENGTH = 300
+
+
+class ResultLimits:
+    def __init__(self, max_rows: int = 1000, max_bytes: int = 1024 * 1024,
+                 sample_rows: int = 20, batch_size: int = 200, drain_rows: int = 2000):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.sample_rows = sample_rows
+        self.batch_size = batch_size
+        # Rows read and dropped past a cap to keep the connection; beyond it the connection is dropped
+        self.drain_rows = drain_rows
+
+
+class BoundedResult:
+    """The first rows of a query result, capped by row count and approximate size."""
+
+    def __init__(self, columns: List[str], rows: List[tuple], truncated: bool, size: int):
+        self.columns = columns
+        self.rows = rows
+        self.truncated = truncated
+        self.size = size
+
+    def sample_text(self, sample_rows: int) -> str:
+        """What the LLM sees: the first sample_rows rows in SQLDatabase.run's format."""
+        if not self.rows:
+            return ""
+        sample = [
+            tuple(truncate_cell(value) for value in row)
+            for row in self.rows[:sample_rows]
+        ]
+        note = ""
+        if len(self.rows) > sample_rows or self.truncated:
+            total = f"more than {len(self.rows)}" if self.truncated else str(len(self.rows))
+            note = f"\n({total} rows in total; showing the first {len(sample)})"
+        return str(sample) + note
+
+    def pack(self) -> bytes:
+        header = {
+            "columns": [],
+            "rows": len(self.rows),
+            "truncated": self.truncated,
+        }
+        blocks = []
+        for index, name in enumerate(self.columns):
+            values = [row[index] for row in self.rows]
+            kind = column_type(values)
+            header["columns"].append({"name": name, "type": kind})
+            blocks.extend(pack_column(values, kind))
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        # Space-padded so the column blocks start 8-byte aligned
+        header_bytes += b" " * (-(HEADER_LENGTH.size + len(header_bytes)) % 8)
+        return HEADER_LENGTH.pack(len(header_bytes)) + header_bytes + b"".join(blocks)
+
+
+def truncate_cell(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_CELL_LENGTH:
+        return value[:MAX_CELL_LENGTH] + "..."
+    return value
+
+
+def row_size(row: tuple) -> int:
+    return sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row)
+
+
+def fetch_bounded(engine, sql: str, limits: ResultLimits, guard: Optional[SqlGuard] = None,
+                  log: Optional[QueryLog] = None, database: Optional[str] = None) -> BoundedResult:
+    """
+    Run a query through a server-side cursor, stopping at limits.max_rows
+    rows or limits.max_bytes of data, whichever comes first. With a guard
+    the statement is vetted and rewritten first (QueryRejected). With a log
+    the statement is recorded with its outcome, duration and row counts.
+    Blocking.
+    """
+    started = time.perf_counter()
+    # Logged as the agent wrote it, so rewrites don't split fingerprints
+    statement = sql
+    estimated = None
+    with tracing.stage("mysql"), engine.connect() as conn:
+        try:
+            if guard is not None:
+                # One row past the cap, so truncation is still detected
+                statement, estimated = guard.prepare(conn, sql, limits.max_rows + 1)
+            result = stream_rows(conn, statement, limits)
+        except Exception as e:
+            if log is not None:
+                if isinstance(e, QueryRejected):
+                    status, estimated = "rejected", e.estimated_rows
+                else:
+                    status = "error"
+                log.record(database, sql, time.perf_counter() - started, status, estimated_rows=estimated)
+            raise
+        if log is not None:
+            duration = time.perf_counter() - started
+            # The connection is gone after a truncated read that could not be drained
+            examined = None if conn.invalidated else last_rows_examined(conn)
+            log.record(database, sql, duration, "truncated" if result.truncated else "ok",
+                       rows_returned=len(result.rows), rows_examined=examined,
+                       estimated_rows=estimated, truncated=result.truncated)
+    return result
+
+
+def stream_rows(conn, sql: str, limits: ResultLimits) -> BoundedResult:
+    result = conn.execution_options(
+        stream_results=True, max_row_buffer=limits.batch_size
+    ).execute(text(sql))
+    if not result.returns_rows:
+        # SQLDatabase.run commits too
+        conn.commit()
+        return BoundedResult([], [], False, 0)
+    columns = list(result.keys())
+    rows = []
+    size = 0
+    truncated = False
+    for partition in result.partitions(limits.batch_size):
+        for row in partition:
+            next_size = size + row_size(row)
+            if len(rows) >= limits.max_rows or next_size > limits.max_bytes:
+                truncated = True
+                break
+            rows.append(tuple(row))
+            size = next_size
+        if truncated:
+            break
+    if truncated and not drain(result, limits):
+        # Closing an unbuffered MySQL cursor reads the rest of the result
+        # off the wire; dropping the connection stops the transfer instead.
+        conn.invalidate()
+    else:
+        result.close()
+    return BoundedResult(columns, rows, truncated, size)
+
+
+def drain(result, limits: ResultLimits) -> bool:
+    """
+    Read and drop what is left of a truncated result, up to limits.drain_rows
+    rows; True if it ran out, leaving the connection fit to return to the
+    pool. The guard's LIMIT of max_rows + 1 leaves a single row after a
+    row-count truncation.
+    """
+    remaining = limits.drain_rows
+    while remaining > 0:
+        partition = result.fetchmany(min(limits.batch_size, remaining))
+        if not partition:
+            return True
+        remaining -= len(partition)
+    return not result.fetchmany(1)
+
+
+def column_type(values: List[Any]) -> str:
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+                       for value in present):
+        if all(INT32_RANGE[0] <= value <= INT32_RANGE[1] for value in present):
+            return "int32"
+        if all(INT64_RANGE[0] <= value <= INT64_RANGE[1] for value in present):
+            return "int64"
+        # Wider than int64 (BIGINT UNSIGNED); text keeps every digit
+        return "utf8"
+    if present and all(isinstance(value, (int, float, decimal.Decimal, np.number))
+                       for value in present):
+        return "float64"
+    return "utf8"
+
+
+def cell_text(value: Any) -> str:
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def pad(buffer: bytes, alignment: int = 8) -> bytes:
+    return buffer + b"\0" * (-len(buffer) % alignment)
+
+
+def pack_column(values: List[Any], kind: str) -> List[bytes]:
+    valid = np.array([value is not None for value in values], dtype=bool)
+    blocks = [pad(np.packbits(valid).tobytes())]
+    if kind == "int32":
+        blocks.append(pad(np.array([value or 0 for value in values], dtype="<i4").tobytes()))
+    elif kind == "int64":
+        blocks.append(np.array([value or 0 for value in values], dtype="<i8").tobytes())
+    elif kind == "float64":
+        blocks.append(np.array(
+            [float(value) if value is not None else 0.0 for value in values], dtype="<f8"
+        ).tobytes())
+    else:
+        encoded = [cell_text(value).encode("utf-8") if value is not None else b"" for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+        offsets[1:] = np.cumsum([len(item) for item in encoded])
+        blocks.append(pad(offsets.tobytes()))
+        blocks.append(pad(b"".join(encoded)))
+    return blocks
+
+
+def latest_result(messages: list) -> Optional[BoundedResult]:
+    """The BoundedResult of the last sql_db_query call in an agent transcript."""
+    for message in reversed(messages):
+        if getattr(message, "name", None) != "sql_db_query":
+            continue
+        artifact = getattr(message, "artifact", None)
+        if isinstance(artifact, BoundedResult):
+            return artifact
+    return None
+
+
+class BoundedQueryTool(QuerySQLDataBaseTool):
+    """
+    Drop-in for the toolkit's sql_db_query tool. The agent gets a bounded
+    sample of the result as text; the full bounded result travels as the
+    ToolMessage artifact for delivery to the client.
+    """
+
+    response_format: Literal["content", "content_and_artifact"] = "content_and_artifact"
+    limits: ResultLimits
+    guard: Optional[SqlGuard] = None
+    log: Optional[QueryLog] = None
+    database: Optional[str] = None
+
+    def _run(self, query: str, run_manager=None) -> Tuple[str, Optional[BoundedResult]]:
+        try:
+            result = fetch_bounded(self.db._engine, query, self.limits, self.guard, self.log, self.database)
+        except QueryRejected as e:
+            # Structured, so the agent can retry with a cheaper query
+            return f"Error: {e.feedback()}", None
+        except SQLAlchemyError as e:
+            feedback = self.guard.timeout_feedback(e) if self.guard is not None else None
+            return f"Error: {feedback or e}", None
+        return result.sample_text(self.limits.sample_rows), result
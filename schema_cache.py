@@ -0,0 +1,200 @@
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+TABLES_QUERY = text("""
+    SELECT TABLE_NAME, TABLE_TYPE, TABLE_ROWS, TABLE_COMMENT
+    FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = :db
+""")
+
+COLUMNS_QUERY = text("""
+    SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = :db
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+""")
+
+FOREIGN_KEYS_QUERY = text("""
+    SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = :db AND REFERENCED_TABLE_NAME IS NOT NULL
+""")
+
+# Changes whenever a table or column is added, dropped, renamed or retyped
+DDL_FINGERPRINT_QUERY = text("""
+    SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS(':', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE))), 0)
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = :db
+""")
+
+IDENTIFIER_PART = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+QUERY_WORD = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {"the", "a", "an", "of", "in", "on", "for", "to", "me", "show", "what", "which", "how",
+              "many", "much", "is", "are", "do", "we", "have", "get", "list", "give", "all", "by",
+              "with", "from", "and", "or", "top", "most", "find", "tell", "about", "there", "id"}
+
+
+def stem(word: str) -> str:
+    word = word.lower()
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def identifier_tokens(name: str) -> List[str]:
+    """'film_actor' -> ['film', 'actor'], 'customerId' -> ['customer', 'id']"""
+    return [stem(part) for part in IDENTIFIER_PART.findall(name.replace("_", " "))]
+
+
+class SchemaSnapshot:
+    """Tables, columns and foreign keys of one database, read with three bulk queries."""
+
+    def __init__(self, db_name: str, tables: Dict[str, dict], columns: Dict[str, List[tuple]],
+                 foreign_keys: Dict[str, List[tuple]], fingerprint: tuple):
+        self.db_name = db_name
+        self.tables = tables
+        self.columns = columns
+        self.foreign_keys = foreign_keys
+        self.fingerprint = fingerprint
+        self.loaded_at = time.monotonic()
+        self.checked_at = self.loaded_at
+        self.retriever = TableRetriever(self)
+
+    @classmethod
+    def load(cls, engine, db_name: str) -> "SchemaSnapshot":
+        params = {"db": db_name}
+        with engine.connect() as conn:
+            tables = {
+                row[0]: {"type": row[1], "rows": row[2], "comment": row[3]}
+                for row in conn.execute(TABLES_QUERY, params)
+            }
+            columns = defaultdict(list)
+            for table, column, column_type, nullable, key in conn.execute(COLUMNS_QUERY, params):
+                columns[table].append((column, column_type, nullable == "YES", key))
+            foreign_keys = defaultdict(list)
+            for table, column, ref_table, ref_column in conn.execute(FOREIGN_KEYS_QUERY, params):
+                foreign_keys[table].append((column, ref_table, ref_column))
+            fingerprint = tuple(conn.execute(DDL_FINGERPRINT_QUERY, params).one())
+        return cls(db_name, tables, dict(columns), dict(foreign_keys), fingerprint)
+
+    def table_info(self, table: str) -> str:
+        """Compact CREATE TABLE description of one table for the agent prompt."""
+        lines = []
+        for column, column_type, nullable, key in self.columns.get(table, []):
+            flags = " PRIMARY KEY" if key == "PRI" else ""
+            flags += "" if nullable else " NOT NULL"
+            lines.append(f"  {column} {column_type}{flags}")
+        for column, ref_table, ref_column in self.foreign_keys.get(table, []):
+            lines.append(f"  FOREIGN KEY ({column}) REFERENCES {ref_table}({ref_column})")
+        rows = self.tables.get(table, {}).get("rows")
+        suffix = f" -- ~{rows} rows" if rows is not None else ""
+        return f"CREATE TABLE {table} (\n" + ",\n".join(lines) + f"\n){suffix}"
+
+    def describe(self, tables: List[str]) -> str:
+        return "\n\n".join(self.table_info(table) for table in tables)
+
+
+class TableRetriever:
+    """
+    Scores tables for a question by IDF-weighted overlap with table-name
+    tokens (weighted higher) and column-name tokens, then adds tables one
+    foreign-key hop away from the best matches so join paths are included.
+    """
+
+    def __init__(self, snapshot: SchemaSnapshot, table_weight: float = 3.0):
+        self.snapshot = snapshot
+        self.index: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for table in snapshot.tables:
+            for token in identifier_tokens(table):
+                self.index[token][table] += table_weight
+            for column, _, _, _ in snapshot.columns.get(table, []):
+                for token in identifier_tokens(column):
+                    self.index[token][table] += 1.0
+        n_tables = max(len(snapshot.tables), 1)
+        self.idf = {token: math.log(1 + n_tables / len(tables)) for token, tables in self.index.items()}
+
+        self.neighbors: Dict[str, Set[str]] = defaultdict(set)
+        for table, keys in snapshot.foreign_keys.items():
+            for _, ref_table, _ in keys:
+                if ref_table != table:
+                    self.neighbors[table].add(ref_table)
+                    self.neighbors[ref_table].add(table)
+
+    def relevant_tables(self, question: str, limit: int = 4, expand: int = 2,
+                        min_ratio: float = 0.3) -> List[str]:
+        scores: Dict[str, float] = defaultdict(float)
+        for word in QUERY_WORD.findall(question.lower()):
+            if word in STOP_WORDS:
+                continue
+            token = stem(word)
+            for table, weight in self.index.get(token, {}).items():
+                scores[table] += weight * self.idf[token]
+        if not scores:
+            return []
+
+        ranked = sorted(scores, key=lambda table: scores[table], reverse=True)
+        best = scores[ranked[0]]
+        ranked = [table for table in ranked[:limit] if scores[table] >= best * min_ratio]
+        expanded = []
+        for table in ranked:
+            for neighbor in sorted(self.neighbors.get(table, ()), key=lambda t: -scores.get(t, 0.0)):
+                if neighbor not in ranked and neighbor not in expanded and len(expanded) < expand:
+                    expanded.append(neighbor)
+        return ranked + expanded
+
+
+class SchemaCache:
+    """
+    Per-database SchemaSnapshots. A snapshot is reloaded after ttl seconds;
+    in between, every check_interval seconds one cheap fingerprint query
+    detects DDL changes and triggers an early reload.
+    """
+
+    def __init__(self, ttl: float = 3600.0, check_interval: float = 60.0):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.snapshots: Dict[str, SchemaSnapshot] = {}
+        self.lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, engine, db_name: str) -> Tuple[SchemaSnapshot, bool]:
+        """
+        Return (snapshot, changed): changed is True when the snapshot was
+        reloaded with a different DDL fingerprint, or loaded for the first
+        time, and False for a routine TTL reload of an unchanged schema.
+        Blocking; call from a thread.
+        """
+        with self.lock:
+            snapshot = self.snapshots.get(db_name)
+        now = time.monotonic()
+        if snapshot is not None and now - snapshot.loaded_at < self.ttl:
+            if now - snapshot.checked_at < self.check_interval:
+                return snapshot, False
+            with engine.connect() as conn:
+                fingerprint = tuple(conn.execute(DDL_FINGERPRINT_QUERY, {"db": db_name}).one())
+            if fingerprint == snapshot.fingerprint:
+                snapshot.checked_at = now
+                return snapshot, False
+            print(f"Schema change detected in {db_name}, reloading snapshot")
+
+        previous = snapshot
+        snapshot = SchemaSnapshot.load(engine, db_name)
+        with self.lock:
+            self.snapshots[db_name] = snapshot
+            self.loads += 1
+        return snapshot, previous is None or previous.fingerprint != snapshot.fingerprint
+
+    def invalidate(self, db_name: Optional[str] = None):
+        with self.lock:
+            if db_name is None:
+                self.snapshots.clear()
+            else:
+                self.snapshots.pop(db_name, None)
@@ -1,13 +1,26 @@
 let ws;
 let isRecording = false;
-let mediaRecorder;
-let audioChunks = [];
+let processor = null;
 let stream = null;
 let audioContext;
 let analyser;
 let currentAudio = null;
 let isPlayingResponse = false;
 
+const TARGET_SAMPLE_RATE = 16000;
+
+// Binary frames from the server: 1-byte kind, 4-byte sequence, payload
+const FRAME_HEADER_SIZE = 5;
+const FRAME_AUDIO_CHUNK = 1;
+const FRAME_RESULT_TABLE = 2;
+const MAX_TABLE_ROWS_SHOWN = 200;
+const SESSION_KEY = 'voxSessionId';
+let audioQueue = [];
+let audioStreamDone = true;
+let audioStreamType = 'audio/mpeg';
+// Reply bubble being filled by assistant_partial messages
+let partialContent = null;
+
 document.addEventListener('DOMContentLoaded', function() {
     initializeWebSocket();
     initializeUI();
@@ -29,6 +42,8 @@ async function toggleRecording() {
     const recordButton = document.querySelector('.glow-on-hover');
     
     // Stop current audio playback if active
+    audioQueue = [];
+    audioStreamDone = true;
     if (isPlayingResponse && currentAudio) {
         currentAudio.pause();
         currentAudio = null;
@@ -40,7 +55,6 @@ async function toggleRecording() {
         try {
             stream = await navigator.mediaDevices.getUserMedia({ audio: true });
             startRecording(stream, recordButton);
-            ws.send(JSON.stringify({ type: 'start_listening' }));
         } catch (error) {
             console.error('Mic error:', error);
             showErrorMessage('Microphone access error');
@@ -51,42 +65,53 @@ async function toggleRecording() {
 }
 
 function startRecording(stream, recordButton) {
-    audioContext = new (window.AudioContext || window.webkitAudioContext)();
+    audioContext = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: TARGET_SAMPLE_RATE });
     const source = audioContext.createMediaStreamSource(stream);
     analyser = audioContext.createAnalyser();
     source.connect(analyser);
     
-    mediaRecorder = new MediaRecorder(stream);
-    audioChunks = [];
-    
-    mediaRecorder.ondataavailable = (event) => audioChunks.push(event.data);
-    
-    mediaRecorder.onstop = async () => {
-        if (audioChunks.length > 0) {
-            updateStatus('processing');
-            const audioBlob = new Blob(audioChunks, { type: 'audio/wav' });
-            sendAudioToServer(audioBlob);
-        }
-        cleanupRecording();
+    // Stream raw 16-bit PCM to the server as binary frames
+    processor = audioContext.createScriptProcessor(4096, 1, 1);
+    processor.onaudioprocess = (event) => {
+        if (!isRecording || !ws || ws.readyState !== WebSocket.OPEN) return;
+        const input = event.inputBuffer.getChannelData(0);
+        ws.send(floatTo16BitPCM(input, audioContext.sampleRate));
     };
+    source.connect(processor);
+    processor.connect(audioContext.destination);
+
+    ws.send(JSON.stringify({
+        type: 'start_listening',
+        source: 'client',
+        sample_rate: TARGET_SAMPLE_RATE,
+        stream_audio: true
+    }));
 
-    mediaRecorder.start();
     isRecording = true;
     recordButton.innerHTML = '<i class="fas fa-stop"></i>';
     recordButton.style.backgroundColor = '#ff4444';
     updateStatus('listening');
 }
 
-function stopRecording(recordButton) {
-    if (mediaRecorder && mediaRecorder.state === 'recording') {
-        mediaRecorder.stop();
+function stopRecording(recordButton, notifyServer = true) {
+    if (notifyServer && isRecording && ws && ws.readyState === WebSocket.OPEN) {
+        ws.send(JSON.stringify({ type: 'stop_listening' }));
+    }
+    if (isRecording) {
+        updateStatus('processing');
     }
     isRecording = false;
+    cleanupRecording();
     recordButton.innerHTML = '<i class="fas fa-microphone"></i>';
     recordButton.style.backgroundColor = '#111';
 }
 
 function cleanupRecording() {
+    if (processor) {
+        processor.disconnect();
+        processor.onaudioprocess = null;
+        processor = null;
+    }
     if (stream) {
         stream.getTracks().forEach(track => track.stop());
         stream = null;
@@ -96,49 +121,87 @@ function cleanupRecording() {
         audioContext = null;
         analyser = null;
     }
-    audioChunks = [];
 }
 
-function sendAudioToServer(audioBlob) {
-    const reader = new FileReader();
-    reader.readAsArrayBuffer(audioBlob);
-    reader.onloadend = () => {
-        ws.send(JSON.stringify({
-            type: 'audio_data',
-            audio: Array.from(new Uint8Array(reader.result))
-        }));
-    };
+function floatTo16BitPCM(samples, inputRate) {
+    // Resample if the browser ignored the requested context rate
+    const ratio = inputRate / TARGET_SAMPLE_RATE;
+    const length = Math.floor(samples.length / ratio);
+    const pcm = new Int16Array(length);
+    for (let i = 0; i < length; i++) {
+        const s = Math.max(-1, Math.min(1, samples[Math.floor(i * ratio)]));
+        pcm[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+    }
+    return pcm.buffer;
 }
 
 function initializeWebSocket() {
     ws = new WebSocket('ws://localhost:8000/ws');
+    ws.binaryType = 'arraybuffer';
     
     ws.onmessage = async (event) => {
+        if (event.data instanceof ArrayBuffer) {
+            handleBinaryFrame(event.data);
+            return;
+        }
         const data = JSON.parse(event.data);
         
         switch(data.type) {
             case 'available_databases':
                 handleDatabaseList(data.databases);
                 break;
+            case 'session':
+                handleSessionId(data.session_id);
+                break;
+            case 'session_resumed':
+                sessionStorage.setItem(SESSION_KEY, data.session_id);
+                if (data.success && data.selected) {
+                    updateTranscript(`Resumed session on ${data.selected} database`, 'VOX');
+                }
+                break;
             case 'database_selection':
                 handleDatabaseSelection(data);
                 if (data.audioData) {
                     await playAudioResponse(data.audioData);
                 }
                 break;
+            case 'speech_end':
+                // Server-side endpointing closed the turn
+                stopRecording(document.querySelector('.glow-on-hover'), false);
+                break;
             case 'no_speech_detected':
                 startContinuousListening();
                 break;
             case 'transcript':
                 updateStatus('processing');
+                partialContent = null;
                 updateTranscript(data.text, 'User');
                 break;
+            case 'assistant_partial':
+                appendPartial(data.text);
+                break;
             case 'assistant_response':
-                updateTranscript(data.text, 'VOX');
-                if (data.audioData) {
+                if (partialContent) {
+                    // The final text replaces what was streamed
+                    partialContent.textContent = data.text;
+                    partialContent = null;
+                } else {
+                    updateTranscript(data.text, 'VOX');
+                }
+                if (data.audioStream) {
+                    audioStreamType = data.audioType || 'audio/mpeg';
+                    audioQueue = [];
+                    audioStreamDone = false;
+                } else if (data.audioData) {
                     await playAudioResponse(data.audioData);
                 }
                 break;
+            case 'audio_stream_end':
+                audioStreamDone = true;
+                if (!isPlayingResponse) {
+                    playNextAudioChunk();
+                }
+                break;
             case 'session_ended':
                 updateTranscript(data.message, 'VOX');
                 if (data.audioData) {
@@ -205,6 +268,129 @@ function playAudioResponse(audioData) {
     }
 }
 
+function handleBinaryFrame(buffer) {
+    const kind = new DataView(buffer).getUint8(0);
+    if (kind === FRAME_RESULT_TABLE) {
+        renderResultTable(decodeResultTable(buffer.slice(FRAME_HEADER_SIZE)));
+        return;
+    }
+    // Chunks arriving after the user interrupted playback are dropped
+    if (kind === FRAME_AUDIO_CHUNK && !audioStreamDone) {
+        audioQueue.push(new Blob([buffer.slice(FRAME_HEADER_SIZE)], { type: audioStreamType }));
+        if (!isPlayingResponse) {
+            playNextAudioChunk();
+        }
+    }
+}
+
+// Layout written by result_stream.BoundedResult.pack: uint32 header length,
+// JSON header, then per column a validity bitmap and 8-byte aligned values
+function decodeResultTable(payload) {
+    const view = new DataView(payload);
+    const headerLength = view.getUint32(0, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(payload, 4, headerLength)));
+    const rows = header.rows;
+    const align = (n) => Math.ceil(n / 8) * 8;
+    const decoder = new TextDecoder();
+    let offset = 4 + headerLength;
+
+    const columns = header.columns.map(column => {
+        const validity = new Uint8Array(payload, offset, Math.ceil(rows / 8));
+        offset += align(Math.ceil(rows / 8));
+        let read;
+        if (column.type === 'int32') {
+            const values = new Int32Array(payload, offset, rows);
+            offset += align(rows * 4);
+            read = (i) => values[i];
+        } else if (column.type === 'int64') {
+            const values = new BigInt64Array(payload, offset, rows);
+            offset += rows * 8;
+            // Numbers while exact, digit strings beyond 2^53
+            read = (i) => {
+                const value = values[i];
+                return value >= BigInt(Number.MIN_SAFE_INTEGER) && value <= BigInt(Number.MAX_SAFE_INTEGER)
+                    ? Number(value) : value.toString();
+            };
+        } else if (column.type === 'float64') {
+            const values = new Float64Array(payload, offset, rows);
+            offset += rows * 8;
+            read = (i) => values[i];
+        } else {
+            const offsets = new Uint32Array(payload, offset, rows + 1);
+            offset += align((rows + 1) * 4);
+            const bytes = new Uint8Array(payload, offset, offsets[rows]);
+            offset += align(offsets[rows]);
+            read = (i) => decoder.decode(bytes.subarray(offsets[i], offsets[i + 1]));
+        }
+        const isValid = (i) => (validity[i >> 3] >> (7 - (i & 7))) & 1;
+        return { name: column.name, get: (i) => isValid(i) ? read(i) : null };
+    });
+    return { columns, rows, truncated: header.truncated };
+}
+
+function renderResultTable(result) {
+    const transcriptContent = document.querySelector('.transcript-box .transcript-content');
+    if (!transcriptContent || result.columns.length === 0) return;
+
+    const table = document.createElement('table');
+    table.className = 'result-table';
+    const headRow = table.createTHead().insertRow();
+    result.columns.forEach(column => {
+        const th = document.createElement('th');
+        th.textContent = column.name;
+        headRow.appendChild(th);
+    });
+    const body = table.createTBody();
+    const shown = Math.min(result.rows, MAX_TABLE_ROWS_SHOWN);
+    for (let i = 0; i < shown; i++) {
+        const row = body.insertRow();
+        result.columns.forEach(column => {
+            const value = column.get(i);
+            row.insertCell().textContent = value === null ? 'NULL' : String(value);
+        });
+    }
+
+    const wrapper = document.createElement('div');
+    wrapper.className = 'message vox-message result-message';
+    const caption = document.createElement('div');
+    caption.className = 'result-caption';
+    caption.textContent = `${result.rows}${result.truncated ? '+' : ''} rows` +
+        (shown < result.rows ? ` (showing ${shown})` : '');
+    wrapper.appendChild(caption);
+    wrapper.appendChild(table);
+    transcriptContent.appendChild(wrapper);
+    transcriptContent.scrollTop = transcriptContent.scrollHeight;
+}
+
+function playNextAudioChunk() {
+    if (audioQueue.length === 0) {
+        isPlayingResponse = false;
+        currentAudio = null;
+        if (audioStreamDone) {
+            updateStatus('idle');
+            startContinuousListening();
+        }
+        return;
+    }
+
+    updateStatus('speaking');
+    const audioUrl = URL.createObjectURL(audioQueue.shift());
+    const audio = new Audio(audioUrl);
+    currentAudio = audio;
+    isPlayingResponse = true;
+
+    audio.onended = () => {
+        URL.revokeObjectURL(audioUrl);
+        playNextAudioChunk();
+    };
+
+    audio.play().catch(error => {
+        console.error('Error playing audio chunk:', error);
+        URL.revokeObjectURL(audioUrl);
+        playNextAudioChunk();
+    });
+}
+
 function updateTranscript(text, speaker) {
     const transcriptContent = document.querySelector('.transcript-box .transcript-content');
     if (transcriptContent && text) {
@@ -232,6 +418,28 @@ function updateTranscript(text, speaker) {
         
         transcriptContent.appendChild(messageDiv);
         transcriptContent.scrollTop = transcriptContent.scrollHeight;
+        return content;
+    }
+    return null;
+}
+
+function appendPartial(text) {
+    if (!partialContent) {
+        partialContent = updateTranscript(text, 'VOX');
+        return;
+    }
+    partialContent.textContent += text;
+    const transcriptContent = document.querySelector('.transcript-box .transcript-content');
+    transcriptContent.scrollTop = transcriptContent.scrollHeight;
+}
+
+// After a reconnect the server opens a fresh session; ask it to resume the previous one
+function handleSessionId(sessionId) {
+    const previous = sessionStorage.getItem(SESSION_KEY);
+    if (previous && previous !== sessionId) {
+        ws.send(JSON.stringify({ type: 'resume_session', session_id: previous }));
+    } else {
+        sessionStorage.setItem(SESSION_KEY, sessionId);
     }
 }
 
@@ -277,7 +485,6 @@ async function startContinuousListening() {
         stream = await navigator.mediaDevices.getUserMedia({ audio: true });
         const btn = document.querySelector('.glow-on-hover');
         startRecording(stream, btn);
-        ws.send(JSON.stringify({ type: 'start_listening' }));
     } catch (error) {
         console.error('Mic error:', error);
         showErrorMessage('Microphone access error');
@@ -1,11 +1,24 @@
 import os
+import sys
 import base64
+import importlib
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse
 import asyncio
+import json
+import time
+from typing import Optional
 from dotenv import load_dotenv
-from assistant import VoiceSQLAssistant
+# assistant (langchain, langgraph, deepgram, pyaudio) is imported by the warmup, off the startup path
+from session_manager import SessionManager, SessionLimitError
+from session_store import SessionStore
+from audio_ingest import AudioBuffer
+from binary_frames import pack_frame, AUDIO_CHUNK, RESULT_TABLE
+from vad import StreamingVAD, SPEECH_START, SPEECH_END
+import tracing
+from warmup import Warmup
 
 # Load environment variables
 load_dotenv()
@@ -35,70 +48,296 @@ if not os.path.exists(frontend_dir):
 dg_api_key = os.getenv("DEEPGRAM_API_KEY")
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-assistant = VoiceSQLAssistant(dg_api_key, openai_api_key)
+def build_shared_resources():
+    # VOX_FAKE_BACKENDS=1 serves the local stand-ins from benchmarks/fakes.py (load testing)
+    if os.getenv("VOX_FAKE_BACKENDS"):
+        from benchmarks.fakes import offline_resources_from_env
+        return offline_resources_from_env()
+    from assistant import SharedResources
+    return SharedResources(dg_api_key, openai_api_key)
+
+# Built by the warmup; requests that need it wait for warmup.ready
+shared = None
+warmup = Warmup()
+# Set VOX_SESSION_STORE to an empty string to disable resumable sessions
+session_store_path = os.getenv("VOX_SESSION_STORE", "vox_sessions.sqlite")
+session_manager = SessionManager(
+    max_sessions=int(os.getenv("VOX_MAX_SESSIONS", "200")),
+    idle_timeout=float(os.getenv("VOX_SESSION_IDLE_TIMEOUT", "900")),
+    store=SessionStore(session_store_path) if session_store_path else None,
+)
+
+def init_shared_resources():
+    global shared
+    shared = build_shared_resources()
+    session_manager.shared = shared
+
+def warm_databases():
+    shared.warm_pool(int(os.getenv("VOX_WARM_CONNECTIONS", "2")))
+    # Comma-separated databases whose SQL agents are built before the first session
+    names = [name.strip() for name in os.getenv("VOX_WARM_DATABASES", "").split(",") if name.strip()]
+    shared.warm_databases(names)
+
+warmup.step("imports", lambda: importlib.import_module("assistant"))
+warmup.step("shared_resources", init_shared_resources)
+warmup.step("databases", warm_databases, required=False)
+warmup.step("speech", lambda: shared.speech.warm(), required=False)
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    asyncio.create_task(session_manager.run_sweeper())
+    asyncio.create_task(tracing.monitor_event_loop())
+    asyncio.create_task(start_warmup())
+
+async def start_warmup():
+    await warmup.run()
+    # Fixed phrases are synthesized after readiness; a miss only costs one TTS call
+    await shared.prewarm_tts()
+
+@app.on_event("shutdown")
+async def release_audio_device():
+    # Only loaded if the assistant was, and only holds a device after local-mode capture
+    audio_capture = sys.modules.get("audio_capture")
+    if audio_capture is not None:
+        audio_capture.AudioCaptureService.instance().close()
+    if shared is not None:
+        shared.dispose()
 
 # WebSocket endpoint
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    # Connections are accepted while warming up and wait here for the shared resources
+    if not await warmup.wait(float(os.getenv("VOX_WARMUP_WAIT", "30"))):
+        await websocket.send_json({
+            "type": "error",
+            "message": "Server is starting up. Please try again shortly."
+        })
+        await websocket.close(code=1013)
+        return
+    from assistant import WELCOME_TEMPLATE, GOODBYE_TEXT
+    try:
+        session = await session_manager.create_session()
+    except SessionLimitError as e:
+        print(f"Rejecting connection: {str(e)}")
+        await websocket.send_json({
+            "type": "error",
+            "message": "Server is at capacity. Please try again later."
+        })
+        await websocket.close(code=1013)
+        return
+    session.websocket = websocket
+    assistant = session.assistant
     session_active = True
     
 
-    async def listen_once():
+    audio_buffer = None
+    vad = None
+    speech_start = None
+    receiving_audio = False
+    stream_audio = False
+    current_turn = None
+    listen_started = None
+
+    async def send_partial(text):
+        # Reply text as the LLM produces it; assistant_response still carries the whole reply
         try:
-            transcript = await assistant.listen_for_speech()
-            if not transcript:
-               await websocket.send_json({"type": "no_speech_detected"})
-               return None
-            
-            await websocket.send_json({
-                "type": "transcript",
-                "text": transcript
-            })
-            
-            if any(phrase in transcript.lower() for phrase in 
-                  ['stop', 'quit', 'exit', 'bye', 'goodbye']):
-                return "terminate"
-            
-            response = await assistant.process_query(transcript)
-            if response:
-                audio_data = await assistant.get_speech_audio(response)
+            await websocket.send_json({"type": "assistant_partial", "text": text})
+        except Exception:
+            pass
+
+    assistant.partials.sink = send_partial
+
+    async def respond_to_transcript(transcript):
+        if not transcript:
+            await websocket.send_json({"type": "no_speech_detected"})
+            return None
+        
+        await websocket.send_json({
+            "type": "transcript",
+            "text": transcript
+        })
+        
+        if any(phrase in transcript.lower() for phrase in 
+              ['stop', 'quit', 'exit', 'bye', 'goodbye']):
+            return "terminate"
+        
+        response = await assistant.process_query(transcript)
+        table = assistant.take_result_table()
+        if response and stream_audio:
+            with tracing.stage("ws_send"):
+                await websocket.send_json({
+                    "type": "assistant_response",
+                    "text": response,
+                    "audioStream": True,
+                    "audioType": assistant.speech.audio_type
+                })
+                await send_result_table(table)
+            await send_audio_stream(response)
+        elif response:
+            audio_data = await assistant.get_speech_audio(response)
+            with tracing.stage("ws_send"):
                 await websocket.send_json({
                     "type": "assistant_response",
                     "text": response,
                     "audioData": audio_data
                 })
-            return response
-            
+                await send_result_table(table)
+        # Memory summarization waits until the response is out
+        assistant.memory_writer.schedule()
+        return response
+
+    async def send_result_table(table):
+        # Full bounded result as packed columns; the LLM only saw a sample
+        if table is not None and table.columns:
+            payload = await asyncio.to_thread(table.pack)
+            await websocket.send_bytes(pack_frame(RESULT_TABLE, 0, payload))
+
+    async def send_audio_stream(text):
+        # Ordered audio chunks, one per sentence, sent while later ones synthesize
+        chunks = 0
+        send_seconds = 0.0
+        async for index, audio_bytes in assistant.stream_speech_audio(text):
+            if chunks == 0:
+                turn = tracing.current_turn.get()
+                if turn is not None:
+                    tracing.record("first_audio", time.perf_counter() - turn.started)
+            started = time.perf_counter()
+            await websocket.send_bytes(pack_frame(AUDIO_CHUNK, index, audio_bytes))
+            send_seconds += time.perf_counter() - started
+            chunks += 1
+        await websocket.send_json({"type": "audio_stream_end", "chunks": chunks})
+        tracing.record("ws_send_audio", send_seconds)
+
+    async def listen_once():
+        # Local mode: capture from the server's own microphone
+        try:
+            transcript = await assistant.listen_for_speech()
+            return await respond_to_transcript(transcript)
         except Exception as e:
             print(f"Error in listen_once: {str(e)}")
             return None
 
+    async def transcribe_client_audio(samples, sample_rate):
+        try:
+            print("✓ Processing speech...")
+            if samples is None:
+                return await respond_to_transcript("")
+            transcript = await assistant.transcribe_audio(samples, sample_rate)
+            return await respond_to_transcript(transcript)
+        except Exception as e:
+            print(f"Error transcribing client audio: {str(e)}")
+            return None
+
+    async def end_if_terminated(result):
+        if result != "terminate":
+            return True
+        audio_data = await assistant.get_speech_audio(GOODBYE_TEXT)
+        await websocket.send_json({
+            "type": "session_ended",
+            "message": GOODBYE_TEXT,
+            "audioData": audio_data
+        })
+        return False
+
+    async def run_turn(turn, capture_seconds=None):
+        try:
+            with tracing.turn(session.session_id, assistant.selected_db_name):
+                if capture_seconds is not None:
+                    tracing.record("capture", capture_seconds)
+                result = await turn
+            await session_manager.save_state(session)
+            if not await end_if_terminated(result):
+                await websocket.close()
+        except asyncio.CancelledError:
+            print("Turn cancelled")
+            raise
+
+    def start_turn(turn, capture_seconds=None):
+        # Turns run as tasks so the receive loop stays free for barge-in and end_session
+        nonlocal current_turn
+        cancel_turn()
+        current_turn = asyncio.create_task(run_turn(turn, capture_seconds))
+
+    def capture_seconds():
+        # From start_listening to the end of the utterance, including the user speaking
+        return time.perf_counter() - listen_started if listen_started is not None else None
+
+    def cancel_turn():
+        if current_turn is not None and not current_turn.done():
+            current_turn.cancel()
+
+    def client_segment(start, end=None):
+        # Copied, since the buffer is reused as soon as the next utterance starts
+        if start is None:
+            return None
+        return audio_buffer.view()[start:end].copy()
+
     try:
         await websocket.send_json({
             "type": "available_databases",
             "databases": assistant.available_databases
         })
+        # The client sends this back as resume_session after a reconnect
+        await websocket.send_json({"type": "session", "session_id": session.state_key})
         
         while session_active:
-            data = await websocket.receive_json()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            session.touch()
+
+            # Binary frames carry little-endian int16 PCM from the browser
+            if message.get("bytes") is not None:
+                if not receiving_audio:
+                    continue
+                speech_end = None
+                for event in vad.process(audio_buffer.write(message["bytes"])):
+                    if event.kind == SPEECH_START and speech_start is None:
+                        speech_start = event.sample
+                        await websocket.send_json({"type": "speech_start"})
+                    elif event.kind == SPEECH_END and speech_start is not None:
+                        speech_end = event.sample
+                if speech_end is not None or audio_buffer.truncated:
+                    # Endpoint reached: finish the turn without waiting for stop_listening
+                    receiving_audio = False
+                    await websocket.send_json({"type": "speech_end"})
+                    start_turn(transcribe_client_audio(
+                        client_segment(speech_start, speech_end), audio_buffer.sample_rate
+                    ), capture_seconds())
+                continue
+
+            data = json.loads(message["text"])
             
             if data["type"] == "start_listening":
-                result = await listen_once()
-                if result == "terminate":
-                    goodbye_text = "Goodbye! Have a great day!"
-                    audio_data = await assistant.get_speech_audio(goodbye_text)
-                    await websocket.send_json({
-                        "type": "session_ended",
-                        "message": goodbye_text,
-                        "audioData": audio_data
-                    })
-                    session_active = False
+                # Barge-in: a new utterance abandons the turn still in progress
+                cancel_turn()
+                stream_audio = bool(data.get("stream_audio", False))
+                if data.get("source") == "client":
+                    sample_rate = int(data.get("sample_rate", 16000))
+                    if audio_buffer is None:
+                        audio_buffer = AudioBuffer(sample_rate)
+                    audio_buffer.reset(sample_rate)
+                    if vad is None or vad.sample_rate != sample_rate:
+                        vad = StreamingVAD(sample_rate, buffer_seconds=1)
+                    vad.reset()
+                    speech_start = None
+                    receiving_audio = True
+                    listen_started = time.perf_counter()
+                else:
+                    start_turn(listen_once())
+
+            elif data["type"] == "stop_listening":
+                if receiving_audio:
+                    receiving_audio = False
+                    start_turn(transcribe_client_audio(
+                        client_segment(speech_start), audio_buffer.sample_rate
+                    ), capture_seconds())
             
             elif data["type"] == "select_database":
                 success = await assistant.handle_database_switch(data.get("database"))
                 if success:
-                    welcome_text = f"Connected to {assistant.selected_db_name} database. How can I help you?"
+                    welcome_text = WELCOME_TEMPLATE.format(db=assistant.selected_db_name)
                     audio_data = await assistant.get_speech_audio(welcome_text)
                     await websocket.send_json({
                         "type": "database_selection",
@@ -114,7 +353,19 @@ async def websocket_endpoint(websocket: WebSocket):
                         "message": "Failed to connect to database"
                     })
             
+            elif data["type"] == "resume_session":
+                cancel_turn()
+                resumed = await session_manager.resume(session, data.get("session_id"))
+                await websocket.send_json({
+                    "type": "session_resumed",
+                    "success": resumed,
+                    "session_id": session.state_key,
+                    "selected": assistant.selected_db_name
+                })
+
             elif data["type"] == "end_session":
+                cancel_turn()
+                session.ended = True
                 session_active = False
                 
     except WebSocketDisconnect:
@@ -122,14 +373,94 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"WebSocket error: {str(e)}")
     finally:
-        await websocket.close()
+        cancel_turn()
+        if session.ended:
+            await session_manager.discard_state(session)
+        else:
+            await session_manager.save_state(session)
+        session_manager.close_session(session.session_id)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
 
-# Mount static files after WebSocket endpoint definition
-app.mount("/", StaticFiles(directory=frontend_dir, html=True), name="static")
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; says nothing about its backends"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once the warmup has built the shared resources, 503 with its progress until then"""
+    status = warmup.status()
+    if not status["ready"]:
+        return JSONResponse({"status": "starting", "warmup": status}, status_code=503)
+    return {"status": "ready", "warmup": status}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    if not warmup.ready.is_set():
+        return {"status": "starting", "warmup": warmup.status()}
+    return {
+        "status": "healthy",
+        "warmup": warmup.status(),
+        "sessions": session_manager.stats(),
+        "tts_cache": shared.tts_cache.stats(),
+        "agent_cache": shared.agent_cache.stats(),
+        "query_cache": shared.query_cache.stats(),
+        "db_pool": shared.db_pool.stats(),
+        "sql_guard": shared.sql_guard.stats(),
+        "query_log": shared.query_log.stats() if shared.query_log else None,
+        "speech": shared.speech.stats(),
+        "speculation": shared.speculation.stats(),
+        "latency": tracing.metrics.summary()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage latency histograms in the Prometheus text exposition format"""
+    sessions = session_manager.stats()
+    if not warmup.ready.is_set():
+        return PlainTextResponse(
+            tracing.metrics.render({
+                "vox_ready": 0,
+                "vox_active_sessions": sessions["active_sessions"],
+                "vox_process_rss_bytes": tracing.process_rss_bytes(),
+            }),
+            media_type="text/plain; version=0.0.4"
+        )
+    tts_cache = shared.tts_cache.stats()
+    query_cache = shared.query_cache.stats()
+    speculation = shared.speculation.stats()
+    db_pool = shared.db_pool.stats()
+    return PlainTextResponse(
+        tracing.metrics.render({
+            "vox_ready": 1,
+            "vox_active_sessions": sessions["active_sessions"],
+            "vox_process_rss_bytes": tracing.process_rss_bytes(),
+            "vox_tts_cache_hit_rate": tts_cache["hit_rate"],
+            "vox_question_cache_hit_rate": query_cache["questions"]["hit_rate"],
+            "vox_result_cache_hit_rate": query_cache["results"]["hit_rate"],
+            "vox_db_pool_budget": db_pool["budget"],
+            "vox_db_pool_checked_out": db_pool["checked_out"],
+            "vox_db_pool_timeouts": db_pool["timeouts"],
+            "vox_speculation_hit_rate": speculation["hit_rate"],
+            "vox_speculation_saved_seconds": speculation["saved_seconds"],
+            "vox_speculation_wasted_seconds": speculation["wasted_seconds"],
+        }),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.post("/cache/invalidate")
+async def invalidate_query_cache(database: str, table: Optional[str] = None):
+    """Drop cached questions and results for a database, or for one of its tables"""
+    if shared is None:
+        return JSONResponse({"status": "starting", "warmup": warmup.status()}, status_code=503)
+    removed = shared.query_cache.invalidate(database, table)
+    return {"database": database, "table": table, "removed": removed}
+
+# Mount static files last: a mount at "/" shadows every route registered after it
+app.mount("/", StaticFiles(directory=frontend_dir, html=True), name="static")
 
 if __name__ == "__main__":
     import uvicorn
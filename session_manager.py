@@ -0,0 +1,168 @@
+import asyncio
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from session_store import SessionStore
+
+if TYPE_CHECKING:
+    from assistant import SharedResources, VoiceSQLAssistant
+
+
+class SessionLimitError(Exception):
+    """Raised when the server already holds the maximum number of sessions."""
+
+
+class Session:
+    def __init__(self, session_id: str, assistant: "VoiceSQLAssistant"):
+        self.session_id = session_id
+        # Key of the persisted state; a resumed session keeps its original key
+        self.state_key = session_id
+        self.assistant = assistant
+        self.created_at = time.monotonic()
+        self.last_active = self.created_at
+        self.websocket: Optional[Any] = None
+        # Set when the client ends the session; its state is deleted rather than kept for resuming
+        self.ended = False
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_active
+
+
+class SessionManager:
+    """
+    Gives every WebSocket its own VoiceSQLAssistant (database selection, agent,
+    mode tracker and memories) while sharing the heavy clients in SharedResources.
+
+    Each session's memories are capped by their max_token_limit, so the total
+    footprint is bounded by max_sessions. Sessions idle for longer than
+    idle_timeout seconds are evicted by the sweeper. The server creates the
+    manager before its shared resources exist and sets shared once warm.
+    """
+
+    def __init__(self, shared: Optional["SharedResources"] = None, max_sessions: int = 200,
+                 idle_timeout: float = 900.0, store: Optional[SessionStore] = None):
+        self.shared = shared
+        self.store = store
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: Dict[str, Session] = {}
+        self.evicted_count = 0
+        self.rejected_count = 0
+
+    async def create_session(self) -> Session:
+        if len(self.sessions) >= self.max_sessions:
+            await self.evict_idle()
+        if len(self.sessions) >= self.max_sessions:
+            self.rejected_count += 1
+            raise SessionLimitError(f"Session limit of {self.max_sessions} reached")
+
+        # Imported here so that importing this module stays cheap
+        from assistant import VoiceSQLAssistant
+
+        session_id = uuid.uuid4().hex
+        assistant = VoiceSQLAssistant(None, None, shared=self.shared)
+        session = Session(session_id, assistant)
+        self.sessions[session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        return self.sessions.get(session_id)
+
+    def close_session(self, session_id: str):
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.assistant.memory_writer.close()
+
+    async def save_state(self, session: Session):
+        """Persist a session's mode, memories and database so it can be resumed."""
+        if self.store is None:
+            return
+        try:
+            state = session.assistant.export_state()
+            await asyncio.to_thread(self.store.save, session.state_key, state)
+        except Exception as e:
+            print(f"Warning: Error saving session state: {str(e)}")
+
+    async def discard_state(self, session: Session):
+        """Delete an ended session's stored state, so it can no longer be resumed."""
+        if self.store is None:
+            return
+        try:
+            await asyncio.to_thread(self.store.delete, session.state_key)
+        except Exception as e:
+            print(f"Warning: Error deleting session state: {str(e)}")
+
+    async def purge_store(self):
+        """Delete stored sessions older than the store's TTL."""
+        if self.store is None:
+            return
+        try:
+            purged = await asyncio.to_thread(self.store.purge_expired)
+        except Exception as e:
+            print(f"Warning: Error purging expired sessions: {str(e)}")
+            return
+        if purged:
+            print(f"Purged {purged} expired stored sessions")
+
+    async def resume(self, session: Session, state_key: str) -> bool:
+        """Load a stored session into this one; False if there is nothing to resume."""
+        if self.store is None or not state_key:
+            return False
+        try:
+            state = await asyncio.to_thread(self.store.load, state_key)
+            if state is None:
+                return False
+            await session.assistant.import_state(state)
+        except Exception as e:
+            print(f"Warning: Error resuming session {state_key}: {str(e)}")
+            return False
+        session.state_key = state_key
+        return True
+
+    async def evict(self, session: Session):
+        """Save a session's state so it can be resumed, disconnect its client and drop it."""
+        print(f"Evicting idle session {session.session_id}")
+        await self.save_state(session)
+        if session.websocket is not None:
+            try:
+                await session.websocket.close(code=1001)
+            except Exception as e:
+                print(f"Error closing evicted session: {str(e)}")
+        self.close_session(session.session_id)
+        self.evicted_count += 1
+
+    async def evict_idle(self) -> List[Session]:
+        """Evict every session idle for longer than idle_timeout and return them."""
+        evicted = [
+            session for session in self.sessions.values()
+            if session.idle_seconds() > self.idle_timeout
+        ]
+        for session in evicted:
+            # The sweeper and a full create_session may race for the same session
+            if session.session_id in self.sessions:
+                await self.evict(session)
+        return evicted
+
+    async def run_sweeper(self, interval: float = 30.0, purge_interval: float = 3600.0):
+        # The store's TTL is otherwise only checked when a session is loaded
+        last_purge = time.monotonic() - purge_interval
+        while True:
+            await asyncio.sleep(interval)
+            await self.evict_idle()
+            if time.monotonic() - last_purge >= purge_interval:
+                last_purge = time.monotonic()
+                await self.purge_store()
+
+    def stats(self) -> dict:
+        return {
+            **(self.store.stats() if self.store is not None else {}),
+            "active_sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "evicted_sessions": self.evicted_count,
+            "rejected_sessions": self.rejected_count,
+        }
@@ -0,0 +1,70 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+
+
+class SessionStore:
+    """
+    Session state (mode tracker, memories, selected database) in a local
+    SQLite file, as zlib-compressed JSON keyed by session id. Workers that
+    share the file can resume each other's sessions. Blocking; call from a
+    thread.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600.0):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                state BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.saves = 0
+        self.restores = 0
+
+    def save(self, session_id: str, state: dict):
+        blob = zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?)",
+                (session_id, blob, time.time())
+            )
+            self.saves += 1
+
+    def load(self, session_id: str) -> Optional[dict]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT state, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        self.restores += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def delete(self, session_id: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge_expired(self) -> int:
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,)
+            )
+            return cursor.rowcount
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            stored = self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"stored_sessions": stored, "saves": self.saves, "restores": self.restores}
@@ -0,0 +1,69 @@
+import threading
+from typing import Optional
+
+from mode_tracker import ConversationMode, ModeTracker
+
+# Routes worth starting before classification. The conversational ones run
+# their handler, a single LLM call with no side effects. QUERY only runs its
+# preparation (entity extraction and schema lookup): its SQL runs in a worker
+# thread that cancellation cannot stop and writes the query cache, so the
+# agent waits until the classification confirms the route.
+SPECULATIVE_ROUTES = {
+    ConversationMode.DATABASE: "QUERY",
+    ConversationMode.CREATIVE: "CREATIVE",
+    ConversationMode.EXPLANATION: "EXPLANATION",
+    ConversationMode.GENERAL: "GENERAL",
+}
+
+
+def predict_route(tracker: ModeTracker, local_label: Optional[str], local_confidence: float,
+                  min_streak: int = 2, min_confidence: float = 0.4) -> Optional[str]:
+    """
+    The route a session is most likely to take next, or None to not guess.
+
+    A session that has stayed in one mode for min_streak turns is predicted
+    to stay there; otherwise the local classifier's below-threshold guess is
+    used if it points at the current mode with at least min_confidence.
+    """
+    route = SPECULATIVE_ROUTES.get(tracker.current_mode)
+    if route is None:
+        return None
+    if route == "QUERY" and not tracker.db_connection_active:
+        return None
+    if tracker.streak() >= min_streak:
+        return route
+    if local_label == route and local_confidence >= min_confidence:
+        return route
+    return None
+
+
+class SpeculationStats:
+    """Hit rate of speculative dispatch, LLM time it hid and handler time it wasted."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.wasted_seconds = 0.0
+
+    def hit(self, saved_seconds: float):
+        with self.lock:
+            self.hits += 1
+            self.saved_seconds += saved_seconds
+
+    def miss(self, wasted_seconds: float):
+        with self.lock:
+            self.misses += 1
+            self.wasted_seconds += wasted_seconds
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "wasted_seconds": round(self.wasted_seconds, 3),
+            }
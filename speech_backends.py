@@ -0,0 +1,224 @@
+import io
+import os
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from audio_ingest import pcm_to_wav
+
+DEEPGRAM_STT_MODEL = "nova-2"
+DEEPGRAM_TTS_MODEL = "aura-asteria-en"
+WHISPER_SAMPLE_RATE = 16000
+
+
+class SpeechBackend:
+    """
+    Speech-to-text and text-to-speech provider. Both calls are blocking; the
+    assistant runs them in a thread.
+
+    voice identifies the synthesized voice in TTS cache keys; audio_type is
+    the MIME type of the bytes synthesize() returns and audio_extension the
+    file extension they are cached under.
+    """
+
+    name = "base"
+    voice = ""
+    audio_type = "audio/mpeg"
+    audio_extension = "mp3"
+
+    def transcribe(self, samples: np.ndarray, sample_rate: int) -> str:
+        """Transcript of 16-bit mono PCM, empty if nothing was recognized."""
+        raise NotImplementedError
+
+    def synthesize(self, text: str) -> bytes:
+        raise NotImplementedError
+
+    def warm(self):
+        """Load models or open connections ahead of the first call. Blocking."""
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "voice": self.voice}
+
+
+class DeepgramSpeech(SpeechBackend):
+    """Deepgram prerecorded transcription and Aura speech over HTTPS."""
+
+    name = "deepgram"
+
+    def __init__(self, client, stt_model: str = DEEPGRAM_STT_MODEL, tts_model: str = DEEPGRAM_TTS_MODEL):
+        self.client = client
+        self.stt_model = stt_model
+        self.voice = tts_model
+
+    @classmethod
+    def from_api_key(cls, api_key: str) -> "DeepgramSpeech":
+        from deepgram import DeepgramClient
+        return cls(DeepgramClient(api_key))
+
+    def transcribe(self, samples: np.ndarray, sample_rate: int) -> str:
+        from deepgram import PrerecordedOptions
+
+        payload = {"buffer": pcm_to_wav(samples, sample_rate)}
+        options = PrerecordedOptions(
+            model=self.stt_model,
+            smart_format=True,
+            language="en-US",
+            punctuate=True
+        )
+        response = self.client.listen.rest.v("1").transcribe_file(payload, options)
+        if hasattr(response.results, 'channels'):
+            return response.results.channels[0].alternatives[0].transcript
+        return ""
+
+    def synthesize(self, text: str) -> bytes:
+        from deepgram import SpeakOptions
+
+        options = SpeakOptions(model=self.voice)
+        response = self.client.speak.v("1").stream({"text": text}, options)
+        return response.stream.getvalue()
+
+
+# Models of the local backend, loaded once per worker process on first use
+_recognizer = None
+_synthesizer = None
+
+
+def _load_recognizer(model: str, threads: int):
+    global _recognizer
+    if _recognizer is None:
+        from faster_whisper import WhisperModel
+        _recognizer = WhisperModel(model, device="cpu", compute_type="int8", cpu_threads=threads)
+    return _recognizer
+
+
+def _load_synthesizer(voice_path: str):
+    global _synthesizer
+    if _synthesizer is None:
+        from piper.voice import PiperVoice
+        _synthesizer = PiperVoice.load(voice_path)
+    return _synthesizer
+
+
+def _local_transcribe(model: str, threads: int, audio: np.ndarray):
+    """Worker side of LocalSpeech.transcribe; returns (transcript, CPU seconds)."""
+    started = time.process_time()
+    segments, _ = _load_recognizer(model, threads).transcribe(
+        audio, language="en", beam_size=1, condition_on_previous_text=False
+    )
+    transcript = " ".join(segment.text.strip() for segment in segments)
+    return transcript, time.process_time() - started
+
+
+def _local_synthesize(voice_path: str, text: str):
+    """Worker side of LocalSpeech.synthesize; returns (WAV bytes, CPU seconds)."""
+    started = time.process_time()
+    voice = _load_synthesizer(voice_path)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        # piper-tts renamed synthesize() to synthesize_wav() in 1.3
+        synthesize = getattr(voice, "synthesize_wav", None) or voice.synthesize
+        synthesize(text, wav_file)
+    return buffer.getvalue(), time.process_time() - started
+
+
+def _warm_worker(model: str, threads: int, voice_path: str):
+    """Executor initializer: every worker process loads both models before its first task."""
+    _load_recognizer(model, threads)
+    _load_synthesizer(voice_path)
+
+
+def _worker_ready() -> bool:
+    return True
+
+
+class LocalSpeech(SpeechBackend):
+    """
+    On-box speech: faster-whisper for recognition and a Piper voice for
+    synthesis, run in a pool of worker processes so model inference neither
+    holds the GIL of the server process nor leaves the machine. Each worker
+    loads the models once; threads bounds the CPU threads one recognition uses.
+    """
+
+    name = "local"
+    audio_type = "audio/wav"
+    audio_extension = "wav"
+
+    def __init__(self, voice_path: str, stt_model: str = "base.en", workers: int = 2, threads: int = 2):
+        if not voice_path:
+            raise ValueError("LocalSpeech needs a Piper voice (.onnx) path")
+        self.stt_model = stt_model
+        self.voice_path = voice_path
+        self.voice = f"piper:{os.path.splitext(os.path.basename(voice_path))[0]}"
+        self.threads = threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_warm_worker, initargs=(stt_model, threads, voice_path)
+        )
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.worker_cpu_seconds = 0.0
+        self.calls = 0
+
+    def warm(self):
+        """
+        Start the workers now rather than on the first calls. Workers load the
+        models in the executor's initializer; submitting one task per worker
+        before any can finish makes the executor start all of them. Blocking.
+        """
+        futures = [self.executor.submit(_worker_ready) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def _account(self, cpu_seconds: float):
+        with self.lock:
+            self.worker_cpu_seconds += cpu_seconds
+            self.calls += 1
+
+    def transcribe(self, samples: np.ndarray, sample_rate: int) -> str:
+        audio = samples.astype(np.float32) / 32768.0
+        if sample_rate != WHISPER_SAMPLE_RATE:
+            positions = np.arange(0, len(audio), sample_rate / WHISPER_SAMPLE_RATE)
+            audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+        transcript, cpu_seconds = self.executor.submit(
+            _local_transcribe, self.stt_model, self.threads, audio
+        ).result()
+        self._account(cpu_seconds)
+        return transcript
+
+    def synthesize(self, text: str) -> bytes:
+        audio_bytes, cpu_seconds = self.executor.submit(_local_synthesize, self.voice_path, text).result()
+        self._account(cpu_seconds)
+        return audio_bytes
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                **super().stats(),
+                "workers": self.workers,
+                "calls": self.calls,
+                "worker_cpu_seconds": round(self.worker_cpu_seconds, 3),
+            }
+
+
+def build_speech_backend(dg_api_key: Optional[str] = None, name: Optional[str] = None) -> SpeechBackend:
+    """The provider named by VOX_SPEECH_BACKEND (deepgram or local)."""
+    name = name or os.getenv("VOX_SPEECH_BACKEND", "deepgram")
+    if name == "deepgram":
+        return DeepgramSpeech.from_api_key(dg_api_key)
+    if name == "local":
+        return LocalSpeech(
+            os.getenv("VOX_LOCAL_TTS_VOICE", ""),
+            stt_model=os.getenv("VOX_LOCAL_STT_MODEL", "base.en"),
+            workers=int(os.getenv("VOX_LOCAL_SPEECH_WORKERS", "2")),
+            threads=int(os.getenv("VOX_LOCAL_SPEECH_THREADS", "2")),
+        )
+    raise ValueError(f"Unknown speech backend: {name}")
@@ -0,0 +1,309 @@
+import json
+import re
+import threading
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+import tracing
+
+# Statements the guard lets through without a plan; everything else but
+# SELECT is refused on a read-only guard. EXPLAIN ANALYZE runs its statement,
+# so it is guarded as that statement.
+PASSTHROUGH = {"SHOW", "DESCRIBE", "DESC", "EXPLAIN"}
+AGGREGATE = re.compile(r"\b(COUNT|SUM|AVG|MIN|MAX|GROUP_CONCAT|STDDEV|VARIANCE)\s*\(|\bGROUP\s+BY\b|\bDISTINCT\b",
+                       re.IGNORECASE)
+KEYWORD = re.compile(r"[A-Za-z_]+")
+# Top-level keywords that make a read write, by the clause they start: a
+# data-modifying statement after a CTE, locking reads and exports
+WRITES = {
+    "DELETE": "DELETE", "UPDATE": "UPDATE", "INSERT": "INSERT", "REPLACE": "REPLACE",
+    "FOR": "FOR UPDATE/SHARE", "LOCK": "LOCK IN SHARE MODE", "INTO": "INTO",
+}
+ANALYZE_OPTIONS = re.compile(r"\s*ANALYZE\b(\s*FORMAT\s*=\s*\w+)?", re.IGNORECASE)
+# MySQL ER_QUERY_TIMEOUT: maximum statement execution time exceeded
+QUERY_TIMEOUT_ERROR = 3024
+
+
+class GuardLimits:
+    def __init__(self, max_rows_examined: int = 1_000_000, max_full_scan_rows: int = 100_000,
+                 max_execution_ms: int = 10_000, read_only: bool = True):
+        self.max_rows_examined = max_rows_examined
+        self.max_full_scan_rows = max_full_scan_rows
+        self.max_execution_ms = max_execution_ms
+        self.read_only = read_only
+
+
+class QueryRejected(Exception):
+    """A statement the guard will not run, with feedback the agent can act on."""
+
+    def __init__(self, reason: str, suggestion: str, **details):
+        super().__init__(reason)
+        self.reason = reason
+        self.suggestion = suggestion
+        self.details = details
+        # Set when the statement was planned before it was refused
+        self.estimated_rows = details.get("estimated_rows")
+
+    def feedback(self) -> str:
+        return "Query rejected by the cost guard: " + json.dumps(
+            {"reason": self.reason, **self.details, "suggestion": self.suggestion}, default=str
+        )
+
+
+def mask(sql: str) -> str:
+    """sql with comments, string literals and quoted identifiers blanked, same length."""
+    out = list(sql)
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in "'\"`":
+            j = i + 1
+            while j < n and sql[j] != ch:
+                j += 2 if sql[j] == "\\" and ch != "`" else 1
+            end = min(j + 1, n)
+        elif sql.startswith("--", i) or ch == "#":
+            end = sql.find("\n", i)
+            end = n if end == -1 else end
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+        else:
+            i += 1
+            continue
+        for k in range(i, end):
+            if out[k] != "\n":
+                out[k] = " "
+        i = end
+    return "".join(out)
+
+
+def closing_paren(masked: str, start: int) -> int:
+    """Offset of the parenthesis closing the one at start, or -1."""
+    depth = 0
+    for i in range(start, len(masked)):
+        if masked[i] == "(":
+            depth += 1
+        elif masked[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def unwrap(sql: str) -> Tuple[str, str]:
+    """(sql, masked sql) without parentheses around the whole statement."""
+    while True:
+        masked = mask(sql)
+        start = len(masked) - len(masked.lstrip())
+        end = len(masked.rstrip()) - 1
+        if start >= end or masked[start] != "(" or closing_paren(masked, start) != end:
+            return sql, masked
+        sql = (sql[:start] + sql[start + 1:end] + sql[end + 1:]).strip()
+
+
+def top_level_keywords(masked: str):
+    """(keyword, offset) of every keyword outside parentheses."""
+    depth = 0
+    i = 0
+    while i < len(masked):
+        ch = masked[i]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and (ch.isalpha() or ch == "_") and (i == 0 or not (masked[i - 1].isalnum() or masked[i - 1] == "_")):
+            match = KEYWORD.match(masked, i)
+            yield match.group(0).upper(), i
+            i = match.end()
+            continue
+        i += 1
+
+
+class SqlGuard:
+    """
+    Vets SQL before it runs on a shared database. A SELECT is planned with
+    EXPLAIN and refused when its estimated rows examined, or a full scan of a
+    large table, exceed the limits; an unbounded one gets a LIMIT, and every
+    SELECT gets a MAX_EXECUTION_TIME hint. Plans are only read on MySQL; other
+    dialects get the rewrites alone. Blocking; call with a connection that
+    will run the statement.
+    """
+
+    def __init__(self, limits: GuardLimits):
+        self.limits = limits
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.rejected = 0
+        self.limited = 0
+
+    def prepare(self, conn, sql: str, row_limit: int) -> Tuple[str, Optional[int]]:
+        """
+        The statement to run in place of sql, and its estimated rows examined
+        when a plan was read. Raises QueryRejected.
+        """
+        sql, masked = unwrap(sql.strip().rstrip(";").strip())
+        keywords = list(top_level_keywords(masked))
+        # By the first keyword at any depth, so (SELECT ...) UNION (SELECT ...) is a SELECT
+        match = KEYWORD.search(masked)
+        with self.lock:
+            self.checked += 1
+        if match is None:
+            self.reject(QueryRejected(
+                "no SQL statement found",
+                "Send a single SELECT statement.",
+            ))
+        first = match.group(0).upper()
+        if first in PASSTHROUGH:
+            if len(keywords) > 1 and keywords[0][0] == first and keywords[1][0] == "ANALYZE":
+                return self.prepare_analyze(conn, sql, keywords, row_limit)
+            return sql, None
+        if first not in ("SELECT", "WITH"):
+            if self.limits.read_only:
+                self.reject(QueryRejected(
+                    f"{first} statements are not allowed",
+                    "Only read data with a SELECT statement.",
+                    statement=first,
+                ))
+            return sql, None
+        writes = self.writes(keywords)
+        if writes is not None:
+            if self.limits.read_only:
+                self.reject(QueryRejected(
+                    f"{first} ... {writes} is not allowed",
+                    "Only read data: a plain SELECT without locking clauses, INTO or data-modifying statements.",
+                    statement=writes,
+                ))
+            # Writable guard: left as written, like other writes
+            return sql, None
+
+        has_limit = any(keyword == "LIMIT" for keyword, _ in keywords)
+        if not has_limit:
+            # On its own line, in case the statement ends in a -- comment
+            sql = f"{sql}\nLIMIT {row_limit}"
+            with self.lock:
+                self.limited += 1
+        estimated = None
+        if conn.dialect.name == "mysql":
+            estimated = self.check_plan(conn, sql, masked, row_limit if not has_limit else None)
+        return self.with_timeout(sql, keywords), estimated
+
+    @staticmethod
+    def writes(keywords) -> Optional[str]:
+        """The top-level keyword that makes a SELECT or WITH statement write, lock or export, if any."""
+        # INTO OUTFILE / DUMPFILE / @variable sends results somewhere other than the client
+        return next((WRITES[keyword] for keyword, _ in keywords if keyword in WRITES), None)
+
+    def prepare_analyze(self, conn, sql: str, keywords, row_limit: int) -> Tuple[str, Optional[int]]:
+        """EXPLAIN ANALYZE with the statement it executes vetted and rewritten like any other."""
+        offset = ANALYZE_OPTIONS.match(sql, keywords[1][1]).end()
+        if not sql[offset:].strip():
+            self.reject(QueryRejected(
+                "EXPLAIN ANALYZE without a statement",
+                "Use plain EXPLAIN to see the plan without running the statement.",
+                statement="EXPLAIN ANALYZE",
+            ))
+        with self.lock:
+            # Counted again by the inner prepare
+            self.checked -= 1
+        statement, estimated = self.prepare(conn, sql[offset:], row_limit)
+        return f"{sql[:offset]} {statement}", estimated
+
+    def check_plan(self, conn, sql: str, masked: str, row_limit: Optional[int]) -> int:
+        with tracing.stage("sql_explain"):
+            plan = [dict(row._mapping) for row in conn.execute(text(f"EXPLAIN {sql}"))]
+        estimated = estimate_rows_examined(plan, masked, row_limit)
+        if estimated > self.limits.max_rows_examined:
+            self.reject(QueryRejected(
+                "estimated rows examined exceed the limit",
+                "Filter on indexed columns, join on keys, or aggregate over a narrower range.",
+                estimated_rows=estimated,
+                max_rows=self.limits.max_rows_examined,
+                plan=describe_plan(plan),
+            ))
+        for step in plan:
+            rows = int(step.get("rows") or 0)
+            if str(step.get("type")).upper() == "ALL" and rows > self.limits.max_full_scan_rows \
+                    and not stops_early(plan, masked, row_limit):
+                self.reject(QueryRejected(
+                    f"full scan of {step.get('table')}",
+                    f"Add a WHERE condition on an indexed column of {step.get('table')}"
+                    f" (possible keys: {step.get('possible_keys') or 'none'}).",
+                    table=step.get("table"),
+                    table_rows=rows,
+                    max_full_scan_rows=self.limits.max_full_scan_rows,
+                    estimated_rows=estimated,
+                ))
+        return estimated
+
+    def with_timeout(self, sql: str, keywords) -> str:
+        if self.limits.max_execution_ms <= 0 or "MAX_EXECUTION_TIME" in sql.upper():
+            return sql
+        # The hint belongs right after the SELECT of the outermost query block;
+        # for (SELECT ...) UNION (SELECT ...), the first one
+        offset = next((offset for keyword, offset in keywords if keyword == "SELECT"), None)
+        if offset is None:
+            match = re.search(r"\bSELECT\b", mask(sql), re.IGNORECASE)
+            if match is None:
+                return sql
+            offset = match.start()
+        offset += len("SELECT")
+        return f"{sql[:offset]} /*+ MAX_EXECUTION_TIME({self.limits.max_execution_ms}) */{sql[offset:]}"
+
+    def reject(self, error: QueryRejected):
+        with self.lock:
+            self.rejected += 1
+        print(f"SQL guard: {error.reason}")
+        raise error
+
+    def timeout_feedback(self, error) -> Optional[str]:
+        """Feedback for a statement MySQL stopped at MAX_EXECUTION_TIME, else None."""
+        orig = getattr(error, "orig", None)
+        if not orig or not getattr(orig, "args", None) or orig.args[0] != QUERY_TIMEOUT_ERROR:
+            return None
+        with self.lock:
+            self.rejected += 1
+        return QueryRejected(
+            "query exceeded the execution time limit",
+            "Narrow the query with indexed filters or fewer joins.",
+            max_execution_ms=self.limits.max_execution_ms,
+        ).feedback()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"checked": self.checked, "rejected": self.rejected, "limited": self.limited,
+                    "max_rows_examined": self.limits.max_rows_examined,
+                    "max_execution_ms": self.limits.max_execution_ms}
+
+
+def stops_early(plan: List[dict], masked: str, row_limit: Optional[int]) -> bool:
+    """A lone table read in order with a LIMIT and nothing to sort or aggregate stops after the limit."""
+    if row_limit is None or len(plan) != 1:
+        return False
+    extra = str(plan[0].get("Extra") or "")
+    return "filesort" not in extra and "temporary" not in extra and not AGGREGATE.search(masked)
+
+
+def estimate_rows_examined(plan: List[dict], masked: str, row_limit: Optional[int]) -> int:
+    """
+    Rows MySQL expects to read: per query block the product of its tables'
+    rows (nested-loop joins), summed over blocks. A streamable single-table
+    read with a LIMIT stops once it has found the limit's worth of matches.
+    """
+    blocks = {}
+    for step in plan:
+        rows = max(1, int(step.get("rows") or 0))
+        blocks[step.get("id")] = blocks.get(step.get("id"), 1) * rows
+    estimated = sum(blocks.values())
+    if stops_early(plan, masked, row_limit):
+        filtered = float(plan[0].get("filtered") or 100.0) / 100
+        estimated = min(estimated, int(row_limit / max(filtered, 0.001)))
+    return estimated
+
+
+def describe_plan(plan: List[dict]) -> List[dict]:
+    return [
+        {"table": step.get("table"), "type": step.get("type"), "key": step.get("key"), "rows": step.get("rows")}
+        for step in plan
+    ]
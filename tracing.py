@@ -0,0 +1,199 @@
+import asyncio
+import bisect
+import contextvars
+import itertools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, roughly log-spaced from 1ms to 60s
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are interpolated within a bucket."""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+
+class Metrics:
+    """Per-(stage, database) histograms, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.lock = threading.Lock()
+        self.turns = 0
+
+    def observe(self, stage: str, seconds: float, database: Optional[str] = None):
+        key = (stage, database or "")
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def summary(self) -> Dict[str, dict]:
+        """p50/p95/p99 per stage, across databases."""
+        with self.lock:
+            merged: Dict[str, Histogram] = {}
+            for (stage, _), histogram in self.histograms.items():
+                total = merged.setdefault(stage, Histogram())
+                total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+                total.count += histogram.count
+                total.sum += histogram.sum
+        return {
+            stage: {
+                "count": histogram.count,
+                **{f"p{int(q * 100)}": round(histogram.quantile(q), 4) for q in QUANTILES},
+            }
+            for stage, histogram in sorted(merged.items())
+        }
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        lines = [
+            "# HELP vox_stage_duration_seconds Time spent in each stage of a turn.",
+            "# TYPE vox_stage_duration_seconds histogram",
+        ]
+        quantile_lines = [
+            "# HELP vox_stage_duration_quantile_seconds Estimated latency quantiles per stage.",
+            "# TYPE vox_stage_duration_quantile_seconds gauge",
+        ]
+        with self.lock:
+            for (stage, database), histogram in sorted(self.histograms.items()):
+                labels = f'stage="{stage}",database="{escape(database)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'vox_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'vox_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"vox_stage_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"vox_stage_duration_seconds_count{{{labels}}} {histogram.count}")
+                for q in QUANTILES:
+                    quantile_lines.append(
+                        f'vox_stage_duration_quantile_seconds{{{labels},quantile="{q}"}} '
+                        f"{histogram.quantile(q):.6f}"
+                    )
+            turns = self.turns
+        lines += quantile_lines
+        lines += ["# TYPE vox_turns_total counter", f"vox_turns_total {turns}"]
+        for name, value in (gauges or {}).items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+_turn_ids = itertools.count(1)
+
+
+class Turn:
+    """Stage timings of one request/response turn."""
+
+    def __init__(self, session_id: str, database: Optional[str]):
+        self.turn_id = next(_turn_ids)
+        self.session_id = session_id
+        self.database = database
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def record(self, stage: str, seconds: float):
+        self.stages.append((stage, seconds))
+        metrics.observe(stage, seconds, self.database)
+
+    def describe(self) -> str:
+        stages = " ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in self.stages)
+        return f"turn {self.turn_id} [{self.session_id[:8]}] {stages}"
+
+
+current_turn: contextvars.ContextVar[Optional[Turn]] = contextvars.ContextVar("current_turn", default=None)
+
+
+def record(stage: str, seconds: float):
+    """Attribute a measured duration to the current turn, or to no database outside one."""
+    turn = current_turn.get()
+    if turn is not None:
+        turn.record(stage, seconds)
+    else:
+        metrics.observe(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as one stage of the current turn. The turn is a context
+    variable, so it follows the code into tasks and to_thread workers.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+@contextmanager
+def turn(session_id: str, database: Optional[str]):
+    current = Turn(session_id, database)
+    token = current_turn.set(current)
+    try:
+        yield current
+    finally:
+        current_turn.reset(token)
+        current.record("turn", time.perf_counter() - current.started)
+        with metrics.lock:
+            metrics.turns += 1
+        print(current.describe())
+
+
+async def monitor_event_loop(interval: float = 0.1):
+    """Record how late the event loop wakes up from a sleep, as the event_loop_lag stage."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        metrics.observe("event_loop_lag", max(0.0, loop.time() - started - interval))
+
+
+def process_rss_bytes() -> int:
+    """Current resident set size; the peak where /proc is unavailable, 0 on Windows."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized audio.
+
+    Keys are the SHA-256 of the voice model and the formatted text. Entries
+    live in an in-memory LRU bounded by max_bytes and, when disk_dir is set,
+    in an on-disk tier bounded by max_disk_bytes that evicts the least
+    recently used files first. Files carry the speech backend's audio
+    extension; the disk tier only counts and evicts files of that format.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024, extension: str = "mp3"):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.suffix = f".{extension}"
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.disk_size = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_size = sum(
+                entry.stat().st_size for entry in os.scandir(disk_dir)
+                if entry.is_file() and entry.name.endswith(self.suffix)
+            )
+
+    @staticmethod
+    def key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}{self.suffix}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            audio = self.entries.get(key)
+            if audio is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return audio
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    audio = f.read()
+                os.utime(path)
+            except OSError:
+                audio = None
+            if audio is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self._store(key, audio)
+                return audio
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, audio: bytes):
+        with self.lock:
+            self._store(key, audio)
+        if self.disk_dir:
+            self._write_disk(key, audio)
+
+    def _store(self, key: str, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = audio
+        self.size += len(audio)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def _write_disk(self, key: str, audio: bytes):
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: Error writing TTS cache file: {str(e)}")
+            return
+        with self.lock:
+            self.disk_size += len(audio)
+            over_budget = self.disk_size > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        files = sorted(
+            (entry for entry in os.scandir(self.disk_dir)
+             if entry.is_file() and entry.name.endswith(self.suffix)),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        total = sum(entry.stat().st_size for entry in files)
+        # Trim to 90% of the budget so eviction does not run on every write
+        target = self.max_disk_bytes * 0.9
+        for entry in files:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.unlink(entry.path)
+                total -= size
+            except OSError:
+                continue
+        with self.lock:
+            self.disk_size = total
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "disk_bytes": self.disk_size,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,146 @@
+from typing import List, Optional
+
+import numpy as np
+
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+
+
+class VADEvent:
+    def __init__(self, kind: str, sample: int, sample_rate: int):
+        self.kind = kind
+        self.sample = sample
+        self.sample_rate = sample_rate
+
+    @property
+    def time(self) -> float:
+        return self.sample / self.sample_rate
+
+    def __repr__(self):
+        return f"VADEvent({self.kind}, {self.time:.3f}s)"
+
+
+class StreamingVAD:
+    """
+    Streaming endpointer over a ring buffer of int16 PCM.
+
+    Frame energy and zero-crossing rate are computed for all complete frames
+    of a chunk at once; a frame counts as speech when its energy clears the
+    adaptive noise floor by energy_ratio and it is not noise-like (high ZCR
+    at low energy). Speech starts after min_speech_ms of voiced frames and
+    ends after hangover_ms without one. Event sample offsets are absolute
+    positions in the stream since the last reset().
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20,
+                 hangover_ms: int = 300, min_speech_ms: int = 120,
+                 pre_roll_ms: int = 200, energy_ratio: float = 4.0,
+                 zcr_threshold: float = 0.25, min_energy: float = 2500.0,
+                 noise_adapt: float = 0.05, buffer_seconds: float = 15.0):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.pre_roll = int(sample_rate * pre_roll_ms / 1000)
+        self.energy_ratio = energy_ratio
+        self.zcr_threshold = zcr_threshold
+        self.min_energy = min_energy
+        self.noise_adapt = noise_adapt
+        self.ring = np.zeros(int(sample_rate * buffer_seconds), dtype=np.int16)
+        self.reset()
+
+    def reset(self):
+        self.written = 0
+        self.processed = 0
+        self.noise_floor: Optional[float] = None
+        self.in_speech = False
+        self.voiced_run = 0
+        self.silent_run = 0
+        self.speech_start: Optional[int] = None
+        self.last_voiced_end = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.ring)
+
+    def _write(self, samples: np.ndarray):
+        if len(samples) > self.capacity:
+            self.written += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.ring[start:start + first] = samples[:first]
+        self.ring[:len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def _read(self, start: int, end: int) -> np.ndarray:
+        start = max(start, self.written - self.capacity)
+        indices = np.arange(start, end) % self.capacity
+        return self.ring[indices]
+
+    def frame_features(self, frames: np.ndarray):
+        """Return per-frame mean energy and zero-crossing rate for a (n, frame_length) array."""
+        frames = frames.astype(np.float32)
+        energy = np.mean(frames * frames, axis=1)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_length - 1)
+        return energy, zcr
+
+    def process(self, samples: np.ndarray) -> List[VADEvent]:
+        """Feed a chunk of int16 PCM and return the speech events it completes."""
+        self._write(np.asarray(samples, dtype=np.int16))
+        # Frames that were overwritten before being processed are skipped
+        self.processed = max(self.processed, self.written - self.capacity)
+        n_frames = (self.written - self.processed) // self.frame_length
+        if n_frames <= 0:
+            return []
+
+        end = self.processed + n_frames * self.frame_length
+        frames = self._read(self.processed, end).reshape(n_frames, self.frame_length)
+        energy, zcr = self.frame_features(frames)
+
+        if self.noise_floor is None:
+            self.noise_floor = max(float(np.min(energy)), 1.0)
+
+        events = []
+        for i in range(n_frames):
+            frame_start = self.processed + i * self.frame_length
+            threshold = max(self.noise_floor * self.energy_ratio, self.min_energy)
+            noise_like = zcr[i] > self.zcr_threshold and energy[i] < threshold * 4
+            voiced = energy[i] > threshold and not noise_like
+
+            if not voiced:
+                # Track the background level only outside of voiced frames
+                self.noise_floor += self.noise_adapt * (energy[i] - self.noise_floor)
+                self.noise_floor = max(self.noise_floor, 1.0)
+
+            if voiced:
+                self.voiced_run += 1
+                self.silent_run = 0
+                self.last_voiced_end = frame_start + self.frame_length
+                if not self.in_speech and self.voiced_run >= self.min_speech_frames:
+                    self.in_speech = True
+                    first_voiced = frame_start - (self.voiced_run - 1) * self.frame_length
+                    self.speech_start = max(0, first_voiced - self.pre_roll)
+                    events.append(VADEvent(SPEECH_START, self.speech_start, self.sample_rate))
+            else:
+                self.voiced_run = 0
+                if self.in_speech:
+                    self.silent_run += 1
+                    if self.silent_run >= self.hangover_frames:
+                        self.in_speech = False
+                        self.silent_run = 0
+                        events.append(VADEvent(SPEECH_END, self.last_voiced_end, self.sample_rate))
+
+        self.processed = end
+        return events
+
+    def segment(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        """Copy of the audio between two stream offsets that is still in the ring."""
+        return self._read(start, self.written if end is None else end)
+
+    def current_speech(self) -> np.ndarray:
+        """Audio of the utterance in progress, for stages that start before speech ends."""
+        if self.speech_start is None:
+            return np.zeros(0, dtype=np.int16)
+        return self.segment(self.speech_start)
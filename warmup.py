@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class Warmup:
+    """
+    Runs the server's startup steps in the background so the process can
+    accept connections before the heavy clients exist.
+
+    Each step is a blocking callable run in a thread. Required steps are
+    retried with capped backoff until they succeed (a database that is slow
+    to come up delays readiness instead of crash-looping the process);
+    optional steps are attempted once and their errors recorded. ready is
+    set once every step has run.
+    """
+
+    def __init__(self, retry_initial: float = 1.0, retry_max: float = 30.0):
+        self.steps: List[Tuple[str, Callable[[], Any], bool]] = []
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.ready = asyncio.Event()
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.phase: Optional[str] = None
+        self.completed: List[str] = []
+        self.durations = {}
+        self.errors = {}
+        self.attempts = 0
+
+    def step(self, name: str, run: Callable[[], Any], required: bool = True):
+        self.steps.append((name, run, required))
+
+    async def run(self):
+        for name, run, required in self.steps:
+            self.phase = name
+            started = time.monotonic()
+            delay = self.retry_initial
+            while True:
+                self.attempts += 1
+                try:
+                    await asyncio.to_thread(run)
+                    self.errors.pop(name, None)
+                    break
+                except Exception as e:
+                    self.errors[name] = f"{type(e).__name__}: {e}"
+                    if not required:
+                        print(f"Warning: warmup step {name} failed: {str(e)}")
+                        break
+                    print(f"Warmup step {name} failed, retrying in {delay:.0f}s: {str(e)}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.retry_max)
+            self.durations[name] = round(time.monotonic() - started, 3)
+            self.completed.append(name)
+        self.phase = None
+        self.finished_at = time.monotonic()
+        self.ready.set()
+        print(f"Warmup finished in {self.finished_at - self.started_at:.2f}s")
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for readiness; False if still warming up."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def status(self) -> dict:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return {
+            "ready": self.ready.is_set(),
+            "phase": self.phase,
+            "completed": list(self.completed),
+            "pending": [name for name, _, _ in self.steps if name not in self.completed],
+            "durations": dict(self.durations),
+            "errors": dict(self.errors),
+            "attempts": self.attempts,
+            "elapsed": round(end - self.started_at, 3),
+        }